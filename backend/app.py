@@ -1,18 +1,28 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, session, abort, send_from_directory
 from functools import wraps
 import subprocess
+import signal
 import sys
 import os
 import cv2
 import time
 import json
 import csv
+import io
+import itertools
 import numpy as np
 import shutil
 import hashlib
 import jwt
 from datetime import datetime
 import database
+import dataset_catalog
+import dataset_reconciler
+import enrollment_worker
+import event_log
+import log_reader
+from event_log import write_log
+from duplicate_check import DUPLICATE_EXIT_CODE
 
 # Load .env for email credentials
 try:
@@ -31,9 +41,16 @@ app.secret_key = "attendance_secret_key"
 database.init_db()
 
 # File paths
-LOG_FILE = "system.log"
+LOG_FILE = event_log.LOG_FILE    # Shared with recognize_attendance.py (see event_log.py)
 DATASET_DIR = "TrainingImage"
 TRAINER_FILE = "TrainingImage/representations_arcface.pkl"
+# capture_faces.py: model loading (YOLO + ArcFace warm-up, 10-40 s cold),
+# up to 20.5 s of poses, 5 s of transitions, 2.5 s completion screen, then
+# the duplicate check and gallery save. A capture that is killed leaves its
+# images in capture_staging/, never in TrainingImage/.
+CAPTURE_TIMEOUT = 120
+# recognize_attendance.py flushes (or spools) its queued marks when asked to stop
+RECOGNIZER_STOP_GRACE = 15
 
 # ============================================================
 # UTILITY FUNCTIONS & DECORATORS
@@ -48,37 +65,60 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def write_log(message, log_type="info"):
-    """Write log entry to file and console"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = {
-        "timestamp": timestamp,
-        "type": log_type,
-        "message": message
-    }
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry) + "\n")
-    except Exception as e:
-        print(f"Error writing to log: {e}")
-    print(f"[{timestamp}] {message}")
+# write_log comes from event_log: buffered, flushed in the background, echoed to the console
+event_log.configure(echo=True)
 
 def read_logs(max_lines=100):
-    """Read recent log entries from file"""
-    logs = []
+    """Read recent log entries from file (seeks from the end, never loads the whole log)"""
+    event_log.flush()   # Include this process's buffered entries
     try:
-        if os.path.exists(LOG_FILE):
-            with open(LOG_FILE, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-                for line in lines[-max_lines:]:
-                    try:
-                        log_entry = json.loads(line.strip())
-                        logs.append(log_entry)
-                    except json.JSONDecodeError:
-                        continue
+        return log_reader.tail(max_lines, LOG_FILE)
     except Exception as e:
         print(f"Error reading logs: {e}")
-    return logs
+        return []
+
+CSV_CHUNK_ROWS = 500
+
+def csv_stream_response(header, rows, filename, description="records"):
+    """
+    Stream a CSV download: the BOM and header go out at once, then rows in
+    chunks of CSV_CHUNK_ROWS as `rows` (a generator) produces them.
+    """
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write('\ufeff')  # UTF-8 BOM for proper Excel compatibility
+        writer.writerow(header)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        count = 0
+        try:
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+                if count % CSV_CHUNK_ROWS == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate(0)
+            yield buffer.getvalue()
+        finally:
+            rows.close()
+        write_log(f"Exported {count} {description} to CSV.", "info")
+
+    return Response(
+        generate(),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+def peek(records):
+    """(first item, generator over all items) or (None, None) when empty"""
+    first = next(records, None)
+    if first is None:
+        records.close()
+        return None, None
+    return first, itertools.chain([first], records)
 
 def init_log():
     """Initialize log file"""
@@ -88,57 +128,34 @@ def init_log():
 # DATA HELPER FUNCTIONS
 # ============================================================
 
+def dataset_changed(folder=None):
+    """Make the dataset catalog pick up an added/removed folder or student right away"""
+    dataset_reconciler.dataset_changed(folder, DATASET_DIR)
+
+def duplicate_capture_response(folder_name, name, roll, username, dob):
+    """Reply for a capture that capture_faces.py held back as a likely duplicate"""
+    # capture_faces.py moved the images to pending_review/ instead of TrainingImage/
+    dataset_changed(folder_name)
+    write_log(f"Face capture for {name} ({roll}) matches an existing student — flagged as duplicate, images held for review", "warning")
+    return jsonify({
+        'success': True,
+        'duplicate': True,
+        'message': 'Student registered, but the captured face matches an existing student. Face data was not added — please review.',
+        'credentials': {'username': username, 'password': dob}
+    })
+
 def get_registered_students():
-    """Get list of registered student folders from dataset/ enriched with SQLite metadata"""
-    import re
+    """Students from SQLite enriched with image counts from the dataset catalog (read-only)"""
+    catalog = dataset_catalog.get_catalog(DATASET_DIR)
+    # Folders without a student row are added by the background reconciler, not here
+    dataset_reconciler.get_reconciler(catalog)
     students = database.get_all_students()
-    
-    # Auto-sync: add any student folders from dataset/ that are missing from the database
-    db_names_lower = {s['name'].lower() for s in students}
-    if os.path.isdir(DATASET_DIR):
-        for folder_name in os.listdir(DATASET_DIR):
-            folder_path = os.path.join(DATASET_DIR, folder_name)
-            if os.path.isdir(folder_path):
-                # Try matching folder name directly and after stripping roll number
-                base_name = re.sub(r'_\d+$', '', folder_name).strip()
-                if (folder_name.lower() not in db_names_lower and 
-                    base_name.lower() not in db_names_lower):
-                    # This student exists in dataset but not in DB – auto-register with base name
-                    result = database.add_student(base_name, "", "", "")
-                    if result is not None:
-                        write_log(f"Auto-synced student '{base_name}' from dataset folder '{folder_name}' to database.", "info")
-        # Re-fetch after sync
-        students = database.get_all_students()
-
-    # Add image count dynamically and verify profile picture existence
+
+    # Image count and profile picture come from the catalog (no directory scans per student)
     for student in students:
-        student['images'] = 0
-        student['has_profile_pic'] = False
-        
-        # Try multiple folder name patterns: exact name, name_rollnumber
-        possible_folders = [student['name']]
-        if student.get('roll_number'):
-            possible_folders.append(f"{student['name']}_{student['roll_number']}")
-        
-        # Also search for any folder that starts with the student name
-        if os.path.isdir(DATASET_DIR):
-            for folder_name in os.listdir(DATASET_DIR):
-                folder_path = os.path.join(DATASET_DIR, folder_name)
-                if os.path.isdir(folder_path):
-                    base = re.sub(r'_\d+$', '', folder_name).strip()
-                    if base.lower() == student['name'].lower() and folder_name not in possible_folders:
-                        possible_folders.append(folder_name)
-        
-        for folder_candidate in possible_folders:
-            folder = os.path.join(DATASET_DIR, folder_candidate)
-            if os.path.isdir(folder):
-                images = [f for f in os.listdir(folder) if f.endswith(('.jpg', '.png', '.jpeg'))]
-                student['images'] = len(images)
-                if '1.jpg' in images:
-                    student['has_profile_pic'] = True
-                elif len(images) > 0:
-                    student['has_profile_pic'] = True
-                break  # Found the folder, stop looking
+        _, images, _ = catalog.student_summary(student['name'], student.get('roll_number'))
+        student['images'] = images
+        student['has_profile_pic'] = images > 0
     return students
 
 def get_attendance_records():
@@ -165,8 +182,8 @@ def get_today_records():
     records = database.get_today_records()
     return records
 
-def get_model_info():
-    """Get model status information"""
+def get_model_info(registered=None):
+    """Get model status information (pass `registered` when the caller already has it)"""
     info = {
         "exists": os.path.exists(TRAINER_FILE),
         "status": "Not Trained",
@@ -186,7 +203,8 @@ def get_model_info():
             pass
 
     # Registered students
-    registered = get_registered_students()
+    if registered is None:
+        registered = get_registered_students()
     registered_names = set(s["name"] for s in registered)
     
     # In DeepFace, if there's a folder in TrainingImage with images, they are ready
@@ -203,11 +221,12 @@ def get_dashboard_stats():
     """Get all stats needed for dashboard"""
     students = get_registered_students()
     today_records = get_today_records()
-    model = get_model_info()
-    all_records = get_attendance_records()
+    model = get_model_info(students)
+    # Counts come from trigger-maintained counters, not from loading the whole history
+    summary = database.get_attendance_summary()
 
     # Unique students who attended today
-    present_today = len(today_records)
+    present_today = summary["present"]
     total_registered = len(students)
     absent_count = max(0, total_registered - present_today)
 
@@ -222,7 +241,8 @@ def get_dashboard_stats():
         "model_active": model["exists"],
         "recent_records": today_records[:10],  # Last 10 today
         "all_today": today_records,
-        "total_records": len(all_records)
+        "records_today": summary["records"],
+        "total_records": summary["total_records"]
     }
 
 @app.route("/api/attendance/today")
@@ -240,16 +260,11 @@ def student_image(name):
     """Serve a student's photo from the dataset directory"""
     # Security: prevent path traversal
     name = os.path.basename(name)
-    folder = os.path.join(DATASET_DIR, name)
-    if not os.path.exists(folder):
+    entry = dataset_catalog.get_catalog(DATASET_DIR).get(name)
+    if not entry or not entry["profile_image"]:
         return abort(404)
     
-    # Get the first image in the folder
-    images = [f for f in os.listdir(folder) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-    if not images:
-        return abort(404)
-    
-    return send_from_directory(folder, images[0])
+    return send_from_directory(os.path.join(DATASET_DIR, name), entry["profile_image"])
 
 def get_recent_activity_logs():
     """Get recent activity from system logs for model page"""
@@ -288,7 +303,8 @@ def kill_camera_processes():
                                 proc.terminate()
                                 killed_count += 1
                                 try:
-                                    proc.wait(timeout=1)
+                                    # The recognizer needs a moment to commit or spool its queued marks
+                                    proc.wait(timeout=RECOGNIZER_STOP_GRACE if script == "recognize_attendance.py" else 1)
                                 except psutil.TimeoutExpired:
                                     proc.kill()
                                 break
@@ -309,14 +325,41 @@ def kill_camera_processes():
                 pass
         time.sleep(0.5)
 
+def stop_process(process, grace=RECOGNIZER_STOP_GRACE):
+    """Ask a launched script to stop (SIGTERM / CTRL_BREAK) and kill it only if it is still running after grace seconds"""
+    try:
+        if sys.platform == 'win32':
+            process.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            process.terminate()
+        process.wait(timeout=grace)
+    except (subprocess.TimeoutExpired, OSError, ValueError):
+        process.kill()
+        process.wait()
+
 # ============================================================
 # API ROUTES
 # ============================================================
 
 @app.route("/api/logs")
 def api_logs():
-    logs = read_logs(50)
-    return jsonify(logs)
+    """
+    Latest 50 log entries, or a query: ?since=&until= ("YYYY-MM-DD[ HH:MM:SS]"),
+    ?type=error,warning and ?limit= (max 1000). Entries are returned oldest first.
+    """
+    since = request.args.get("since", "").strip() or None
+    until = request.args.get("until", "").strip() or None
+    types = [t.strip() for t in request.args.get("type", "").split(",") if t.strip()] or None
+    if not (since or until or types or request.args.get("limit")):
+        return jsonify(read_logs(50))
+    try:
+        limit = max(1, min(1000, int(request.args.get("limit", 100))))
+    except ValueError:
+        limit = 100
+    if until and len(until) == 10:
+        until += " 23:59:59"    # A bare date means the whole day
+    event_log.flush()
+    return jsonify(log_reader.query_logs(since, until, types, limit, LOG_FILE))
 
 @app.route("/api/stats")
 def api_stats():
@@ -355,9 +398,9 @@ def api_students():
 @login_required
 def api_model_info():
     """API endpoint to get model status and training data"""
-    model = get_model_info()
-    activity = get_recent_activity_logs()
     students = get_registered_students()
+    model = get_model_info(students)
+    activity = get_recent_activity_logs()
     return jsonify({
         "model_info": model,
         "activity": activity,
@@ -579,44 +622,31 @@ def api_export_faculty_csv():
     date_from = request.args.get("date_from", "")
     date_to = request.args.get("date_to", "")
 
-    records = database.get_faculty_attendance(
+    records = database.iter_faculty_attendance(
         date_from=date_from or None,
         date_to=date_to or None
     )
-
-    write_log(f"Exporting {len(records)} faculty attendance records to CSV.", "info")
-
-    import io
-    if not records:
+    first, records = peek(records)
+    if first is None:
         return jsonify({"success": False, "message": "No faculty attendance data to export."}), 400
 
-    output = io.StringIO()
-    output.write('\ufeff')  # UTF-8 BOM
-    writer = csv.writer(output)
-    writer.writerow(["Faculty Name", "Employee ID", "Department", "Designation", "Date", "Check-In", "Check-Out", "Work Hours", "Status", "Remarks"])
-
-    for r in records:
-        writer.writerow([
-            r.get("full_name", ""),
-            r.get("employee_id", "N/A"),
-            r.get("department", "N/A"),
-            r.get("designation", ""),
-            r.get("date", ""),
-            r.get("check_in", "—"),
-            r.get("check_out", "—"),
-            f"{r.get('work_hours', 0):.2f}" if r.get('work_hours') else "—",
-            r.get("status", ""),
-            r.get("remarks", "")
-        ])
-
-    csv_data = output.getvalue()
-    output.close()
+    rows = ([
+        r.get("full_name", ""),
+        r.get("employee_id", "N/A"),
+        r.get("department", "N/A"),
+        r.get("designation", ""),
+        r.get("date", ""),
+        r.get("check_in", "—"),
+        r.get("check_out", "—"),
+        f"{r.get('work_hours', 0):.2f}" if r.get('work_hours') else "—",
+        r.get("status", ""),
+        r.get("remarks", "")
+    ] for r in records)
 
     filename = f"faculty_attendance_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    return Response(
-        csv_data,
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    return csv_stream_response(
+        ["Faculty Name", "Employee ID", "Department", "Designation", "Date", "Check-In", "Check-Out", "Work Hours", "Status", "Remarks"],
+        rows, filename, "faculty attendance records"
     )
 
 
@@ -690,6 +720,7 @@ def api_register():
 
     # Build folder name: "Name_RollNumber" if roll number provided, else just "Name"
     folder_name = f"{name}_{roll_number}" if roll_number else name
+    dataset_changed(folder_name)
 
     # Clean stale DeepFace cache so embeddings are rebuilt with new student
     import glob
@@ -856,47 +887,35 @@ def reports():
     status_filter = request.args.get("status", "all").lower()
     date_from = request.args.get("date_from", "")
     date_to = request.args.get("date_to", "")
-    page = int(request.args.get("page", 1))
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+    except ValueError:
+        page = 1
     per_page = 10
 
-    # Get records from SQLite (filtered directly at DB level if applicable)
-    filtered = database.get_attendance_records(date_from, date_to, search_q)
-    
-    # We still need all records for some stats calculations or we can fetch stats directly
-    all_records = database.get_attendance_records()
-
-    # Stats for today
-    today = datetime.now().strftime("%Y-%m-%d")
-    today_all = [r for r in all_records if r["date"] == today]
-    today_unique_names = set(r["name"] for r in today_all)
-    total_registered = len(get_registered_students())
+    # Counts, averages and the page itself are computed by SQLite, not in Python
+    summary = database.get_attendance_summary()
+    total_registered = database.get_total_students_count()
 
     stats = {
-        "present_today": len(today_unique_names),
-        "absent_today": max(0, total_registered - len(today_unique_names)),
+        "present_today": summary["present"],
+        "absent_today": max(0, total_registered - summary["present"]),
         "late_arrivals": 0,
         "avg_attendance": "N/A"
     }
 
-    # Calculate average attendance percentage
-    if total_registered > 0:
-        # Get unique dates
-        all_dates = set(r["date"] for r in all_records)
-        if all_dates:
-            total_attend_per_day = []
-            for d in all_dates:
-                day_names = set(r["name"] for r in all_records if r["date"] == d)
-                total_attend_per_day.append(len(day_names))
-            avg = sum(total_attend_per_day) / len(total_attend_per_day)
-            stats["avg_attendance"] = f"{(avg / total_registered * 100):.1f}%" if total_registered > 0 else "N/A"
+    # Average attendance percentage: mean distinct students per day with attendance
+    avg = database.get_average_daily_attendance()
+    if total_registered > 0 and avg is not None:
+        stats["avg_attendance"] = f"{(avg / total_registered * 100):.1f}%"
 
     # Pagination
-    total_records = len(filtered)
+    total_records = database.count_attendance_records(date_from, date_to, search_q)
     total_pages = max(1, (total_records + per_page - 1) // per_page)
     page = min(page, total_pages)
     start_idx = (page - 1) * per_page
     end_idx = start_idx + per_page
-    page_records = filtered[start_idx:end_idx]
+    page_records = database.get_attendance_records(date_from, date_to, search_q, limit=per_page, offset=start_idx)
 
     return render_template("reports.html",
         records=page_records,
@@ -923,59 +942,35 @@ def export_csv():
     date_from = request.args.get("date_from", "")
     date_to = request.args.get("date_to", "")
 
-    all_records = get_attendance_records()
-    all_records = list(reversed(all_records))
-
-    filtered = []
-    for r in all_records:
-        if search_q and search_q.lower() not in r["name"].lower():
-            continue
-        if date_from and r["date"] < date_from:
-            continue
-        if date_to and r["date"] > date_to:
-            continue
-        filtered.append(r)
-
-    write_log(f"Exporting {len(filtered)} attendance records to CSV.", "info")
-    
-    import io
-    import csv
-    if not filtered:
+    # Filters run in SQLite; rows are streamed oldest first without loading them all
+    records = database.iter_attendance_records(date_from, date_to, search_q)
+    first, records = peek(records)
+    if first is None:
         flash("❌ No attendance data available to export.")
         return redirect(url_for("reports"))
 
-    output = io.StringIO()
-    output.write('\ufeff')  # UTF-8 BOM for proper Excel compatibility
-    writer = csv.writer(output)
-    writer.writerow(["Student Name", "Roll Number", "Department", "Date", "Time", "Status"])
-    
-    for r in filtered:
-        writer.writerow([
-            r.get("name", "Unknown"),
-            (r.get("roll_number") or "N/A"),
-            (r.get("department") or "N/A").upper(),
-            r.get("date", ""),
-            r.get("time", ""),
-            "Present"
-        ])
-
-    csv_data = output.getvalue()
-    output.close()
+    rows = ([
+        r.get("name", "Unknown"),
+        (r.get("roll_number") or "N/A"),
+        (r.get("department") or "N/A").upper(),
+        r.get("date", ""),
+        r.get("time", ""),
+        "Present"
+    ] for r in records)
 
     filename = f"attendance_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     flash("✅ Report downloaded successfully!")
-    return Response(
-        csv_data,
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    return csv_stream_response(
+        ["Student Name", "Roll Number", "Department", "Date", "Time", "Status"],
+        rows, filename, "attendance records"
     )
 
 
 @app.route("/model")
 @login_required
 def model_page():
-    model = get_model_info()
     students = get_registered_students()
+    model = get_model_info(students)
     activity = get_recent_activity_logs()
     return render_template("model.html", model_info=model, students=students, activity=activity, active='model')
 
@@ -1003,6 +998,7 @@ def register():
         write_log(f"Registration failed: Student {name} already exists", "error")
         flash(f"❌ A student with the name {name} already exists in the registry!")
         return redirect(url_for("register_page"))
+    dataset_changed(name)
 
     kill_camera_processes()
     write_log(f"Registration started for student: {name}", "info")
@@ -1045,6 +1041,7 @@ def delete_student(id):
             write_log(f"Dataset images for '{name}' deleted.", "info")
         except Exception as e:
             write_log(f"Error purging dataset images for '{name}': {e}", "warning")
+    dataset_changed(name)
             
     # Invalidate trainer.yml to enforce retraining on next attendance session
     if os.path.exists(TRAINER_FILE):
@@ -1073,6 +1070,7 @@ def edit_student(id):
         
     success = database.update_student(id, name, roll_number, department, academic_year)
     if success:
+        dataset_changed()
         flash(f"📝 Successfully updated details for {name}.")
         write_log(f"Student ID {id} ({name}) profile updated.", "info")
     else:
@@ -1246,9 +1244,10 @@ def admin_register_student():
         folder_name = f"{name}_{roll}"
         save_path = f"TrainingImage/{folder_name}"
         os.makedirs(save_path, exist_ok=True)
+        dataset_changed(folder_name)
         
         # Launch capture_faces.py in a NEW CONSOLE WINDOW
-        # The script opens the laptop camera, captures YOLO-detected faces for ~5 seconds
+        # The script opens the laptop camera and walks the student through six poses
         write_log(f"Launching face capture for {name} ({roll})", "info")
         try:
             if sys.platform == 'win32':
@@ -1261,8 +1260,11 @@ def admin_register_student():
                     [sys.executable, "capture_faces.py", folder_name]
                 )
             
-            # Wait for capture to complete (camera window runs for ~7 seconds total)
-            process.wait(timeout=30)
+            # Wait for capture to complete (camera window runs for ~30 seconds, plus model loading)
+            process.wait(timeout=CAPTURE_TIMEOUT)
+            
+            if process.returncode == DUPLICATE_EXIT_CODE:
+                return duplicate_capture_response(folder_name, name, roll, username, dob)
             
             # Mark face as registered in DB
             conn = database.get_connection()
@@ -1270,6 +1272,7 @@ def admin_register_student():
             cursor.execute("UPDATE students SET face_registered = 1 WHERE roll_number = ?", (roll,))
             conn.commit()
             conn.close()
+            dataset_changed(folder_name)
             
             write_log(f"Face capture completed for {name} ({roll})", "success")
             return jsonify({
@@ -1342,6 +1345,7 @@ def delete_student_admin(student_id):
         # Delete from DB
         cursor.execute("DELETE FROM students WHERE id = ?", (student_id,))
         conn.commit()
+        dataset_changed()
         
         write_log(f"Deleted student ID {student_id} and their attendance records", "info")
         return jsonify({'success': True, 'message': 'Student deleted successfully'})
@@ -1545,7 +1549,7 @@ def api_take_extra_class():
                 cmd_args.append(rtsp_url)
                 write_log(f"Using IP camera for extra class: {rtsp_url}", "info")
             if sys.platform == 'win32':
-                process = subprocess.Popen(cmd_args, creationflags=subprocess.CREATE_NEW_CONSOLE)
+                process = subprocess.Popen(cmd_args, creationflags=subprocess.CREATE_NEW_CONSOLE | subprocess.CREATE_NEW_PROCESS_GROUP)
             else:
                 process = subprocess.Popen(cmd_args)
 
@@ -1565,7 +1569,7 @@ def api_take_extra_class():
                 'total_marked': total_marked
             })
         except subprocess.TimeoutExpired:
-            process.kill()
+            stop_process(process)   # Lets the recognizer commit or spool its queued marks
             return jsonify({'success': True, 'message': 'Scan timed out.', 'session_id': session_id})
         except Exception as cam_err:
             return jsonify({'success': False, 'message': f'Camera error: {str(cam_err)}'}), 500
@@ -1652,7 +1656,7 @@ def api_take_attendance():
             if sys.platform == 'win32':
                 process = subprocess.Popen(
                     cmd_args,
-                    creationflags=subprocess.CREATE_NEW_CONSOLE
+                    creationflags=subprocess.CREATE_NEW_CONSOLE | subprocess.CREATE_NEW_PROCESS_GROUP
                 )
             else:
                 process = subprocess.Popen(cmd_args)
@@ -1681,7 +1685,7 @@ def api_take_attendance():
             })
             
         except subprocess.TimeoutExpired:
-            process.kill()
+            stop_process(process)   # Lets the recognizer commit or spool its queued marks
             write_log("Attendance scan timed out", "warning")
             return jsonify({
                 'success': True,
@@ -2413,6 +2417,7 @@ def admin_register_student_v2():
         folder_name = f"{name}_{roll}"
         save_path = os.path.join('TrainingImage', folder_name)
         os.makedirs(save_path, exist_ok=True)
+        dataset_changed(folder_name)
 
         write_log(f"Launching face capture for {name} ({roll})", "info")
         try:
@@ -2423,13 +2428,17 @@ def admin_register_student_v2():
                 )
             else:
                 process = subprocess.Popen([sys.executable, "capture_faces.py", folder_name])
-            process.wait(timeout=30)
+            process.wait(timeout=CAPTURE_TIMEOUT)
+
+            if process.returncode == DUPLICATE_EXIT_CODE:
+                return duplicate_capture_response(folder_name, name, roll, username, dob)
 
             conn2 = database.get_connection()
             cursor2 = conn2.cursor()
             cursor2.execute("UPDATE students SET face_registered = 1 WHERE roll_number = ?", (roll,))
             conn2.commit()
             conn2.close()
+            dataset_changed(folder_name)
             write_log(f"Face capture completed for {name} ({roll})", "success")
             return jsonify({'success': True, 'message': f'Student registered & face captured!', 'credentials': {'username': username, 'password': dob}})
         except subprocess.TimeoutExpired:
@@ -2440,6 +2449,140 @@ def admin_register_student_v2():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+# ============================================================
+# RESUMABLE ENROLLMENT UPLOADS (no camera on the Flask host)
+# ============================================================
+# 1. POST   /api/admin/enrollment-uploads                  {student_id | roll, filename, size}
+# 2. PUT    /api/admin/enrollment-uploads/<id>?offset=N    raw chunk bytes (repeat)
+# 3. GET    /api/admin/enrollment-uploads/<id>             progress, use received_bytes to resume
+# 4. POST   /api/admin/enrollment-uploads/<id>/complete    queue for validation + embedding
+
+@app.route('/api/admin/enrollment-uploads', methods=['POST'])
+def api_create_enrollment_upload():
+    """Start a resumable upload of enrollment images, a zip or a short clip"""
+    try:
+        data = request.get_json() or {}
+        filename = os.path.basename(str(data.get('filename', '')).strip())
+        size = data.get('size')
+        student_id = data.get('student_id')
+        roll = str(data.get('roll', '')).strip().upper()
+
+        if not filename or not isinstance(size, int) or size <= 0:
+            return jsonify({'success': False, 'message': 'filename and a positive integer size are required'}), 400
+        if not filename.lower().endswith(enrollment_worker.ALLOWED_EXTENSIONS):
+            return jsonify({'success': False, 'message': 'Only images, zip archives or video clips are accepted'}), 400
+        if size > enrollment_worker.MAX_UPLOAD_SIZE:
+            return jsonify({'success': False, 'message': 'File is too large'}), 413
+
+        student = None
+        if student_id:
+            student = database.get_student_by_id(int(student_id))
+        elif roll:
+            conn = database.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM students WHERE UPPER(roll_number) = ?", (roll,))
+            row = cursor.fetchone()
+            conn.close()
+            student = dict(row) if row else None
+        if not student:
+            return jsonify({'success': False, 'message': 'Student not found'}), 404
+
+        import uuid
+        upload_id = uuid.uuid4().hex
+        database.create_enrollment_upload(upload_id, student['id'], filename, size)
+        write_log(f"Enrollment upload started for {student['name']} ({filename}, {size} bytes)", "info")
+        return jsonify({
+            'success': True,
+            'upload_id': upload_id,
+            'received_bytes': 0,
+            'chunk_size': enrollment_worker.CHUNK_SIZE
+        }), 201
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/admin/enrollment-uploads/<upload_id>', methods=['PUT'])
+def api_upload_enrollment_chunk(upload_id):
+    """Append one chunk; the offset must equal the bytes already received"""
+    try:
+        upload = database.get_enrollment_upload(upload_id)
+        if not upload:
+            return jsonify({'success': False, 'message': 'Upload not found'}), 404
+        if upload['status'] != 'uploading':
+            return jsonify({'success': False, 'message': f"Upload is already {upload['status']}"}), 409
+
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            offset = upload['received_bytes']
+        chunk = request.get_data(cache=False)
+        received = upload['received_bytes']
+
+        # A retried chunk that is already on disk is acknowledged, a gap is rejected
+        if offset + len(chunk) <= received:
+            return jsonify({'success': True, 'received_bytes': received})
+        if offset > received:
+            return jsonify({'success': False, 'message': 'Chunk offset is ahead of received data', 'received_bytes': received}), 409
+        if offset + len(chunk) > upload['total_size']:
+            return jsonify({'success': False, 'message': 'Chunk exceeds declared file size', 'received_bytes': received}), 400
+
+        end = enrollment_worker.write_chunk(upload_id, offset, chunk)
+        # Concurrent retries of the same range must not move the counter backwards
+        received = database.advance_enrollment_upload(upload_id, end)
+        return jsonify({'success': True, 'received_bytes': received})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/admin/enrollment-uploads/<upload_id>', methods=['GET'])
+def api_enrollment_upload_status(upload_id):
+    """Upload progress and processing status"""
+    upload = database.get_enrollment_upload(upload_id)
+    if not upload:
+        return jsonify({'success': False, 'message': 'Upload not found'}), 404
+    return jsonify({'success': True, **upload})
+
+@app.route('/api/admin/enrollment-uploads/<upload_id>/complete', methods=['POST'])
+def api_complete_enrollment_upload(upload_id):
+    """Hand a fully received upload to the background enrollment worker"""
+    try:
+        upload = database.get_enrollment_upload(upload_id)
+        if not upload:
+            return jsonify({'success': False, 'message': 'Upload not found'}), 404
+        if upload['status'] != 'uploading':
+            return jsonify({'success': True, 'status': upload['status']})
+        if upload['received_bytes'] != upload['total_size']:
+            return jsonify({
+                'success': False,
+                'message': 'Upload is incomplete',
+                'received_bytes': upload['received_bytes'],
+                'total_size': upload['total_size']
+            }), 409
+        enrollment_worker.enqueue(upload_id)
+        return jsonify({'success': True, 'status': 'queued', 'upload_id': upload_id}), 202
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/admin/dataset-drift', methods=['GET'])
+def api_dataset_drift():
+    """Last drift report between TrainingImage/, students and the gallery (?refresh=1 re-checks now)"""
+    try:
+        reconciler = dataset_reconciler.get_reconciler(dataset_catalog.get_catalog(DATASET_DIR))
+        if request.args.get('refresh') == '1' or reconciler.report is None:
+            report = reconciler.run_once(fix=False, force=True)
+        else:
+            report = reconciler.report
+        return jsonify({'success': True, 'auto_fix': reconciler.auto_fix, **report})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/admin/dataset-drift/reconcile', methods=['POST'])
+def api_reconcile_dataset():
+    """Detect and fix drift now"""
+    try:
+        reconciler = dataset_reconciler.get_reconciler(dataset_catalog.get_catalog(DATASET_DIR))
+        report = reconciler.run_once(fix=True, force=True)
+        return jsonify({'success': True, **report})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 # ============================================================
 # MAIN
 # ============================================================
@@ -2448,5 +2591,8 @@ def admin_register_student_v2():
 if __name__ == "__main__":
     init_log()
     write_log("Flask server starting on port 8000", "success")
+    # The debug reloader also runs this block in its watcher process; only the serving child resumes jobs
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        enrollment_worker.resume_pending()
     app.run(debug=True, port=8000)
 
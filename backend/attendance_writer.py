@@ -0,0 +1,213 @@
+import os
+import glob
+import json
+import time
+import threading
+from datetime import datetime
+
+import database
+
+# ==========================================
+# WRITE-BEHIND ATTENDANCE QUEUE
+# ==========================================
+# database.mark_attendance resolves the folder name (up to four queries),
+# opens a connection and commits once per student, all inside the camera
+# loop. The recognizer instead:
+#   - resolves every dataset folder to a student id once at session start
+#   - submit()s confirmed students, which only appends to a list
+#   - lets one worker thread insert everything pending in a single
+#     transaction every FLUSH_INTERVAL seconds
+# close() flushes whatever is left. Rows that still cannot be written (the
+# database is locked or gone) are saved next to SPOOL_FILE as
+# pending_attendance.<pid>-<n>.jsonl (written to a temp name, then renamed
+# in whole) and replayed by the next writer, so a confirmed mark is never
+# dropped. Several recognizers may run at once: a writer claims each spool
+# file by renaming it before reading, so only one of them replays it. A file
+# that cannot be read is renamed back, and one claimed by a process that died
+# before replaying it is picked up again.
+
+FLUSH_INTERVAL = 0.5        # Seconds between batched commits
+RETRY_DELAY = 2.0           # Back-off after a failed commit
+CLOSE_TIMEOUT = 10.0        # Seconds close() keeps retrying before spooling
+SPOOL_FILE = "pending_attendance.jsonl"
+
+def _pid_alive(pid):
+    """Whether a process with this id still runs (assumed alive when that cannot be told)"""
+    if pid == os.getpid():
+        return True
+    try:
+        import psutil
+        return psutil.pid_exists(pid)
+    except ImportError:
+        pass
+    if os.name == "nt":
+        return True     # os.kill(pid, 0) would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+class AttendanceWriter:
+    """Queues attendance rows and commits them in batches on a worker thread"""
+
+    def __init__(self, folder_names, subject_code="", subject_name="", period="", faculty_name="",
+                 session_id=None, on_result=None, flush_interval=FLUSH_INTERVAL, spool_file=SPOOL_FILE):
+        self.session = (subject_code, subject_name, period, faculty_name, session_id)
+        self.student_ids = database.resolve_student_ids(folder_names)
+        self.on_result = on_result
+        self.flush_interval = flush_interval
+        self.spool_file = spool_file
+        self.results = {}
+        self._pending = []          # [(folder, row, submitted_at), ...]
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self._latencies = []
+        self._batches = 0
+        self._load_spool()
+        self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+        self._thread.start()
+
+    def student_id(self, folder):
+        """Student id for a folder, resolving folders that appeared after session start"""
+        if folder not in self.student_ids:
+            student = database.get_student_by_folder_name(folder)
+            self.student_ids[folder] = student['id'] if student else None
+        return self.student_ids[folder]
+
+    def submit(self, folder):
+        """Queue a mark stamped with the current time. Returns 'queued' or 'not_found'."""
+        student_id = self.student_id(folder)
+        if student_id is None:
+            return 'not_found'
+        now = datetime.now()
+        row = (student_id, now.strftime("%Y-%m-%d"), now.strftime("%H:%M:%S")) + self.session
+        with self._lock:
+            self._pending.append((folder, row, time.perf_counter()))
+        return 'queued'
+
+    def _take(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        return batch
+
+    def _flush(self):
+        """Commit everything pending; on failure put it back and return False"""
+        batch = self._take()
+        if not batch:
+            return True
+        try:
+            outcomes = database.mark_attendance_batch([row for _, row, _ in batch])
+        except Exception as e:
+            print(f"  ⚠️  Attendance write failed, will retry: {e}")
+            with self._lock:
+                self._pending = batch + self._pending
+            return False
+        committed_at = time.perf_counter()
+        self._batches += 1
+        for (folder, _, submitted_at), outcome in zip(batch, outcomes):
+            self._latencies.append(committed_at - submitted_at)
+            if folder is not None:
+                self.results[folder] = outcome
+                if self.on_result:
+                    try:
+                        self.on_result(folder, outcome, committed_at)
+                    except Exception:
+                        pass
+        return True
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if not self._flush():
+                time.sleep(RETRY_DELAY)
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        """Stop the worker and flush the rest; spool rows that still cannot be written"""
+        self._stop = True
+        self._wake.set()
+        self._thread.join()
+        deadline = time.time() + timeout
+        while not self._flush() and time.time() < deadline:
+            time.sleep(min(RETRY_DELAY, max(0.0, deadline - time.time())))
+        leftover = self._take()
+        if leftover:
+            self._spool(leftover)
+        return len(leftover)
+
+    def _spool_paths(self):
+        """
+        [(path, original), ...] for the legacy shared spool file, every
+        per-process one and any file a writer claimed but never finished
+        replaying (its process is gone); original is the name to restore.
+        """
+        stem, ext = os.path.splitext(self.spool_file)
+        paths = [(p, p) for p in glob.glob(f"{glob.escape(stem)}.*{ext}")]
+        if os.path.exists(self.spool_file):
+            paths.append((self.spool_file, self.spool_file))
+        for p in glob.glob(f"{glob.escape(stem)}*{ext}.*.replaying"):
+            original, pid = p[:-len(".replaying")].rsplit(".", 1)
+            if pid.isdigit() and not _pid_alive(int(pid)):
+                paths.append((p, original))
+        return sorted(paths)
+
+    def _spool(self, batch):
+        stem, ext = os.path.splitext(self.spool_file)
+        path = f"{stem}.{os.getpid()}-{time.time_ns()}{ext}"
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for folder, row, _ in batch:
+                    f.write(json.dumps({"folder": folder, "row": list(row)}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            print(f"  ⚠️  {len(batch)} attendance mark(s) saved to {path} for the next session")
+        except Exception as e:
+            print(f"  ❌ Could not save {len(batch)} pending attendance mark(s): {e}")
+
+    def _load_spool(self):
+        """Queue rows left behind by earlier sessions (they keep their own date and session)"""
+        entries = []
+        for path, original in self._spool_paths():
+            claimed = f"{original}.{os.getpid()}.replaying"
+            try:
+                os.replace(path, claimed)
+            except OSError:
+                continue        # Another writer claimed it first
+            try:
+                with open(claimed, "r", encoding="utf-8") as f:
+                    rows = [json.loads(line) for line in f if line.strip()]
+                os.remove(claimed)
+                entries.extend(rows)
+            except Exception as e:
+                print(f"  ⚠️  Could not read {claimed}: {e}")
+                try:
+                    os.replace(claimed, original)     # Keep it for the next writer
+                except OSError:
+                    pass
+        now = time.perf_counter()
+        # folder=None: replayed rows are not reported as this session's marks
+        self._pending.extend((None, tuple(e["row"]), now) for e in entries)
+        if entries:
+            print(f"  ℹ️  Replaying {len(entries)} attendance mark(s) from an earlier session")
+
+    @property
+    def marked(self):
+        return sorted(f for f, r in self.results.items() if r == 'success')
+
+    def stats(self):
+        """Submit-to-commit latency and batch count"""
+        if not self._latencies:
+            return {"rows": 0, "batches": self._batches, "avg_ms": 0.0, "max_ms": 0.0}
+        ms = [v * 1000.0 for v in self._latencies]
+        return {
+            "rows": len(ms),
+            "batches": self._batches,
+            "avg_ms": round(sum(ms) / len(ms), 1),
+            "max_ms": round(max(ms), 1),
+        }
@@ -0,0 +1,315 @@
+import os
+import re
+import sys
+import glob
+import time
+import shutil
+import zipfile
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
+
+import database
+import face_gallery
+import face_detectors
+import duplicate_check
+from image_writer import AsyncImageWriter
+
+# ==========================================
+# BULK OFFLINE ENROLLMENT
+# ==========================================
+# Usage:
+#   python bulk_enroll.py <folder | archive.zip | video> [--workers N] [--replace]
+#
+# Input follows the TrainingImage naming convention, one student per entry:
+#   intake/Sagar Kumar_21104131014/*.jpg     (photo folders, any depth)
+#   intake.zip  ->  Sagar Kumar_21104131014/*.jpg
+#   intake/Sagar Kumar_21104131014.mp4       (one short clip per student)
+
+DATASET_DIR = face_gallery.DATASET_DIR
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+TARGET_SIZE = 160
+MIN_FACE_SIZE = 80             # Same minimum as recognize_attendance.py
+BLUR_THRESHOLD = 60.0          # Laplacian variance below this = motion blur / out of focus
+MAX_IMAGES_PER_STUDENT = 22    # Same total as the guided capture poses
+VIDEO_SAMPLE_FPS = 4           # Frames per second sampled from enrollment clips
+MAX_VIDEO_FRAMES = 120
+
+def parse_folder_name(folder_name):
+    """Split 'Sagar Kumar_21104131014' into ('Sagar Kumar', '21104131014')"""
+    if '_' in folder_name:
+        name, roll = folder_name.rsplit('_', 1)
+        if re.search(r'\d', roll) and name.strip():
+            return name.strip(), roll.strip().upper()
+    return folder_name.strip(), ""
+
+def is_safe_folder_name(folder_name):
+    """A single path component: not empty, '.', '..', and without path separators"""
+    if not folder_name or folder_name.strip() in ('.', '..') or '\0' in folder_name:
+        return False
+    return not any(sep in folder_name for sep in ('/', '\\', os.sep, os.altsep) if sep)
+
+def student_dir_for(folder_name):
+    """TrainingImage/<folder_name>, refusing names that would resolve outside DATASET_DIR"""
+    if not is_safe_folder_name(folder_name):
+        raise ValueError(f"Unsafe student folder name: {folder_name!r}")
+    root = os.path.realpath(DATASET_DIR)
+    student_dir = os.path.join(DATASET_DIR, folder_name)
+    if os.path.dirname(os.path.realpath(student_dir)) != root:
+        raise ValueError(f"Student folder {folder_name!r} resolves outside {DATASET_DIR}")
+    return student_dir
+
+# ==========================================
+# JOB DISCOVERY
+# ==========================================
+def collect_jobs(source):
+    """Map each student folder name to a list of (kind, location, member) media sources"""
+    jobs = {}
+
+    def add(folder, item):
+        if not is_safe_folder_name(folder):
+            print(f"  ⚠️  Skipping {item[2] or item[1]}: unusable student folder name {folder!r}")
+            return
+        jobs.setdefault(folder, []).append(item)
+
+    def add_zip(zip_path):
+        with zipfile.ZipFile(zip_path) as zf:
+            for member in zf.namelist():
+                if member.endswith('/'):
+                    continue
+                parts = member.replace('\\', '/').split('/')
+                lower = member.lower()
+                if lower.endswith(IMAGE_EXTENSIONS) and len(parts) >= 2:
+                    add(parts[-2], ("zip", zip_path, member))
+                elif lower.endswith(VIDEO_EXTENSIONS):
+                    add(os.path.splitext(parts[-1])[0], ("zipvideo", zip_path, member))
+
+    if os.path.isfile(source):
+        lower = source.lower()
+        if lower.endswith('.zip'):
+            add_zip(source)
+        elif lower.endswith(VIDEO_EXTENSIONS):
+            add(os.path.splitext(os.path.basename(source))[0], ("video", source, None))
+        return jobs
+
+    for entry in sorted(os.listdir(source)):
+        path = os.path.join(source, entry)
+        lower = entry.lower()
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for f in sorted(files):
+                    if f.lower().endswith(IMAGE_EXTENSIONS):
+                        add(entry, ("image", os.path.join(root, f), None))
+        elif lower.endswith(VIDEO_EXTENSIONS):
+            add(os.path.splitext(entry)[0], ("video", path, None))
+        elif lower.endswith('.zip'):
+            add_zip(path)
+    return jobs
+
+# ==========================================
+# WORKER PROCESS
+# ==========================================
+_detector = None
+
+def init_models():
+    """Load the face detector and ArcFace once per worker process (no-op if already loaded)"""
+    global _detector
+    if _detector is not None:
+        return
+    _detector = face_detectors.create_detector()
+    face_gallery.embed_face(np.zeros((TARGET_SIZE, TARGET_SIZE, 3), dtype=np.uint8))
+
+def _iter_video(path):
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25
+    step = max(1, int(round(fps / VIDEO_SAMPLE_FPS)))
+    idx = 0
+    yielded = 0
+    while yielded < MAX_VIDEO_FRAMES:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if idx % step == 0:
+            yielded += 1
+            yield frame
+        idx += 1
+    cap.release()
+
+def _iter_frames(sources):
+    """Yield BGR frames from every media source of one student"""
+    for kind, location, member in sources:
+        if kind == "image":
+            img = cv2.imread(location)
+            if img is not None:
+                yield img
+        elif kind == "video":
+            yield from _iter_video(location)
+        elif kind == "zip":
+            with zipfile.ZipFile(location) as zf:
+                data = np.frombuffer(zf.read(member), dtype=np.uint8)
+            img = cv2.imdecode(data, cv2.IMREAD_COLOR)
+            if img is not None:
+                yield img
+        elif kind == "zipvideo":
+            tmp_dir = tempfile.mkdtemp(prefix="enroll_")
+            try:
+                with zipfile.ZipFile(location) as zf:
+                    tmp_path = zf.extract(member, tmp_dir)
+                yield from _iter_video(tmp_path)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def process_student(folder_name, sources):
+    """Detect, align, filter and embed every face for one student"""
+    crops = []
+    embeddings = []
+    stats = {"frames": 0, "no_face": 0, "too_small": 0, "blurry": 0}
+
+    for frame in _iter_frames(sources):
+        stats["frames"] += 1
+        detections = _detector.detect(frame)
+        if not detections:
+            stats["no_face"] += 1
+            continue
+        # One student per photo/clip: keep the largest face
+        best = max(detections, key=lambda d: (d.box[2] - d.box[0]) * (d.box[3] - d.box[1]))
+        x1, y1, x2, y2 = best.box
+        if x2 - x1 < MIN_FACE_SIZE or y2 - y1 < MIN_FACE_SIZE:
+            stats["too_small"] += 1
+            continue
+
+        crop = face_gallery.crop_aligned_face(frame, best.box, best.landmarks)
+        if crop.size == 0:
+            continue
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        if cv2.Laplacian(gray, cv2.CV_64F).var() < BLUR_THRESHOLD:
+            stats["blurry"] += 1
+            continue
+
+        try:
+            embeddings.append(face_gallery.embed_face(crop))
+            crops.append(crop)
+        except Exception:
+            continue
+
+    if not embeddings:
+        return folder_name, [], np.empty((0, 0), dtype=np.float32), stats
+
+    keep = face_gallery.select_diverse(np.vstack(embeddings), limit=MAX_IMAGES_PER_STUDENT)
+    stats["kept"] = len(keep)
+    return folder_name, [crops[i] for i in keep], np.vstack([embeddings[i] for i in keep]), stats
+
+# ==========================================
+# MAIN
+# ==========================================
+def _next_image_index(folder):
+    """First free '<n>.jpg' index inside an existing student folder"""
+    indices = [int(os.path.splitext(f)[0]) for f in os.listdir(folder) if os.path.splitext(f)[0].isdigit()]
+    return max(indices) + 1 if indices else 0
+
+def save_enrollment(folder, crops, embeddings, gallery, writer, replace=False):
+    """Queue a student's face crops for writing and add their embeddings to the gallery"""
+    student_dir = student_dir_for(folder)
+    if replace and os.path.isdir(student_dir):
+        shutil.rmtree(student_dir)
+    os.makedirs(student_dir, exist_ok=True)
+    first = _next_image_index(student_dir)
+    paths = [os.path.join(student_dir, f"{first + i}.jpg") for i in range(len(crops))]
+    for path, crop in zip(paths, crops):
+        writer.submit(path, crop)
+    if replace:
+        gallery.replace(folder, embeddings, paths)
+    else:
+        gallery.add(folder, embeddings, paths)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk offline student enrollment")
+    parser.add_argument("source", help="Directory tree, .zip archive or single video file")
+    parser.add_argument("--workers", type=int, default=max(1, min(4, (os.cpu_count() or 2) - 1)))
+    parser.add_argument("--department", default="")
+    parser.add_argument("--academic-year", default="")
+    parser.add_argument("--replace", action="store_true", help="Replace existing images of re-enrolled students")
+    parser.add_argument("--allow-duplicates", action="store_true", help="Enroll students even if they match another identity")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print(f"[ERROR] Source not found: {args.source}")
+        sys.exit(1)
+
+    jobs = collect_jobs(args.source)
+    if not jobs:
+        print("[ERROR] No student folders, archives or videos found")
+        sys.exit(1)
+
+    print(f"[INFO] {len(jobs)} student(s) found, using {args.workers} worker(s)")
+    database.init_db()
+    gallery = face_gallery.FaceGallery.load()
+    writer = AsyncImageWriter(target_size=TARGET_SIZE, jpeg_quality=95, max_queue=256)
+    student_rows = []
+    enrolled = []
+    failed = []
+    flagged = []
+    start = time.time()
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_models) as pool:
+        futures = {pool.submit(process_student, folder, sources): folder for folder, sources in jobs.items()}
+        for done, future in enumerate(as_completed(futures), 1):
+            folder = futures[future]
+            try:
+                folder, crops, embeddings, stats = future.result()
+            except Exception as e:
+                failed.append(folder)
+                print(f"  [{done}/{len(jobs)}] ❌ {folder}: {e}")
+                continue
+            if not crops:
+                failed.append(folder)
+                print(f"  [{done}/{len(jobs)}] ⚠️  {folder}: no usable face ({stats})")
+                continue
+
+            # The gallery grows as results arrive, so this also catches duplicates within the intake
+            duplicates = duplicate_check.find_duplicates(gallery, embeddings, exclude=folder)
+            if duplicates and not args.allow_duplicates:
+                flagged.append((folder, duplicates))
+                print(f"  [{done}/{len(jobs)}] ⚠️  {folder}: possible duplicate of {duplicates[0][0]} ({duplicates[0][1]:.3f}) — not enrolled")
+                continue
+
+            save_enrollment(folder, crops, embeddings, gallery, writer, replace=args.replace)
+            enrolled.append(folder)
+            name, roll = parse_folder_name(folder)
+            student_rows.append((name, roll, args.department, args.academic_year))
+            print(f"  [{done}/{len(jobs)}] ✅ {folder}: {len(crops)} image(s) from {stats['frames']} frame(s)")
+
+    writer.close()
+    for err in writer.errors:
+        print(f"[WARNING] Failed to save image {err}")
+
+    database.upsert_students(student_rows)
+    gallery.save(labels=enrolled)
+
+    # Stale DeepFace caches would hide the new students from DeepFace.find
+    for pattern in ("representations_*.pkl", "ds_model_*.pkl"):
+        for f in glob.glob(os.path.join(DATASET_DIR, pattern)):
+            try:
+                os.remove(f)
+            except Exception:
+                pass
+
+    elapsed = time.time() - start
+    print("=" * 60)
+    print(f"[OK] Enrolled {len(student_rows)}/{len(jobs)} student(s) in {elapsed:.1f}s")
+    if failed:
+        print(f"[WARNING] {len(failed)} student(s) skipped: {', '.join(sorted(failed))}")
+    if flagged:
+        print(f"[WARNING] {len(flagged)} likely duplicate enrollment(s) held back (use --allow-duplicates to force):")
+        for folder, duplicates in flagged:
+            matches = ", ".join(f"{label} ({dist:.3f})" for label, dist in duplicates)
+            print(f"  ⚠️  {folder}  ->  {matches}")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,20 @@
-import cv2
-import numpy as np
 import os
 import sys
 import time
 import glob
-from ultralytics import YOLO
+import shutil
+from startup_profiler import StartupProfiler
+
+profiler = StartupProfiler("capture_faces")
+# TensorFlow (ArcFace) imports in the background while YOLO / PyTorch load
+profiler.prefetch("deepface.DeepFace")
+with profiler.stage("import cv2/numpy/app", "imports"):
+    import cv2
+    import numpy as np
+    import face_gallery
+    import duplicate_check
+    import dataset_catalog
+    from image_writer import AsyncImageWriter, AsyncEmbedder
 
 # -------------------------
 # STUDENT NAME (TERMINAL + WEB)
@@ -13,10 +23,14 @@ if len(sys.argv) > 1:
     student_name = sys.argv[1]
 else:
     student_name = input("Enter student name: ")
+ALLOW_DUPLICATE = "--allow-duplicate" in sys.argv[2:]
 
 dataset_path = "TrainingImage"
 student_path = os.path.join(dataset_path, student_name)
-os.makedirs(student_path, exist_ok=True)
+# Images go to a staging folder and reach TrainingImage/ only after the duplicate check
+staging_path = os.path.join(dataset_catalog.CAPTURE_STAGING_DIR, student_name)
+shutil.rmtree(staging_path, ignore_errors=True)     # Left over by a killed capture
+os.makedirs(staging_path, exist_ok=True)
 
 # -------------------------
 # CLEAN STALE DEEPFACE CACHE
@@ -25,41 +39,59 @@ cache_patterns = [
     os.path.join(dataset_path, "representations_*.pkl"),
     os.path.join(dataset_path, "ds_model_*.pkl"),
 ]
-for pattern in cache_patterns:
-    for f in glob.glob(pattern):
-        try:
-            os.remove(f)
-            print(f"  Cleaned stale cache: {os.path.basename(f)}")
-        except Exception:
-            pass
+with profiler.stage("clean DeepFace cache", "cache"):
+    for pattern in cache_patterns:
+        for f in glob.glob(pattern):
+            try:
+                os.remove(f)
+                print(f"  Cleaned stale cache: {os.path.basename(f)}")
+            except Exception:
+                pass
 
 # -------------------------
 # LOAD YOLO MODEL
 # -------------------------
-print("[1/3] Loading YOLOv8 face model...")
+print("[1/4] Loading YOLOv8 face model...")
 try:
-    model = YOLO('yolov8n-face.pt')
+    with profiler.stage("import ultralytics", "imports"):
+        from ultralytics import YOLO
+    with profiler.stage("load YOLO", "models"):
+        model = YOLO('yolov8n-face.pt')
     print("  Model loaded")
 except Exception as e:
     print(f"  Failed to load YOLO model: {e}")
     sys.exit(1)
 
+# -------------------------
+# LOAD ARCFACE EMBEDDER (diversity check)
+# -------------------------
+print("[2/4] Loading ArcFace embedding model...")
+embedder_ready = True
+try:
+    with profiler.stage("load ArcFace", "models"):
+        face_gallery.embed_face(np.zeros((160, 160, 3), dtype=np.uint8))
+    print("  Embedder ready")
+except Exception as e:
+    embedder_ready = False
+    print(f"  Embedder unavailable, falling back to timed capture: {e}")
+
 # -------------------------
 # CAMERA SETUP
 # -------------------------
-print("[2/3] Opening camera...")
-if sys.platform == 'win32':
-    cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-else:
-    cap = cv2.VideoCapture(0)
+print("[3/4] Opening camera...")
+with profiler.stage("open camera", "camera"):
+    if sys.platform == 'win32':
+        cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
+    else:
+        cap = cv2.VideoCapture(0)
 
-if not cap.isOpened():
-    print("[ERROR] Camera not accessible")
-    sys.exit(1)
+    if not cap.isOpened():
+        print("[ERROR] Camera not accessible")
+        sys.exit(1)
 
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-cap.set(cv2.CAP_PROP_FPS, 30)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    cap.set(cv2.CAP_PROP_FPS, 30)
 print("  Camera ready")
 
 WINDOW_NAME = "Smart Attendance - Face Registration"
@@ -172,25 +204,73 @@ def draw_status_badge(frame, x, y, text, color):
 # =========================================================
 
 POSES = [
-    {"name": "Look Straight",       "icon": "[ O ]",  "duration": 3.0, "captures": 5,  "instruction": "Look directly at the camera"},
-    {"name": "Turn Slightly Left",   "icon": "[ < ]",  "duration": 2.5, "captures": 4,  "instruction": "Slowly turn your head to the LEFT"},
-    {"name": "Turn Slightly Right",  "icon": "[ > ]",  "duration": 2.5, "captures": 4,  "instruction": "Slowly turn your head to the RIGHT"},
-    {"name": "Tilt Up Slightly",     "icon": "[ ^ ]",  "duration": 2.0, "captures": 3,  "instruction": "Tilt your chin UP slightly"},
-    {"name": "Tilt Down Slightly",   "icon": "[ v ]",  "duration": 2.0, "captures": 3,  "instruction": "Tilt your chin DOWN slightly"},
-    {"name": "Smile",                "icon": ":)",      "duration": 2.0, "captures": 3,  "instruction": "Give a natural SMILE"},
+    {"name": "Look Straight",       "icon": "[ O ]",  "timeout": 4.5, "captures": 5,  "instruction": "Look directly at the camera"},
+    {"name": "Turn Slightly Left",   "icon": "[ < ]",  "timeout": 3.5, "captures": 4,  "instruction": "Slowly turn your head to the LEFT"},
+    {"name": "Turn Slightly Right",  "icon": "[ > ]",  "timeout": 3.5, "captures": 4,  "instruction": "Slowly turn your head to the RIGHT"},
+    {"name": "Tilt Up Slightly",     "icon": "[ ^ ]",  "timeout": 3.0, "captures": 3,  "instruction": "Tilt your chin UP slightly"},
+    {"name": "Tilt Down Slightly",   "icon": "[ v ]",  "timeout": 3.0, "captures": 3,  "instruction": "Tilt your chin DOWN slightly"},
+    {"name": "Smile",                "icon": ":)",      "timeout": 3.0, "captures": 3,  "instruction": "Give a natural SMILE"},
 ]
 
-FACE_PADDING = 0.15
 TARGET_SIZE = 160
+
+# A frame is only kept if its embedding is far enough from every kept frame
+DIVERSITY_MIN_DISTANCE = face_gallery.DIVERSITY_MIN_DISTANCE
+MIN_EVAL_INTERVAL = 0.12        # Seconds between embedding attempts (ArcFace ~100ms on CPU, off the UI thread)
+FALLBACK_CAPTURE_INTERVAL = 0.5 # Timed capture used when the embedder is unavailable
+
 count = 0
 total_poses = len(POSES)
+kept_embeddings = []
+kept_paths = []
+rejected_similar = 0
+pose_coverage = []
+
+def is_informative(embedding):
+    """True if the embedding adds new information to the frames kept so far"""
+    if embedding is None or not kept_embeddings:
+        return True
+    nearest = face_gallery.cosine_distances(embedding, np.vstack(kept_embeddings)).min()
+    return float(nearest) >= DIVERSITY_MIN_DISTANCE
+
+def keep_frame(face_crop, embedding, captured_at):
+    """Queue the crop for writing if it adds information; returns whether it was kept"""
+    global count, rejected_similar
+    if not is_informative(embedding):
+        rejected_similar += 1
+        return False
+    # Resize + JPEG encode + fsync happen on the writer thread
+    img_path = os.path.join(staging_path, f"{count}.jpg")
+    writer.submit(img_path, face_crop, captured_at=captured_at)
+    if embedding is not None:
+        kept_embeddings.append(embedding)
+        kept_paths.append(img_path)
+    count += 1
+    return True
+
+def collect_embedded(pose):
+    """Run the diversity selection on crops the embedder finished since the last frame"""
+    global pose_captures, last_capture_time
+    for face_crop, embedding, captured_at in embedder.results():
+        if pose_captures >= pose["captures"]:
+            continue
+        if embedding is None and captured_at - last_capture_time < FALLBACK_CAPTURE_INTERVAL:
+            continue
+        if keep_frame(face_crop, embedding, captured_at):
+            pose_captures += 1
+            last_capture_time = captured_at
 
-print("[3/3] Starting guided face registration...")
+writer = AsyncImageWriter(target_size=TARGET_SIZE, jpeg_quality=95)
+# ArcFace runs on its own thread so the preview does not stall on each evaluation
+embedder = AsyncEmbedder(face_gallery.embed_face) if embedder_ready else None
+
+profiler.finish()
+print("[4/4] Starting guided face registration...")
 
 for pose_idx, pose in enumerate(POSES):
     pose_start = time.time()
     pose_captures = 0
-    capture_interval = pose["duration"] / pose["captures"]
+    last_eval_time = 0
     last_capture_time = 0
     
     while True:
@@ -202,19 +282,26 @@ for pose_idx, pose in enumerate(POSES):
         frame = cv2.flip(frame, 1)
         
         elapsed = time.time() - pose_start
-        remaining = max(0, pose["duration"] - elapsed)
+        remaining = max(0, pose["timeout"] - elapsed)
         
-        if elapsed >= pose["duration"]:
+        # Move on as soon as the pose has enough distinct frames; the timeout
+        # only stops a student who cannot reach the pose from blocking capture
+        if pose_captures >= pose["captures"] or elapsed >= pose["timeout"]:
             break
         
         # Run YOLO face detection
         results = model(frame, verbose=False)
         face_detected = False
+        # Crops come from an undrawn copy: the guide boxes below are drawn into frame
+        raw_frame = frame.copy()
         
         for result in results:
             boxes = result.boxes
-            for box in boxes:
+            keypoints = getattr(result, "keypoints", None)
+            kp_xy = keypoints.xy.cpu().numpy() if keypoints is not None and len(keypoints) else None
+            for i, box in enumerate(boxes):
                 x1, y1, x2, y2 = map(int, box.xyxy[0])
+                landmarks = kp_xy[i].astype(np.float32) if kp_xy is not None and i < len(kp_xy) else None
                 face_detected = True
                 
                 # Draw face bounding box with glow effect
@@ -222,28 +309,23 @@ for pose_idx, pose in enumerate(POSES):
                 cv2.rectangle(frame, (x1-2, y1-2), (x2+2, y2+2), guide_color, 1, cv2.LINE_AA)
                 cv2.rectangle(frame, (x1, y1), (x2, y2), COL_SUCCESS, 2, cv2.LINE_AA)
                 
-                # Capture at intervals
+                # Evaluate candidate frames at a bounded rate, one embedding in flight at a time
                 current_time = time.time()
-                if pose_captures < pose["captures"] and current_time - last_capture_time >= capture_interval:
-                    h, w = frame.shape[:2]
-                    face_w = x2 - x1
-                    face_h = y2 - y1
-                    pad_x = int(face_w * FACE_PADDING)
-                    pad_y = int(face_h * FACE_PADDING)
-                    
-                    px1 = max(0, x1 - pad_x)
-                    py1 = max(0, y1 - pad_y)
-                    px2 = min(w, x2 + pad_x)
-                    py2 = min(h, y2 + pad_y)
-                    
-                    face_crop = frame[py1:py2, px1:px2]
+                if (pose_captures < pose["captures"] and current_time - last_eval_time >= MIN_EVAL_INTERVAL
+                        and not (embedder is not None and embedder.busy)):
+                    last_eval_time = current_time
+                    # Same aligned, padded crop as bulk enrollment and recognition
+                    face_crop = face_gallery.crop_aligned_face(raw_frame, (x1, y1, x2, y2), landmarks).copy()
                     if face_crop.size > 0:
-                        face_resized = cv2.resize(face_crop, (TARGET_SIZE, TARGET_SIZE), interpolation=cv2.INTER_LANCZOS4)
-                        img_path = os.path.join(student_path, f"{count}.jpg")
-                        cv2.imwrite(img_path, face_resized, [cv2.IMWRITE_JPEG_QUALITY, 95])
-                        count += 1
-                        pose_captures += 1
-                        last_capture_time = current_time
+                        if embedder is not None:
+                            embedder.submit(face_crop, current_time)
+                        elif current_time - last_capture_time >= FALLBACK_CAPTURE_INTERVAL:
+                            if keep_frame(face_crop, None, current_time):
+                                pose_captures += 1
+                                last_capture_time = current_time
+        
+        if embedder is not None:
+            collect_embedded(pose)
         
         # ---- DRAW PROFESSIONAL UI ----
         fh, fw = frame.shape[:2]
@@ -278,13 +360,13 @@ for pose_idx, pose in enumerate(POSES):
         cv2.putText(frame, icon_text, ((fw - iw)//2, panel_y - 15), cv2.FONT_HERSHEY_SIMPLEX, 1.5, COL_PRIMARY, 3, cv2.LINE_AA)
         
         # Overall progress bar
-        overall_progress = (pose_idx + elapsed / pose["duration"]) / total_poses
+        overall_progress = (pose_idx + min(1.0, pose_captures / pose["captures"])) / total_poses
         draw_progress_bar(frame, 15, 75, fw - 30, 8, overall_progress, COL_PRIMARY)
         
         # Pose countdown ring — small timer
         timer_x = fw - 60
         timer_y = 90
-        angle = int(360 * (1 - remaining / pose["duration"]))
+        angle = int(360 * (1 - remaining / pose["timeout"]))
         cv2.ellipse(frame, (timer_x, timer_y), (22, 22), -90, 0, angle, COL_ACCENT, 3, cv2.LINE_AA)
         cv2.ellipse(frame, (timer_x, timer_y), (22, 22), -90, angle, 360, COL_DARK_GRAY, 2, cv2.LINE_AA)
         cv2.putText(frame, f"{remaining:.0f}s", (timer_x - 10, timer_y + 5), cv2.FONT_HERSHEY_SIMPLEX, 0.4, COL_WHITE, 1, cv2.LINE_AA)
@@ -311,10 +393,20 @@ for pose_idx, pose in enumerate(POSES):
         key = cv2.waitKey(1) & 0xFF
         if key == 27:  # ESC
             print("[WARNING] Registration cancelled by user")
+            if embedder is not None:
+                embedder.close()
+            writer.close()
+            shutil.rmtree(staging_path, ignore_errors=True)
             cap.release()
             cv2.destroyAllWindows()
             sys.exit(0)
     
+    # A crop still being embedded was taken during this pose, so it counts towards it
+    if embedder is not None:
+        embedder.wait(timeout=1.0)
+        collect_embedded(pose)
+    pose_coverage.append((pose["name"], pose_captures, pose["captures"]))
+    
     # Brief transition between poses
     if pose_idx < total_poses - 1:
         next_pose = POSES[pose_idx + 1]
@@ -351,6 +443,17 @@ for pose_idx, pose in enumerate(POSES):
             cv2.imshow(WINDOW_NAME, frame)
             cv2.waitKey(1)
 
+# =========================================================
+# FLUSH PENDING WRITES
+# =========================================================
+# Every image must be on disk before we claim registration is complete
+if embedder is not None:
+    embedder.close()
+writer.close()
+write_stats = writer.latency_stats()
+for err in writer.errors:
+    print(f"[WARNING] Failed to save image {err}")
+
 # =========================================================
 # COMPLETION SCREEN
 # =========================================================
@@ -411,6 +514,54 @@ for pattern in cache_patterns:
         except Exception:
             pass
 
+# The duplicate check runs on the staged capture. Only a capture that passes
+# it (or --allow-duplicate) is moved into TrainingImage/ and its embeddings
+# stored, so recognition does not have to recompute them.
+duplicates = []
+gallery = None
+if kept_embeddings:
+    try:
+        gallery = face_gallery.FaceGallery.load()
+        duplicates = duplicate_check.find_duplicates(gallery, np.vstack(kept_embeddings), exclude=student_name)
+    except Exception as e:
+        gallery = None
+        print(f"[WARNING] Duplicate check failed: {e}")
+held_back = bool(duplicates) and not ALLOW_DUPLICATE
+
+if held_back:
+    for label, dist in duplicates:
+        print(f"[WARNING] Possible duplicate of '{label}' (median distance {dist:.3f})")
+    print("[WARNING] Embeddings NOT added to the gallery — re-run with --allow-duplicate to override")
+else:
+    try:
+        dataset_catalog.promote_folder(student_name, dataset_catalog.CAPTURE_STAGING_DIR, dataset_path)
+    except Exception as e:
+        print(f"[WARNING] Could not move captured images into {student_path}: {e}")
+    if gallery is not None:
+        try:
+            final_paths = [os.path.join(student_path, os.path.basename(p)) for p in kept_paths]
+            gallery.replace(student_name, np.vstack(kept_embeddings), final_paths)
+            gallery.save(labels=[student_name])
+            print(f"[INFO] Gallery updated with {len(kept_embeddings)} embeddings")
+        except Exception as e:
+            print(f"[WARNING] Failed to update embedding gallery: {e}")
+
 print(f"[OK] Registration completed for {student_name}")
 print(f"[INFO] Total images captured: {count}")
-print(f"[INFO] Poses completed: {total_poses}")
+print(f"[INFO] Near-duplicate frames skipped: {rejected_similar}")
+print(f"[INFO] Capture-to-disk latency: avg {write_stats['avg_ms']}ms, "
+      f"p95 {write_stats['p95_ms']}ms, max {write_stats['max_ms']}ms over {write_stats['count']} images")
+covered = sum(1 for _, got, target in pose_coverage if got >= target)
+print(f"[INFO] Poses fully covered: {covered}/{total_poses}")
+for pose_name, got, target in pose_coverage:
+    if got < target:
+        print(f"[WARNING] Pose '{pose_name}' only reached {got}/{target} distinct frames")
+
+if held_back:
+    try:
+        review_path = dataset_catalog.quarantine_folder(student_name, dataset_catalog.CAPTURE_STAGING_DIR)
+        if review_path:
+            print(f"[WARNING] Captured images moved to {review_path} for review")
+    except Exception as e:
+        print(f"[WARNING] Could not move captured images out of {staging_path}: {e}")
+    sys.exit(duplicate_check.DUPLICATE_EXIT_CODE)
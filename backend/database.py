@@ -207,6 +207,23 @@ def init_db():
         )
     ''')
 
+    # Enrollment uploads — resumable chunked uploads of enrollment media
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS enrollment_uploads (
+            id TEXT PRIMARY KEY,
+            student_id INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            total_size INTEGER NOT NULL,
+            received_bytes INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'uploading',
+            message TEXT DEFAULT '',
+            images_added INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+
     # Auto-migrate students table to support admin panel requirements
     try:
         cursor.execute("PRAGMA table_info(students)")
@@ -247,6 +264,8 @@ def init_db():
             cursor.execute("ALTER TABLE lecture_sessions ADD COLUMN timetable_id INTEGER")
         if 'faculty_id' not in ls_columns:
             cursor.execute("ALTER TABLE lecture_sessions ADD COLUMN faculty_id TEXT DEFAULT ''")
+        if 'perf_stats' not in ls_columns:
+            cursor.execute("ALTER TABLE lecture_sessions ADD COLUMN perf_stats TEXT")
     except Exception as e:
         print(f"Error auto-migrating lecture_sessions table: {e}")
 
@@ -333,9 +352,121 @@ def init_db():
             except Exception:
                 pass  # skip duplicates on re-run
 
+    # Indexes for the reports page and CSV exports (date-ordered pages, subject filters)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_date_time ON attendance (date, time)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_subject_date ON attendance (subject_code, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_faculty_attendance_date ON faculty_attendance (date)")
+
     conn.commit()
+    _init_attendance_counters(conn)
     conn.close()
 
+def _init_attendance_counters(conn):
+    """
+    Counters kept up to date by triggers on attendance, so dashboards never
+    have to scan the attendance history:
+      attendance_daily_counts  date -> records, distinct students
+      stat_counters            'attendance_records' -> all-time row count
+    Created and back-filled once, in the same transaction as the triggers.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'attendance_daily_counts'")
+    if cursor.fetchone():
+        return
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS attendance_daily_counts (
+                date TEXT PRIMARY KEY,
+                records INTEGER NOT NULL DEFAULT 0,
+                students INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("CREATE TABLE IF NOT EXISTS stat_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)")
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS attendance_counters_insert AFTER INSERT ON attendance
+            BEGIN
+                INSERT OR IGNORE INTO attendance_daily_counts (date) VALUES (NEW.date);
+                UPDATE attendance_daily_counts
+                   SET records = records + 1,
+                       students = students + NOT EXISTS (SELECT 1 FROM attendance
+                           WHERE student_id = NEW.student_id AND date = NEW.date AND id <> NEW.id)
+                 WHERE date = NEW.date;
+                UPDATE stat_counters SET value = value + 1 WHERE name = 'attendance_records';
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS attendance_counters_delete AFTER DELETE ON attendance
+            BEGIN
+                UPDATE attendance_daily_counts
+                   SET records = records - 1,
+                       students = students - NOT EXISTS (SELECT 1 FROM attendance
+                           WHERE student_id = OLD.student_id AND date = OLD.date)
+                 WHERE date = OLD.date;
+                UPDATE stat_counters SET value = value - 1 WHERE name = 'attendance_records';
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS attendance_counters_update AFTER UPDATE OF date, student_id ON attendance
+            WHEN OLD.date IS NOT NEW.date OR OLD.student_id IS NOT NEW.student_id
+            BEGIN
+                UPDATE attendance_daily_counts
+                   SET records = records - 1,
+                       students = students - NOT EXISTS (SELECT 1 FROM attendance
+                           WHERE student_id = OLD.student_id AND date = OLD.date)
+                 WHERE date = OLD.date;
+                INSERT OR IGNORE INTO attendance_daily_counts (date) VALUES (NEW.date);
+                UPDATE attendance_daily_counts
+                   SET records = records + 1,
+                       students = students + NOT EXISTS (SELECT 1 FROM attendance
+                           WHERE student_id = NEW.student_id AND date = NEW.date AND id <> NEW.id)
+                 WHERE date = NEW.date;
+            END
+        """)
+        _rebuild_attendance_counters(cursor)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Error creating attendance counters: {e}")
+
+def _rebuild_attendance_counters(cursor):
+    cursor.execute("DELETE FROM attendance_daily_counts")
+    cursor.execute("""
+        INSERT INTO attendance_daily_counts (date, records, students)
+        SELECT date, COUNT(*), COUNT(DISTINCT student_id) FROM attendance GROUP BY date
+    """)
+    cursor.execute("INSERT OR REPLACE INTO stat_counters (name, value) VALUES ('attendance_records', (SELECT COUNT(*) FROM attendance))")
+
+def rebuild_attendance_counters():
+    """Recompute the attendance counters from scratch (after a manual edit of the database)"""
+    conn = get_connection()
+    try:
+        _rebuild_attendance_counters(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+
+EXPORT_BATCH_SIZE = 500
+
+def _iter_query(query, params, batch_size=None):
+    """
+    Yield the rows of a query as dicts, fetchmany() at a time, so exports never
+    hold more than one batch. The connection stays open until the generator is
+    exhausted or closed.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size or EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+    finally:
+        conn.close()
+
 # ============================================================
 # STUDENT OPERATIONS
 # ============================================================
@@ -356,6 +487,35 @@ def add_student(name, roll_number, department, academic_year, dob=None, username
     finally:
         conn.close()
 
+def upsert_students(rows):
+    """
+    Bulk create-or-update students in a single transaction.
+    rows: iterable of (name, roll_number, department, academic_year) tuples.
+    Existing students (matched by unique name) get their roll number refreshed,
+    keep any non-empty department/year, and are flagged face_registered = 1.
+    Returns the number of rows processed.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(
+            """INSERT INTO students (name, roll_number, department, academic_year, username, face_registered)
+               VALUES (?, ?, ?, ?, NULLIF(UPPER(?), ''), 1)
+               ON CONFLICT(name) DO UPDATE SET
+                   roll_number = COALESCE(NULLIF(excluded.roll_number, ''), students.roll_number),
+                   department = COALESCE(NULLIF(excluded.department, ''), students.department),
+                   academic_year = COALESCE(NULLIF(excluded.academic_year, ''), students.academic_year),
+                   face_registered = 1""",
+            [(name, roll, dept, year, roll) for name, roll, dept, year in rows]
+        )
+        conn.commit()
+        return len(rows)
+    finally:
+        conn.close()
+
 def get_all_students():
     """Retrieve all students"""
     conn = get_connection()
@@ -424,6 +584,105 @@ def get_student_by_folder_name(folder_name):
     
     return None
 
+def _match_folder_name(folder_name, students):
+    """In-memory version of get_student_by_folder_name over (id, name) rows sorted by id"""
+    import re
+
+    by_name = {}
+    for student_id, name in students:
+        by_name.setdefault(name.lower(), student_id)
+
+    base_name = re.sub(r'_\d+$', '', folder_name).strip()
+    candidates = [folder_name]
+    if base_name and base_name != folder_name:
+        candidates.append(base_name)
+    if '_' in folder_name:
+        name_part = folder_name.rsplit('_', 1)[0].strip()
+        if name_part:
+            candidates.append(name_part)
+    for candidate in candidates:
+        if candidate.lower() in by_name:
+            return by_name[candidate.lower()]
+
+    search_term = (base_name if base_name != folder_name else folder_name).lower()
+    for student_id, name in students:
+        if search_term in name.lower():
+            return student_id
+    return None
+
+def resolve_student_ids(folder_names):
+    """
+    Map dataset folder names to student ids with one query, using the same
+    matching rules as get_student_by_folder_name. Unknown folders map to None.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, name FROM students ORDER BY id ASC")
+    students = [(row['id'], row['name'] or '') for row in cursor.fetchall()]
+    conn.close()
+    return {folder: _match_folder_name(folder, students) for folder in folder_names}
+
+def get_student_by_id(student_id):
+    """Retrieve a single student by ID"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM students WHERE id = ?", (student_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def set_face_registered(student_id, registered=True):
+    """Flag whether a student has usable face data in the gallery"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE students SET face_registered = ? WHERE id = ?", (1 if registered else 0, student_id))
+    conn.commit()
+    conn.close()
+
+def add_students_from_folders(rows):
+    """
+    Create students for dataset folders that have no row yet, in one transaction.
+    rows: iterable of (name, has_images). Names that already exist are skipped.
+    Returns the number of students inserted.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        before = conn.total_changes
+        cursor.executemany(
+            "INSERT OR IGNORE INTO students (name, roll_number, department, academic_year, face_registered) VALUES (?, '', '', '', ?)",
+            [(name, 1 if has_images else 0) for name, has_images in rows]
+        )
+        conn.commit()
+        return conn.total_changes - before
+    finally:
+        conn.close()
+
+def set_face_registered_batch(student_ids, registered=True):
+    """set_face_registered for many students in one transaction"""
+    student_ids = list(student_ids)
+    if not student_ids:
+        return 0
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.executemany("UPDATE students SET face_registered = ? WHERE id = ?",
+                       [(1 if registered else 0, sid) for sid in student_ids])
+    conn.commit()
+    conn.close()
+    return len(student_ids)
+
+def get_students_signature():
+    """(count, max id, registered count) — changes whenever students are added, removed or (un)flagged"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*), COALESCE(MAX(id), 0), COALESCE(SUM(face_registered), 0) FROM students")
+    signature = tuple(cursor.fetchone())
+    conn.close()
+    return signature
+
 def update_student(student_id, name, roll_number, department, academic_year):
     """Update student details"""
     conn = get_connection()
@@ -453,6 +712,86 @@ def delete_student(student_id):
     conn.commit()
     conn.close()
 
+# ============================================================
+# ENROLLMENT UPLOAD OPERATIONS
+# ============================================================
+
+def create_enrollment_upload(upload_id, student_id, filename, total_size):
+    """Register a new resumable enrollment upload"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO enrollment_uploads (id, student_id, filename, total_size) VALUES (?, ?, ?, ?)",
+        (upload_id, student_id, filename, total_size)
+    )
+    conn.commit()
+    conn.close()
+
+def get_enrollment_upload(upload_id):
+    """Get a single enrollment upload by ID"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM enrollment_uploads WHERE id = ?", (upload_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def get_duplicate_held_student_ids():
+    """Students whose enrollment was flagged as a duplicate and never enrolled successfully since"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT DISTINCT student_id FROM enrollment_uploads
+        WHERE status = 'duplicate'
+          AND student_id NOT IN (SELECT student_id FROM enrollment_uploads WHERE status = 'done')
+    """)
+    ids = {row['student_id'] for row in cursor.fetchall()}
+    conn.close()
+    return ids
+
+def get_enrollment_uploads_by_status(*statuses):
+    """Enrollment uploads in any of the given states, oldest first"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    placeholders = ", ".join("?" for _ in statuses)
+    cursor.execute(
+        f"SELECT * FROM enrollment_uploads WHERE status IN ({placeholders}) ORDER BY created_at, id",
+        statuses
+    )
+    rows = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return rows
+
+def advance_enrollment_upload(upload_id, end):
+    """Move received_bytes forward to end (never backwards) and return the stored value"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE enrollment_uploads SET received_bytes = MAX(received_bytes, ?), updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+        (end, upload_id)
+    )
+    conn.commit()
+    cursor.execute("SELECT received_bytes FROM enrollment_uploads WHERE id = ?", (upload_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return row['received_bytes'] if row else end
+
+def update_enrollment_upload(upload_id, **fields):
+    """Update status/progress columns of an enrollment upload"""
+    allowed = {'received_bytes', 'status', 'message', 'images_added'}
+    fields = {k: v for k, v in fields.items() if k in allowed}
+    if not fields:
+        return
+    assignments = ", ".join(f"{k} = ?" for k in fields)
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        f"UPDATE enrollment_uploads SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+        (*fields.values(), upload_id)
+    )
+    conn.commit()
+    conn.close()
+
 # ============================================================
 # FACULTY OPERATIONS
 # ============================================================
@@ -614,37 +953,44 @@ def checkout_faculty(faculty_id):
     conn.close()
     return 'success'
 
-def get_faculty_attendance(date_from=None, date_to=None, faculty_id=None):
-    """Get faculty attendance records joined with faculty details"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    query = """
-        SELECT fa.id, fa.date, fa.check_in, fa.check_out, fa.work_hours, fa.status, fa.remarks, fa.marked_by,
-               f.full_name, f.employee_id, f.department, f.designation
-        FROM faculty_attendance fa
-        JOIN faculty f ON fa.faculty_id = f.id
-        WHERE 1=1
-    """
+FACULTY_ATTENDANCE_QUERY = """
+    SELECT fa.id, fa.date, fa.check_in, fa.check_out, fa.work_hours, fa.status, fa.remarks, fa.marked_by,
+           f.full_name, f.employee_id, f.department, f.designation
+    FROM faculty_attendance fa
+    JOIN faculty f ON fa.faculty_id = f.id
+"""
+
+def _faculty_attendance_filters(date_from=None, date_to=None, faculty_id=None):
+    where = " WHERE 1=1"
     params = []
-    
     if date_from:
-        query += " AND fa.date >= ?"
+        where += " AND fa.date >= ?"
         params.append(date_from)
     if date_to:
-        query += " AND fa.date <= ?"
+        where += " AND fa.date <= ?"
         params.append(date_to)
     if faculty_id:
-        query += " AND fa.faculty_id = ?"
+        where += " AND fa.faculty_id = ?"
         params.append(faculty_id)
-        
-    query += " ORDER BY fa.date DESC, fa.check_in DESC"
+    return where, params
+
+def get_faculty_attendance(date_from=None, date_to=None, faculty_id=None):
+    """Get faculty attendance records joined with faculty details"""
+    conn = get_connection()
+    cursor = conn.cursor()
     
-    cursor.execute(query, params)
+    where, params = _faculty_attendance_filters(date_from, date_to, faculty_id)
+    cursor.execute(FACULTY_ATTENDANCE_QUERY + where + " ORDER BY fa.date DESC, fa.check_in DESC", params)
     records = [dict(row) for row in cursor.fetchall()]
     conn.close()
     return records
 
+def iter_faculty_attendance(date_from=None, date_to=None, faculty_id=None, batch_size=None):
+    """get_faculty_attendance as a generator reading EXPORT_BATCH_SIZE rows at a time"""
+    where, params = _faculty_attendance_filters(date_from, date_to, faculty_id)
+    return _iter_query(FACULTY_ATTENDANCE_QUERY + where + " ORDER BY fa.date DESC, fa.check_in DESC",
+                       params, batch_size)
+
 def get_faculty_today_summary():
     """Get today's faculty attendance summary"""
     today = datetime.now().strftime("%Y-%m-%d")
@@ -740,16 +1086,17 @@ def create_lecture_session(subject_code, subject_name, period, faculty_name,
     finally:
         conn.close()
 
-def end_lecture_session(session_id, total_present=0):
-    """Mark a lecture session as completed"""
+def end_lecture_session(session_id, total_present=0, perf_stats=None):
+    """Mark a lecture session as completed, optionally storing the scanner's per-stage timings"""
     conn = get_connection()
     cursor = conn.cursor()
     time_now = datetime.now().strftime("%H:%M:%S")
     cursor.execute(
         """UPDATE lecture_sessions 
-           SET end_time = ?, total_present = ?, status = 'completed' 
+           SET end_time = ?, total_present = ?, status = 'completed',
+               perf_stats = COALESCE(?, perf_stats)
            WHERE id = ?""",
-        (time_now, total_present, session_id)
+        (time_now, total_present, json.dumps(perf_stats) if perf_stats is not None else None, session_id)
     )
     conn.commit()
     conn.close()
@@ -814,45 +1161,154 @@ def mark_attendance(name, subject_code="", subject_name="", period="", faculty_n
     finally:
         conn.close()
 
-def get_attendance_records(date_from=None, date_to=None, search_q=None, subject_code=None):
-    """Get all attendance records joined with student details"""
+def mark_attendance_batch(rows):
+    """
+    Insert many attendance rows in one transaction. Each row is
+    (student_id, date, time, subject_code, subject_name, period, faculty_name, session_id).
+    Returns 'success' or 'duplicate' per row; raises if the database is unavailable.
+    """
     conn = get_connection()
     cursor = conn.cursor()
-    
-    query = """
-        SELECT a.date, a.time, a.status, a.subject_code, a.subject_name, a.period, a.faculty_name,
-               s.name, s.roll_number, s.department, s.academic_year
-        FROM attendance a
-        JOIN students s ON a.student_id = s.id
-        WHERE 1=1
-    """
+    results = []
+    try:
+        for row in rows:
+            cursor.execute(
+                """INSERT OR IGNORE INTO attendance 
+                   (student_id, date, time, subject_code, subject_name, period, faculty_name, session_id) 
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                tuple(row)
+            )
+            results.append('success' if cursor.rowcount == 1 else 'duplicate')
+        conn.commit()
+        return results
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _attendance_filters(date_from=None, date_to=None, search_q=None, subject_code=None):
+    """WHERE clause and parameters shared by the attendance listing, count and export queries"""
+    where = " WHERE 1=1"
     params = []
-    
     if date_from:
-        query += " AND a.date >= ?"
+        where += " AND a.date >= ?"
         params.append(date_from)
     if date_to:
-        query += " AND a.date <= ?"
+        where += " AND a.date <= ?"
         params.append(date_to)
     if search_q:
-        query += " AND s.name LIKE ?"
+        where += " AND s.name LIKE ?"
         params.append(f"%{search_q}%")
     if subject_code:
-        query += " AND a.subject_code = ?"
+        where += " AND a.subject_code = ?"
         params.append(subject_code)
-        
-    query += " ORDER BY a.date DESC, a.time DESC"
+    return where, params
+
+def get_attendance_records(date_from=None, date_to=None, search_q=None, subject_code=None, limit=None, offset=0):
+    """Get attendance records joined with student details, newest first (one page with limit/offset)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    query = """
+        SELECT a.date, a.time, a.status, a.subject_code, a.subject_name, a.period, a.faculty_name,
+               s.name, s.roll_number, s.department, s.academic_year
+        FROM attendance a
+        JOIN students s ON a.student_id = s.id
+    """
+    where, params = _attendance_filters(date_from, date_to, search_q, subject_code)
+    query += where + " ORDER BY a.date DESC, a.time DESC"
+    if limit is not None:
+        query += " LIMIT ? OFFSET ?"
+        params += [limit, offset]
     
     cursor.execute(query, params)
     records = [dict(row) for row in cursor.fetchall()]
     conn.close()
     return records
 
+def iter_attendance_records(date_from=None, date_to=None, search_q=None, subject_code=None, batch_size=None):
+    """Filtered attendance records oldest first, read EXPORT_BATCH_SIZE rows at a time (for exports)"""
+    query = """
+        SELECT a.date, a.time, a.status, a.subject_code, a.subject_name, a.period, a.faculty_name,
+               s.name, s.roll_number, s.department, s.academic_year
+        FROM attendance a
+        JOIN students s ON a.student_id = s.id
+    """
+    where, params = _attendance_filters(date_from, date_to, search_q, subject_code)
+    return _iter_query(query + where + " ORDER BY a.date ASC, a.time ASC", params, batch_size)
+
+def count_attendance_records(date_from=None, date_to=None, search_q=None, subject_code=None):
+    """Number of records get_attendance_records would return without a limit"""
+    if not any((date_from, date_to, search_q, subject_code)):
+        return get_attendance_summary()["total_records"]
+    conn = get_connection()
+    cursor = conn.cursor()
+    where, params = _attendance_filters(date_from, date_to, search_q, subject_code)
+    join = " JOIN students s ON a.student_id = s.id" if search_q else ""
+    cursor.execute("SELECT COUNT(*) FROM attendance a" + join + where, params)
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+def get_average_daily_attendance():
+    """Mean number of distinct students present per day that has any attendance (None without data)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT AVG(students) FROM attendance_daily_counts WHERE records > 0")
+    avg = cursor.fetchone()[0]
+    conn.close()
+    return avg
+
 def get_today_records():
     """Get today's attendance records"""
     today = datetime.now().strftime("%Y-%m-%d")
     return get_attendance_records(date_from=today, date_to=today)
 
+def get_attendance_summary(date=None):
+    """
+    Dashboard counters for one day (default today) from the trigger-maintained
+    tables: {present (distinct students), records, total_records}. Constant cost
+    however long the attendance history gets.
+    """
+    date = date or datetime.now().strftime("%Y-%m-%d")
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT records, students FROM attendance_daily_counts WHERE date = ?", (date,))
+    day = cursor.fetchone()
+    cursor.execute("SELECT value FROM stat_counters WHERE name = 'attendance_records'")
+    total = cursor.fetchone()
+    conn.close()
+    return {
+        "present": day['students'] if day else 0,
+        "records": day['records'] if day else 0,
+        "total_records": total['value'] if total else 0,
+    }
+
+def get_cohort_attendees_today(subject_code, period=""):
+    """
+    Students already marked today in other periods, limited to the cohort of
+    this subject (students of the subject's department, when it is known).
+    Used by the recognizer as a prior. Most frequently seen first.
+    """
+    today = datetime.now().strftime("%Y-%m-%d")
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT s.id, s.name, s.roll_number, COUNT(*) AS periods_present
+        FROM attendance a
+        JOIN students s ON a.student_id = s.id
+        LEFT JOIN subjects sub ON sub.code = ?
+        WHERE a.date = ?
+          AND NOT (a.subject_code = ? AND a.period = ?)
+          AND (COALESCE(sub.department, '') = '' OR s.department = sub.department)
+        GROUP BY s.id
+        ORDER BY periods_present DESC, MAX(a.time) DESC
+    """, (subject_code, today, subject_code, period))
+    records = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return records
+
 # ============================================================
 # TIMETABLE OPERATIONS
 # ============================================================
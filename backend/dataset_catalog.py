@@ -0,0 +1,260 @@
+import os
+import re
+import time
+import threading
+
+import database
+
+# ==========================================
+# DATASET CATALOG
+# ==========================================
+# In-memory view of TrainingImage/<folder>/*.jpg for the web app:
+#   folder -> student id, image count, profile image, folder mtime
+# plus a lookup from a student's name / roll number to their folder.
+#
+# Requests read the catalog without touching the filesystem. At most once
+# every CHECK_INTERVAL seconds a read re-validates it: one stat of the
+# dataset root (folders added or removed) and one stat per folder (images
+# added or removed); only folders whose mtime moved are listed again.
+# Code paths that change the dataset call invalidate() so their change is
+# visible immediately rather than after CHECK_INTERVAL; paths that add,
+# rename or delete students call invalidate_students().
+
+DATASET_DIR = "TrainingImage"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+CHECK_INTERVAL = 5.0
+
+# Enrollments flagged as likely duplicates are moved here for review. It sits
+# outside DATASET_DIR so that FaceGallery.sync(), the catalog and the
+# reconciler never see (and re-enroll) the held-back images.
+PENDING_REVIEW_DIR = "pending_review"
+REVIEW_SEPARATOR = "__"
+
+def quarantine_folder(folder, dataset_dir=DATASET_DIR, review_dir=PENDING_REVIEW_DIR):
+    """
+    Move every image of dataset_dir/<folder> to review_dir/<folder>__<timestamp>/
+    and remove the folder if nothing else is left in it. Returns the destination
+    (None when there was nothing to move).
+    """
+    import shutil
+    from datetime import datetime
+
+    src = os.path.join(dataset_dir, folder)
+    try:
+        images = [f for f in os.listdir(src) if f.lower().endswith(IMAGE_EXTENSIONS)]
+    except OSError:
+        return None
+    if not images:
+        return None
+    dest = os.path.join(review_dir, f"{folder}{REVIEW_SEPARATOR}{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(dest, exist_ok=True)
+    for f in images:
+        shutil.move(os.path.join(src, f), os.path.join(dest, f))
+    try:
+        os.rmdir(src)
+    except OSError:
+        pass    # Folder still holds other files
+    return dest
+
+# Camera captures are written here first and only moved into DATASET_DIR
+# once the duplicate check passed, so a capture that is killed or flagged
+# never leaves unchecked images where FaceGallery.sync() would enroll them.
+CAPTURE_STAGING_DIR = "capture_staging"
+
+def promote_folder(folder, staging_dir=CAPTURE_STAGING_DIR, dataset_dir=DATASET_DIR):
+    """
+    Move every image of staging_dir/<folder> into dataset_dir/<folder>
+    (replacing files of the same name) and remove the staging folder.
+    Returns the destination paths of the moved images.
+    """
+    src = os.path.join(staging_dir, folder)
+    dest = os.path.join(dataset_dir, folder)
+    try:
+        images = sorted(f for f in os.listdir(src) if f.lower().endswith(IMAGE_EXTENSIONS))
+    except OSError:
+        return []
+    os.makedirs(dest, exist_ok=True)
+    moved = []
+    for f in images:
+        os.replace(os.path.join(src, f), os.path.join(dest, f))
+        moved.append(os.path.join(dest, f))
+    try:
+        os.rmdir(src)
+    except OSError:
+        pass
+    return moved
+
+def pending_review_folders(review_dir=PENDING_REVIEW_DIR):
+    """Dataset folder names that have an enrollment held for review"""
+    try:
+        entries = os.listdir(review_dir)
+    except OSError:
+        return set()
+    return {e.rsplit(REVIEW_SEPARATOR, 1)[0] for e in entries if os.path.isdir(os.path.join(review_dir, e))}
+
+def folder_base_name(folder_name):
+    """'Name_RollNumber' -> 'Name' (same rule as database.get_student_by_folder_name)"""
+    return re.sub(r'_\d+$', '', folder_name).strip()
+
+class DatasetCatalog:
+    """Folder -> {images, profile_image, mtime}, re-validated by mtime"""
+
+    def __init__(self, dataset_dir=DATASET_DIR, check_interval=CHECK_INTERVAL):
+        self.dataset_dir = dataset_dir
+        self.check_interval = check_interval
+        self._entries = {}
+        self._by_base = {}          # lower-case base name -> [folder, ...]
+        self._by_lower = {}         # lower-case folder name -> folder
+        self._student_ids = None    # (version, {folder: student id or None})
+        self._root_mtime = None
+        self._checked_at = 0.0
+        self._dirty = set()
+        self._dirty_all = True
+        self._lock = threading.RLock()
+        self.version = 0            # Bumped whenever the folder set or an image count changes
+
+    def invalidate(self, folder=None):
+        """Force a rescan of one folder (or of everything) on the next read"""
+        with self._lock:
+            if folder is None:
+                self._dirty_all = True
+            else:
+                self._dirty.add(folder)
+            self._checked_at = 0.0
+
+    def invalidate_students(self):
+        """Student rows changed: re-resolve folder -> student id on the next lookup"""
+        with self._lock:
+            self._student_ids = None
+
+    def _scan_folder(self, folder, mtime=None):
+        path = os.path.join(self.dataset_dir, folder)
+        try:
+            images = sorted(f for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTENSIONS))
+            mtime = mtime if mtime is not None else os.stat(path).st_mtime
+        except OSError:
+            return None
+        profile = "1.jpg" if "1.jpg" in images else (images[0] if images else None)
+        return {"images": len(images), "profile_image": profile, "mtime": mtime}
+
+    def _refresh(self):
+        now = time.time()
+        if not self._dirty_all and not self._dirty and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        changed = False
+
+        try:
+            root_mtime = os.stat(self.dataset_dir).st_mtime
+        except OSError:
+            if self._entries:
+                self._entries, self._by_base, self._by_lower = {}, {}, {}
+                self.version += 1
+            self._root_mtime = None
+            self._dirty_all, self._dirty = False, set()
+            return
+
+        if self._dirty_all or root_mtime != self._root_mtime:
+            try:
+                names = {f for f in os.listdir(self.dataset_dir) if os.path.isdir(os.path.join(self.dataset_dir, f))}
+            except OSError:
+                names = set()
+            for gone in set(self._entries) - names:
+                del self._entries[gone]
+                changed = True
+            for new in names - set(self._entries):
+                self._dirty.add(new)
+            self._root_mtime = root_mtime
+            if self._dirty_all:
+                self._dirty |= names
+
+        for folder in list(self._entries):
+            if folder in self._dirty:
+                continue
+            try:
+                mtime = os.stat(os.path.join(self.dataset_dir, folder)).st_mtime
+            except OSError:
+                del self._entries[folder]
+                changed = True
+                continue
+            if mtime != self._entries[folder]["mtime"]:
+                self._dirty.add(folder)
+
+        for folder in self._dirty:
+            entry = self._scan_folder(folder)
+            old = self._entries.get(folder)
+            if entry is None:
+                if old is not None:
+                    del self._entries[folder]
+                    changed = True
+            elif old is None or old["images"] != entry["images"] or old["profile_image"] != entry["profile_image"]:
+                self._entries[folder] = entry
+                changed = True
+            else:
+                self._entries[folder] = entry
+        self._dirty, self._dirty_all = set(), False
+
+        if changed:
+            self.version += 1
+            by_base = {}
+            for folder in sorted(self._entries):
+                by_base.setdefault(folder_base_name(folder).lower(), []).append(folder)
+            self._by_base = by_base
+            self._by_lower = {f.lower(): f for f in self._entries}
+
+    def folders(self):
+        """{folder: {images, profile_image, mtime}} snapshot"""
+        with self._lock:
+            self._refresh()
+            return {k: dict(v) for k, v in self._entries.items()}
+
+    def get(self, folder):
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(folder)
+            return dict(entry) if entry else None
+
+    def folder_for_student(self, name, roll_number=None):
+        """
+        Dataset folder of a student: exact name, then Name_Roll, then any
+        folder whose base name matches (case-insensitive). None if absent.
+        """
+        with self._lock:
+            self._refresh()
+            candidates = [name]
+            if roll_number:
+                candidates.append(f"{name}_{roll_number}")
+            for candidate in candidates:
+                if candidate in self._entries:
+                    return candidate
+                if candidate.lower() in self._by_lower:
+                    return self._by_lower[candidate.lower()]
+            matches = self._by_base.get(name.lower().strip())
+            return matches[0] if matches else None
+
+    def student_ids(self):
+        """{folder: student id or None}, resolved with one query per catalog change"""
+        with self._lock:
+            self._refresh()
+            if self._student_ids is None or self._student_ids[0] != self.version:
+                self._student_ids = (self.version, database.resolve_student_ids(list(self._entries)))
+            return dict(self._student_ids[1])
+
+    def student_summary(self, name, roll_number=None):
+        """(folder, image count, profile image) for a student; (None, 0, None) without a folder"""
+        folder = self.folder_for_student(name, roll_number)
+        entry = self.get(folder) if folder else None
+        if not entry:
+            return None, 0, None
+        return folder, entry["images"], entry["profile_image"]
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog(dataset_dir=DATASET_DIR):
+    """Process-wide catalog for the dataset directory"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None or _catalog.dataset_dir != dataset_dir:
+            _catalog = DatasetCatalog(dataset_dir)
+        return _catalog
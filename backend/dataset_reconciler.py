@@ -0,0 +1,237 @@
+import os
+import time
+import threading
+from datetime import datetime
+
+import database
+import dataset_catalog
+from event_log import write_log
+
+# ==========================================
+# DATASET / DATABASE RECONCILER
+# ==========================================
+# TrainingImage/, the students table and the embedding gallery drift apart
+# when folders are copied in by hand, students are deleted from one admin
+# panel but not the other, or a capture fails halfway. Instead of repairing
+# that inside read paths, one background thread compares the three:
+#
+#   orphan_folders      folder with no matching student
+#                       -> student created (base name, like the old auto-sync)
+#   students_no_faces   student with no face images on disk
+#                       -> face_registered cleared if it was set
+#   unflagged_students  student with face images but face_registered = 0
+#                       -> face_registered set
+#   held_for_review     same state, but the student's enrollment was flagged
+#                       as a likely duplicate -> reported only, never flagged
+#   stale_gallery       gallery label whose folder is gone or empty
+#                       -> embeddings dropped from the gallery
+#   unembedded_folders  folder whose image count differs from its gallery rows
+#                       -> reported only; re-embedding needs DeepFace and is
+#                          done by FaceGallery.sync() when the recognizer starts
+#
+# A pass runs every RECONCILE_INTERVAL seconds but only does work when the
+# catalog version, the students signature or the gallery file changed, or
+# when request() was called after a register/delete. Fixes of one kind are
+# applied in a single transaction (or a single gallery save).
+
+RECONCILE_INTERVAL = 60.0
+AUTO_FIX = os.environ.get("ATTENDANCE_RECONCILE_FIX", "1") != "0"
+
+def _gallery_module():
+    """face_gallery needs numpy; gallery checks are skipped without it"""
+    try:
+        import face_gallery
+        return face_gallery
+    except ImportError:
+        return None
+
+class DatasetReconciler:
+    """Periodic drift detection between TrainingImage/, students and the gallery"""
+
+    def __init__(self, catalog, interval=RECONCILE_INTERVAL, auto_fix=AUTO_FIX, gallery_path=None):
+        self.catalog = catalog
+        self.interval = interval
+        self.auto_fix = auto_fix
+        self.gallery_path = gallery_path
+        self.report = None
+        self._signature = None
+        self._gallery_counts = (None, {})     # (gallery mtime, {label: rows})
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._forced = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="dataset-reconciler", daemon=True)
+            self._thread.start()
+        return self
+
+    def request(self):
+        """Run a pass soon regardless of the change signature"""
+        self._forced = True
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                write_log(f"Dataset reconciler failed: {e}", "error", sample="reconciler-error")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _gallery_file(self):
+        if self.gallery_path:
+            return self.gallery_path
+        gallery = _gallery_module()
+        return gallery.GALLERY_FILE if gallery else None
+
+    def _gallery_mtime(self):
+        path = self._gallery_file()
+        try:
+            return os.path.getmtime(path) if path else None
+        except OSError:
+            return None
+
+    def _gallery_label_counts(self):
+        """{label: embedding rows}, re-read only when the gallery file changes"""
+        mtime = self._gallery_mtime()
+        if mtime is None:
+            return None
+        if self._gallery_counts[0] != mtime:
+            gallery = _gallery_module().FaceGallery.load(self._gallery_file())
+            counts = {}
+            for label in gallery.labels.tolist():
+                counts[label] = counts.get(label, 0) + 1
+            self._gallery_counts = (mtime, counts)
+        return dict(self._gallery_counts[1])
+
+    def signature(self):
+        self.catalog.folders()      # Re-validates the catalog so its version is current
+        return (self.catalog.version, database.get_students_signature(), self._gallery_mtime())
+
+    def detect(self):
+        """Drift report without changing anything"""
+        folders = self.catalog.folders()
+        folder_ids = self.catalog.student_ids()
+        students = database.get_all_students()
+
+        orphans = [{"folder": f, "images": folders[f]["images"]}
+                   for f, sid in sorted(folder_ids.items()) if sid is None and f in folders]
+
+        # Duplicate-flagged enrollments stay unregistered until someone reviews them
+        held_ids = database.get_duplicate_held_student_ids()
+        held_folders = dataset_catalog.pending_review_folders()
+
+        no_faces, unflagged, held = [], [], []
+        for s in students:
+            folder, images, _ = self.catalog.student_summary(s['name'], s.get('roll_number'))
+            entry = {"id": s['id'], "name": s['name'], "roll_number": s.get('roll_number'),
+                     "folder": folder, "face_registered": bool(s.get('face_registered'))}
+            if images == 0:
+                no_faces.append(entry)
+            elif not s.get('face_registered'):
+                if s['id'] in held_ids or folder in held_folders:
+                    held.append(entry)
+                else:
+                    unflagged.append(entry)
+
+        gallery_counts = self._gallery_label_counts()
+        stale, unembedded = [], []
+        if gallery_counts is not None:
+            stale = sorted(label for label in gallery_counts
+                           if label not in folders or folders[label]["images"] == 0)
+            unembedded = [{"folder": f, "images": e["images"], "embeddings": gallery_counts.get(f, 0)}
+                          for f, e in sorted(folders.items())
+                          if e["images"] and gallery_counts.get(f, 0) != e["images"]]
+
+        return {
+            "checked_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "folders": len(folders),
+            "students": len(students),
+            "gallery_checked": gallery_counts is not None,
+            "orphan_folders": orphans,
+            "students_no_faces": no_faces,
+            "unflagged_students": unflagged,
+            "held_for_review": held,
+            "stale_gallery": stale,
+            "unembedded_folders": unembedded,
+        }
+
+    def apply(self, report):
+        """Apply the fixable part of a report; returns {kind: rows changed}"""
+        fixed = {}
+
+        rows, seen = [], set()
+        for o in report["orphan_folders"]:
+            name = dataset_catalog.folder_base_name(o["folder"])
+            if name and name.lower() not in seen:
+                seen.add(name.lower())
+                rows.append((name, o["images"] > 0))
+        if rows:
+            fixed["orphan_folders"] = database.add_students_from_folders(rows)
+            write_log(f"Reconciler created {fixed['orphan_folders']} student(s) for dataset folders: "
+                      f"{', '.join(o['folder'] for o in report['orphan_folders'])}", "info")
+
+        cleared = [s["id"] for s in report["students_no_faces"] if s["face_registered"]]
+        if cleared:
+            fixed["students_no_faces"] = database.set_face_registered_batch(cleared, False)
+        flagged = [s["id"] for s in report["unflagged_students"]]
+        if flagged:
+            fixed["unflagged_students"] = database.set_face_registered_batch(flagged, True)
+        if cleared or flagged:
+            write_log(f"Reconciler updated face_registered for {len(cleared) + len(flagged)} student(s)", "info")
+
+        if report["stale_gallery"]:
+            # Dropping a label = saving it with no rows (merged into the file under its lock)
+            empty = _gallery_module().FaceGallery()
+            empty.save(self._gallery_file(), labels=report["stale_gallery"])
+            fixed["stale_gallery"] = len(report["stale_gallery"])
+            write_log(f"Reconciler dropped gallery embeddings of: {', '.join(report['stale_gallery'])}", "info")
+
+        if rows:
+            self.catalog.invalidate_students()
+        return fixed
+
+    def run_once(self, fix=None, force=False):
+        """Detect (and by default fix) drift if anything changed since the last pass"""
+        fix = self.auto_fix if fix is None else fix
+        with self._lock:
+            force = force or self._forced
+            self._forced = False
+            signature = self.signature()
+            if not force and self.report is not None and signature == self._signature:
+                return self.report
+            start = time.perf_counter()
+            report = self.detect()
+            report["fixed"] = self.apply(report) if fix else {}
+            if report["fixed"]:
+                # Describe the state after the fixes, keep what was done
+                fixed = report["fixed"]
+                report = self.detect()
+                report["fixed"] = fixed
+            report["duration_ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+            if fix or not self.auto_fix:
+                # A report-only pass must not stop the next background pass from fixing
+                self._signature = self.signature()
+            self.report = report
+            return report
+
+_reconciler = None
+_reconciler_lock = threading.Lock()
+
+def get_reconciler(catalog=None):
+    """Process-wide reconciler, started on first use"""
+    global _reconciler
+    with _reconciler_lock:
+        if _reconciler is None:
+            _reconciler = DatasetReconciler(catalog or dataset_catalog.get_catalog())
+        return _reconciler.start()
+
+def dataset_changed(folder=None, dataset_dir=dataset_catalog.DATASET_DIR):
+    """Make the catalog pick up an added/removed folder or student right away and re-check drift"""
+    catalog = dataset_catalog.get_catalog(dataset_dir)
+    catalog.invalidate(folder)
+    catalog.invalidate_students()
+    get_reconciler(catalog).request()
@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import time
+import argparse
+import cv2
+import numpy as np
+
+import face_detectors
+from recognition_engine import MIN_FACE_SIZE, box_iou
+
+# ==========================================
+# FACE DETECTOR BENCHMARK
+# ==========================================
+# Usage:
+#   python detector_benchmark.py <clip.mp4> [--detectors yolo,yunet,haar]
+#                                [--annotations boxes.json | --reference yolo]
+#                                [--every N] [--max-frames N] [--json results.json]
+#
+# Measures per-frame latency and recall of each detector on the same
+# classroom footage. Ground truth is either an annotations file
+#   {"<frame index>": [[x1, y1, x2, y2], ...], ...}
+# or, without one, the boxes of a reference detector (default yolo). Only
+# faces of at least MIN_FACE_SIZE count, since smaller ones are never
+# recognised anyway. A detection matches ground truth at IoU >= 0.5.
+
+MATCH_IOU = 0.5
+
+def _read_frames(video_path, every=1, max_frames=None):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video: {video_path}")
+    frames, index = [], 0
+    while max_frames is None or len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if index % every == 0:
+            frames.append((index, frame))
+        index += 1
+    cap.release()
+    return frames
+
+def _large(boxes):
+    return [b for b in boxes if b[2] - b[0] >= MIN_FACE_SIZE and b[3] - b[1] >= MIN_FACE_SIZE]
+
+def _match_count(truth, predicted):
+    """Greedy one-to-one matching of ground-truth boxes at MATCH_IOU"""
+    used = set()
+    hits = 0
+    for t in truth:
+        best, best_iou = None, MATCH_IOU
+        for i, p in enumerate(predicted):
+            if i in used:
+                continue
+            iou = box_iou(t, p)
+            if iou >= best_iou:
+                best, best_iou = i, iou
+        if best is not None:
+            used.add(best)
+            hits += 1
+    return hits
+
+def run_detector(detector, frames, truth):
+    """Latency and recall of one detector over pre-decoded frames"""
+    latencies = []
+    truth_total = hits = predicted_total = with_landmarks = 0
+    for index, frame in frames:
+        t0 = time.perf_counter()
+        detections = detector.detect(frame)
+        latencies.append(time.perf_counter() - t0)
+        boxes = _large([d.box for d in detections])
+        with_landmarks += sum(1 for d in detections if d.landmarks is not None)
+        predicted_total += len(boxes)
+        expected = truth.get(index, [])
+        truth_total += len(expected)
+        hits += _match_count(expected, boxes)
+
+    arr = np.asarray(latencies) * 1000.0
+    return {
+        "detector": detector.name,
+        "frames": len(frames),
+        "latency_p50_ms": round(float(np.percentile(arr, 50)), 2) if len(arr) else None,
+        "latency_p95_ms": round(float(np.percentile(arr, 95)), 2) if len(arr) else None,
+        "fps": round(1000.0 / arr.mean(), 1) if len(arr) and arr.mean() > 0 else None,
+        "faces_expected": truth_total,
+        "faces_found": hits,
+        "recall": round(hits / truth_total, 3) if truth_total else None,
+        "extra_boxes": max(0, predicted_total - hits),
+        "landmarks": with_landmarks > 0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare face detectors on recorded footage")
+    parser.add_argument("video")
+    parser.add_argument("--detectors", default=",".join(face_detectors.DETECTORS))
+    parser.add_argument("--annotations", help="JSON file of ground-truth boxes per frame index")
+    parser.add_argument("--reference", default="yolo", help="Detector used as ground truth without annotations")
+    parser.add_argument("--every", type=int, default=1, help="Use every Nth frame")
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument("--json", dest="json_out", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.video):
+        print(f"[ERROR] Video not found: {args.video}")
+        sys.exit(1)
+
+    frames = _read_frames(args.video, max(1, args.every), args.max_frames)
+    print(f"[INFO] {len(frames)} frame(s) loaded from {os.path.basename(args.video)}")
+
+    if args.annotations:
+        with open(args.annotations, "r", encoding="utf-8") as f:
+            truth = {int(k): _large([tuple(b) for b in v]) for k, v in json.load(f).items()}
+        truth_source = os.path.basename(args.annotations)
+    else:
+        reference = face_detectors.create_detector(args.reference)
+        truth = {index: _large([d.box for d in reference.detect(frame)]) for index, frame in frames}
+        truth_source = f"reference detector '{args.reference}'"
+    print(f"[INFO] Ground truth: {truth_source}")
+
+    results = []
+    for name in [n.strip() for n in args.detectors.split(",") if n.strip()]:
+        try:
+            detector = face_detectors.create_detector(name)
+        except Exception as e:
+            print(f"  ⚠️  {name} unavailable: {e}")
+            continue
+        if frames:
+            detector.detect(frames[0][1])  # Warm-up, not timed
+        results.append(run_detector(detector, frames, truth))
+
+    print("=" * 72)
+    print(f"  {'DETECTOR':<10}{'p50':>10}{'p95':>10}{'FPS':>8}{'RECALL':>9}{'EXTRA':>8}{'LANDMARKS':>12}")
+    for r in results:
+        print(f"  {r['detector']:<10}{r['latency_p50_ms'] or 0:>8.1f}ms{r['latency_p95_ms'] or 0:>8.1f}ms"
+              f"{r['fps'] or 0:>8.1f}{r['recall'] if r['recall'] is not None else '-':>9}"
+              f"{r['extra_boxes']:>8}{'yes' if r['landmarks'] else 'no':>12}")
+    print("=" * 72)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"video": args.video, "ground_truth": truth_source, "results": results}, f, indent=2)
+        print(f"[OK] Results written to {os.path.abspath(args.json_out)}")
+
+if __name__ == "__main__":
+    main()
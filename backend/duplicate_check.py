@@ -0,0 +1,90 @@
+import sys
+import json
+import numpy as np
+
+import face_gallery
+
+# ==========================================
+# NEAR-DUPLICATE ENROLLMENT DETECTION
+# ==========================================
+# Usage (batch audit of the whole gallery):
+#   python duplicate_check.py [--json]
+#
+# The same person enrolled under two names inflates the gallery and makes
+# the recognizer flip between them. A new enrollment is compared against
+# every existing identity; an identity is a likely duplicate when the
+# median (over the new images) of the best distance to that identity is
+# well below the recognition threshold.
+
+DUPLICATE_DISTANCE = 0.30     # Stricter than DISTANCE_THRESHOLD (0.40) in recognize_attendance.py
+DUPLICATE_EXIT_CODE = 3       # capture_faces.py exit status when a duplicate was flagged
+AUDIT_BLOCK_SIZE = 1024       # Identities per block in the prototype scan
+
+def find_duplicates(gallery, embeddings, exclude=None, threshold=DUPLICATE_DISTANCE):
+    """
+    Compare a new student's embeddings with every identity in the gallery.
+    Returns [(label, median_distance), ...] for likely duplicates, nearest first.
+    """
+    if len(gallery) == 0 or embeddings is None or len(embeddings) == 0:
+        return []
+    names, sims = gallery.identity_similarities(embeddings)
+    scores = np.median(1.0 - sims, axis=0)
+    matches = [(names[i], float(scores[i])) for i in np.argsort(scores)
+               if scores[i] < threshold and names[i] != exclude]
+    return matches
+
+def identity_prototypes(gallery):
+    """Mean normalised embedding per identity: (names, prototypes)"""
+    matrix, starts, names = gallery._index()
+    if len(names) == 0:
+        return names, np.empty((0, 0), dtype=np.float32)
+    sums = np.add.reduceat(matrix, starts, axis=0)
+    return names, face_gallery.normalize(sums)
+
+def audit(gallery, threshold=DUPLICATE_DISTANCE, block_size=AUDIT_BLOCK_SIZE):
+    """
+    Scan the whole gallery for duplicate identity pairs.
+    Prototypes are compared block by block (memory stays O(block x identities)),
+    then candidate pairs are confirmed image-by-image on their own rows.
+    """
+    names, protos = identity_prototypes(gallery)
+    # Prototype distance is a lower-variance proxy; use a looser pre-filter
+    prefilter = threshold + 0.10
+    candidates = set()
+    for start in range(0, len(names), block_size):
+        block = protos[start:start + block_size]
+        dists = 1.0 - block @ protos.T
+        rows, cols = np.nonzero(dists < prefilter)
+        for r, c in zip(rows, cols):
+            i = start + r
+            if i < c:
+                candidates.add((i, c))
+
+    # Confirm each candidate on the two identities' rows only (same score as find_duplicates)
+    matrix, starts, _ = gallery._index()
+    ends = np.r_[starts[1:], len(matrix)]
+    pairs = []
+    for i, j in sorted(candidates):
+        own = matrix[starts[i]:ends[i]]
+        other = matrix[starts[j]:ends[j]]
+        score = float(np.median(1.0 - (own @ other.T).max(axis=1)))
+        if score < threshold:
+            pairs.append((names[i], names[j], score))
+    pairs.sort(key=lambda p: p[2])
+    return pairs
+
+if __name__ == "__main__":
+    gallery = face_gallery.FaceGallery.load()
+    if len(gallery) == 0:
+        print("[ERROR] Gallery is empty — enroll students first")
+        sys.exit(1)
+    print(f"[INFO] Auditing {len(gallery.identities())} identities ({len(gallery)} embeddings)...")
+    pairs = audit(gallery)
+    if "--json" in sys.argv:
+        print(json.dumps([{"a": a, "b": b, "distance": round(d, 4)} for a, b, d in pairs], indent=2))
+    elif pairs:
+        print(f"[WARNING] {len(pairs)} likely duplicate pair(s):")
+        for a, b, d in pairs:
+            print(f"  ⚠️  {a}  <->  {b}   (median distance {d:.3f})")
+    else:
+        print("[OK] No duplicate enrollments found")
@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+from datetime import datetime
+import numpy as np
+
+import recognition_engine
+import video_sources
+from recognition_engine import MIN_FACE_SIZE, ConfirmationTracker, crop_face
+
+# ==========================================
+# HEADLESS REPLAY BENCHMARK
+# ==========================================
+# Usage:
+#   python engine_benchmark.py <source> [--engines arcface,lbph,hybrid] [--detector yunet]
+#                              [--expected "Name_Roll,..." | --expected-file names.txt]
+#                              [--max-frames N] [--json results.json]
+#
+#   <source> is any video_sources spec: clip.mp4, a frame folder, or
+#   synthetic[:N] (N enrolled students' held-out images, which the engines
+#   are built without; expected roster filled in automatically)
+#
+# Replays the same footage through each engine with the same MIN_FACE_SIZE
+# filter and ConfirmationTracker as recognize_attendance.py, without a window
+# and without writing attendance. Confirmation uses source time (frame index
+# / FPS), so marks do not depend on how fast the engine runs; FPS and
+# latency do. Output JSON (schema BENCHMARK_SCHEMA) is meant to be diffed
+# between runs and machines.
+
+BENCHMARK_SCHEMA = 1
+STAGES = ("capture", "detect", "identify", "confirm", "frame")
+MEMORY_SAMPLE_EVERY = 10        # Frames between RSS samples
+
+def _percentiles(values):
+    if not values:
+        return {"count": 0, "p50_ms": None, "p90_ms": None, "p99_ms": None, "max_ms": None}
+    arr = np.asarray(values) * 1000.0
+    return {
+        "count": len(values),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p90_ms": round(float(np.percentile(arr, 90)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "max_ms": round(float(arr.max()), 3),
+    }
+
+def _process():
+    try:
+        import psutil
+        return psutil.Process()
+    except ImportError:
+        return None
+
+def run_engine(engine, source, expected=None, max_frames=None):
+    """Replay one source through one engine and return a result dict"""
+    proc = _process()
+    cpu_before = proc.cpu_times() if proc else None
+    rss_peak = proc.memory_info().rss if proc else 0
+
+    tracker = ConfirmationTracker()
+    marked = set()
+    timings = {stage: [] for stage in STAGES}
+    frames = faces = 0
+    wall_start = time.perf_counter()
+
+    while max_frames is None or frames < max_frames:
+        t0 = time.perf_counter()
+        ret, frame = source.read()
+        t1 = time.perf_counter()
+        if not ret:
+            break
+        timings["capture"].append(t1 - t0)
+        source_time = source.position
+        frames += 1
+
+        detections = engine.detect(frame)
+        t2 = time.perf_counter()
+        timings["detect"].append(t2 - t1)
+
+        for detection in detections:
+            box = detection.box
+            if box[2] - box[0] < MIN_FACE_SIZE or box[3] - box[1] < MIN_FACE_SIZE:
+                continue
+            face_crop = crop_face(frame, box, detection.landmarks)
+            if face_crop.size == 0:
+                continue
+            faces += 1
+            t3 = time.perf_counter()
+            try:
+                match = engine.identify(face_crop, box)
+            except Exception:
+                match = None
+            t4 = time.perf_counter()
+            timings["identify"].append(t4 - t3)
+            if tracker.observe(match, now=source_time) >= 1.0 and match.folder not in marked:
+                marked.add(match.folder)
+                tracker.record_mark(match.folder, now=source_time)
+            timings["confirm"].append(time.perf_counter() - t4)
+        timings["frame"].append(time.perf_counter() - t0)
+
+        if proc and frames % MEMORY_SAMPLE_EVERY == 0:
+            rss_peak = max(rss_peak, proc.memory_info().rss)
+
+    wall = time.perf_counter() - wall_start
+    source.release()
+
+    resources = None
+    if proc:
+        cpu_after = proc.cpu_times()
+        cpu_seconds = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+        rss_peak = max(rss_peak, proc.memory_info().rss)
+        resources = {
+            "cpu_seconds": round(cpu_seconds, 3),
+            "cpu_percent": round(100.0 * cpu_seconds / wall, 1) if wall > 0 else None,
+            "rss_peak_mb": round(rss_peak / (1024 * 1024), 1),
+        }
+
+    ttm = tracker.time_to_mark
+    result = {
+        "engine": engine.describe(),
+        "frames": frames,
+        "faces": faces,
+        "wall_seconds": round(wall, 3),
+        "fps": round(frames / wall, 2) if wall > 0 else None,
+        "stages": {stage: _percentiles(values) for stage, values in timings.items()},
+        "marked": sorted(marked),
+        "time_to_mark": {k: round(v, 3) for k, v in sorted(ttm.items())},
+        "time_to_mark_p50": round(float(np.median(list(ttm.values()))), 3) if ttm else None,
+        "resources": resources,
+        "engine_stats": dict(engine.stats),
+    }
+    if expected is not None:
+        expected = set(expected)
+        result["correct"] = len(marked & expected)
+        result["false_marks"] = sorted(marked - expected)
+        result["missed"] = sorted(expected - marked)
+        result["recall"] = round(len(marked & expected) / len(expected), 3) if expected else None
+        result["precision"] = round(len(marked & expected) / len(marked), 3) if marked else None
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay footage through recognition engines headlessly")
+    parser.add_argument("source", help="Video file, image folder/glob or synthetic[:N]")
+    parser.add_argument("--engines", default=",".join(recognition_engine.ENGINES))
+    parser.add_argument("--detector", help="Override the engines' face detector (yolo / yunet / haar)")
+    parser.add_argument("--expected", help="Comma-separated folder names present in the footage")
+    parser.add_argument("--expected-file", help="File with one expected folder name per line")
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument("--json", dest="json_out", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    probe = video_sources.open_source(args.source)
+    if not probe.isOpened() or getattr(probe, "live", False):
+        print(f"[ERROR] Not a replayable source: {args.source}")
+        sys.exit(1)
+
+    expected = getattr(probe, "expected", None)
+    # Synthetic faces come from TrainingImage: engines are built without them
+    heldout = getattr(probe, "heldout_paths", None)
+    probe.release()
+    if args.expected:
+        expected = [n.strip() for n in args.expected.split(",") if n.strip()]
+    elif args.expected_file:
+        with open(args.expected_file, "r", encoding="utf-8") as f:
+            expected = [line.strip() for line in f if line.strip()]
+
+    results = []
+    for name in [n.strip() for n in args.engines.split(",") if n.strip()]:
+        print(f"[INFO] Loading engine: {name}")
+        engine = recognition_engine.create_engine(name, detector=args.detector, exclude_paths=heldout)
+        if engine.name != name:
+            print(f"  ⚠️  {name} unavailable, skipped")
+            continue
+        print(f"[INFO] Replaying {args.source} through {engine.describe()}...")
+        # Fresh source per engine so every engine sees identical frames
+        results.append(run_engine(engine, video_sources.open_source(args.source), expected, args.max_frames))
+
+    print("=" * 96)
+    print(f"  {'ENGINE':<16}{'FPS':>7}{'DETECT p50':>12}{'IDENT p50':>11}{'IDENT p99':>11}"
+          f"{'TTM p50':>9}{'CPU%':>7}{'RSS MB':>8}{'RECALL':>8}{'FALSE':>7}")
+    for r in results:
+        st, res = r["stages"], r["resources"] or {}
+        print(f"  {r['engine']:<16}{r['fps'] or 0:>7.1f}{st['detect']['p50_ms'] or 0:>10.1f}ms"
+              f"{st['identify']['p50_ms'] or 0:>9.1f}ms{st['identify']['p99_ms'] or 0:>9.1f}ms"
+              f"{r['time_to_mark_p50'] if r['time_to_mark_p50'] is not None else '-':>9}"
+              f"{res.get('cpu_percent', '-'):>7}{res.get('rss_peak_mb', '-'):>8}"
+              f"{r.get('recall') if r.get('recall') is not None else '-':>8}"
+              f"{len(r['false_marks']) if 'false_marks' in r else '-':>7}")
+    print("=" * 96)
+
+    if args.json_out:
+        report = {
+            "schema": BENCHMARK_SCHEMA,
+            "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "source": args.source,
+            "expected": sorted(expected) if expected is not None else None,
+            "heldout_images": len(heldout) if heldout is not None else None,
+            "host": {"platform": platform.platform(), "python": platform.python_version(),
+                     "cpus": os.cpu_count()},
+            "results": results,
+        }
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[OK] Results written to {os.path.abspath(args.json_out)}")
+
+if __name__ == "__main__":
+    main()
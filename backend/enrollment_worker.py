@@ -0,0 +1,158 @@
+import os
+import glob
+import queue
+import zipfile
+import threading
+import cv2
+
+import database
+import dataset_reconciler
+import face_gallery
+import duplicate_check
+
+# ==========================================
+# ENROLLMENT UPLOAD STORAGE & BACKGROUND WORKER
+# ==========================================
+# Chunks of an upload are written straight into UPLOAD_DIR/<upload_id>.part.
+# Once the client calls /complete, the file is handed to a single background
+# thread that runs the same detect/align/filter/embed pipeline as
+# bulk_enroll.py and flips students.face_registered when faces were found.
+
+UPLOAD_DIR = "uploads"
+MAX_UPLOAD_SIZE = 200 * 1024 * 1024     # 200 MB — a short clip or a zip of photos
+CHUNK_SIZE = 2 * 1024 * 1024            # Suggested client chunk size
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+ALLOWED_EXTENSIONS = IMAGE_EXTENSIONS + VIDEO_EXTENSIONS + ('.zip',)
+
+_jobs = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+def part_path(upload_id):
+    """Location of the partially uploaded file"""
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.part")
+
+def write_chunk(upload_id, offset, data):
+    """Write a chunk at the given byte offset and return the new end position"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    # Create without truncating, so a concurrent retry of the first chunk cannot wipe data
+    fd = os.open(part_path(upload_id), os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+    with os.fdopen(fd, "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+    return offset + len(data)
+
+def _sources_for(upload):
+    """Validate the uploaded file and describe it as bulk_enroll media sources"""
+    path = part_path(upload['id'])
+    ext = os.path.splitext(upload['filename'])[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        if cv2.imread(path) is None:
+            raise ValueError("File is not a readable image")
+        return [("image", path, None)]
+    if ext in VIDEO_EXTENSIONS:
+        cap = cv2.VideoCapture(path)
+        ok = cap.isOpened() and cap.read()[0]
+        cap.release()
+        if not ok:
+            raise ValueError("File is not a readable video")
+        return [("video", path, None)]
+    if ext == '.zip':
+        if not zipfile.is_zipfile(path):
+            raise ValueError("File is not a valid zip archive")
+        with zipfile.ZipFile(path) as zf:
+            members = [m for m in zf.namelist() if m.lower().endswith(IMAGE_EXTENSIONS)]
+        if not members:
+            raise ValueError("Zip archive contains no images")
+        return [("zip", path, m) for m in members]
+    raise ValueError(f"Unsupported file type '{ext}'")
+
+def _process(upload_id):
+    import bulk_enroll
+    from image_writer import AsyncImageWriter
+
+    upload = database.get_enrollment_upload(upload_id)
+    if not upload:
+        return
+    student = database.get_student_by_id(upload['student_id'])
+    if not student:
+        database.update_enrollment_upload(upload_id, status='failed', message='Student no longer exists')
+        return
+
+    database.update_enrollment_upload(upload_id, status='processing')
+    try:
+        sources = _sources_for(upload)
+        bulk_enroll.init_models()
+        folder = f"{student['name']}_{student['roll_number']}" if student.get('roll_number') else student['name']
+        _, crops, embeddings, stats = bulk_enroll.process_student(folder, sources)
+        if not crops:
+            database.update_enrollment_upload(upload_id, status='failed', message=f"No usable face found ({stats['frames']} frame(s) checked)")
+            return
+
+        gallery = face_gallery.FaceGallery.load()
+        duplicates = duplicate_check.find_duplicates(gallery, embeddings, exclude=folder)
+        if duplicates:
+            matches = ", ".join(f"{label} ({dist:.3f})" for label, dist in duplicates)
+            database.update_enrollment_upload(upload_id, status='duplicate', message=f"Possible duplicate of: {matches}")
+            return
+
+        writer = AsyncImageWriter(target_size=bulk_enroll.TARGET_SIZE, jpeg_quality=95)
+        bulk_enroll.save_enrollment(folder, crops, embeddings, gallery, writer)
+        writer.close()
+        gallery.save(labels=[folder])
+
+        for pattern in ("representations_*.pkl", "ds_model_*.pkl"):
+            for f in glob.glob(os.path.join(face_gallery.DATASET_DIR, pattern)):
+                try:
+                    os.remove(f)
+                except Exception:
+                    pass
+
+        database.set_face_registered(student['id'])
+        # Same hook as the synchronous registration routes: catalog and drift report see the images now
+        dataset_reconciler.dataset_changed(folder)
+        database.update_enrollment_upload(upload_id, status='done', images_added=len(crops),
+                                          message=f"{len(crops)} face image(s) enrolled")
+    except Exception as e:
+        database.update_enrollment_upload(upload_id, status='failed', message=str(e))
+    finally:
+        try:
+            os.remove(part_path(upload_id))
+        except OSError:
+            pass
+
+def _run():
+    while True:
+        upload_id = _jobs.get()
+        try:
+            _process(upload_id)
+        finally:
+            _jobs.task_done()
+
+def _start_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="enrollment-worker", daemon=True)
+            _worker.start()
+
+def enqueue(upload_id):
+    """Queue a completed upload for processing, starting the worker on first use"""
+    _start_worker()
+    database.update_enrollment_upload(upload_id, status='queued')
+    _jobs.put(upload_id)
+
+def resume_pending():
+    """Re-queue uploads left queued/processing by a previous server run; returns how many"""
+    resumed = 0
+    for upload in database.get_enrollment_uploads_by_status('queued', 'processing'):
+        if os.path.exists(part_path(upload['id'])):
+            enqueue(upload['id'])
+            resumed += 1
+        else:
+            database.update_enrollment_upload(upload['id'], status='failed',
+                                              message='Uploaded file was lost when the server restarted')
+    if resumed:
+        print(f"[INFO] Resumed {resumed} pending enrollment upload(s)")
+    return resumed
@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from datetime import datetime
+
+# ==========================================
+# SHARED EVENT LOG
+# ==========================================
+# One JSONL event log for the Flask app and the camera scripts:
+#   {"timestamp": "...", "type": "info|success|warning|error", "message": "..."}
+#
+#   from event_log import write_log
+#   write_log("Attendance recorded for ...", "success")
+#   write_log(f"{name} already recorded", "warning", sample="already-recorded")
+#
+# write_log() only appends to an in-memory buffer. A daemon thread writes
+# the buffer every FLUSH_INTERVAL seconds (or sooner once MAX_BUFFER records
+# are waiting) as a single append under an inter-process file lock, so
+# app.py and several scanner processes can share the file without
+# interleaving lines. Buffered records are flushed at interpreter exit.
+#
+# Messages given a `sample` key are rate-limited: the first one per key in
+# each SAMPLE_WINDOW is written, the rest are counted and summarised in one
+# "(N similar messages suppressed)" record when the window closes.
+#
+# Once the file would grow past MAX_BYTES it is rotated to .1 .. .BACKUP_COUNT
+# (with its log_reader index). Reading and querying live in log_reader.py.
+
+LOG_FILE = "system_logs.jsonl"
+FLUSH_INTERVAL = 0.5
+MAX_BUFFER = 200
+SAMPLE_WINDOW = 10.0
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+INDEX_SUFFIX = ".idx"
+
+def log_files(path=LOG_FILE, backups=BACKUP_COUNT):
+    """Current log file followed by its rotated backups, newest first"""
+    return [path] + [f"{path}.{i}" for i in range(1, backups + 1)]
+
+def _rotate(path, backups=BACKUP_COUNT):
+    """Shift path -> path.1 -> ... -> path.<backups> (caller holds the file lock)"""
+    files = log_files(path, backups)
+    for suffix in ("", INDEX_SUFFIX):
+        if os.path.exists(files[-1] + suffix):
+            os.remove(files[-1] + suffix)
+        for src, dst in zip(reversed(files[:-1]), reversed(files[1:])):
+            if os.path.exists(src + suffix):
+                os.replace(src + suffix, dst + suffix)
+
+class FileLock:
+    """Exclusive lock on a sidecar .lock file (fcntl on POSIX, msvcrt on Windows)"""
+
+    def __init__(self, path):
+        self.path = path + ".lock"
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except (ImportError, OSError):
+            pass    # Fall back to O_APPEND, which keeps single writes whole on local disks
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        except (ImportError, OSError):
+            pass
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+class EventLogger:
+    """Buffered JSONL writer with a background flush thread and message sampling"""
+
+    def __init__(self, path=LOG_FILE, echo=False, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.echo = echo
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._samples = {}      # key -> [window_start, suppressed, log_type]
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush, final=True)
+
+    def log(self, message, log_type="info", sample=None):
+        now = time.time()
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            if sample is not None and not self._admit(sample, log_type, now):
+                return
+            self._expire_samples(now)
+            self._buffer.append({"timestamp": timestamp, "type": log_type, "message": message})
+            full = len(self._buffer) >= MAX_BUFFER
+        if self.echo:
+            print(f"[{timestamp}] {message}")
+        if full:
+            self._wake.set()
+
+    def _admit(self, key, log_type, now):
+        state = self._samples.get(key)
+        if state is None or now - state[0] >= SAMPLE_WINDOW:
+            if state is not None and state[1]:
+                self._buffer.append(self._suppressed_record(key, state))
+            self._samples[key] = [now, 0, log_type]
+            return True
+        state[1] += 1
+        return False
+
+    def _expire_samples(self, now):
+        for key in [k for k, s in self._samples.items() if now - s[0] >= SAMPLE_WINDOW]:
+            state = self._samples.pop(key)
+            if state[1]:
+                self._buffer.append(self._suppressed_record(key, state))
+
+    @staticmethod
+    def _suppressed_record(key, state):
+        return {"timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "type": state[2],
+                "message": f"({state[1]} similar '{key}' messages suppressed)"}
+
+    def flush(self, final=False):
+        """Write everything buffered in one locked append (final: also close sampling windows)"""
+        with self._write_lock:
+            with self._lock:
+                self._expire_samples(time.time() + SAMPLE_WINDOW if final else time.time())
+                records, self._buffer = self._buffer, []
+            if not records:
+                return 0
+            data = "".join(json.dumps(r) + "\n" for r in records).encode("utf-8")
+            try:
+                with FileLock(self.path):
+                    try:
+                        if os.path.getsize(self.path) + len(data) > MAX_BYTES:
+                            _rotate(self.path)
+                    except OSError:
+                        pass    # Missing file, or a reader holds it open on Windows; rotate next time
+                    fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+                    try:
+                        os.write(fd, data)
+                    finally:
+                        os.close(fd)
+            except OSError as e:
+                print(f"Error writing to log: {e}")
+                with self._lock:
+                    self._buffer = records + self._buffer
+                return 0
+        return len(records)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+_logger = None
+_logger_lock = threading.Lock()
+
+def get_logger():
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            _logger = EventLogger()
+        return _logger
+
+def configure(path=None, echo=None):
+    """Set the log file and console echo for this process (call before logging)"""
+    logger = get_logger()
+    if path is not None:
+        logger.flush()
+        logger.path = path
+    if echo is not None:
+        logger.echo = echo
+    return logger
+
+def write_log(message, log_type="info", sample=None):
+    """Buffer one event; returns immediately"""
+    get_logger().log(message, log_type, sample)
+
+def flush():
+    return get_logger().flush()
@@ -0,0 +1,109 @@
+import os
+import cv2
+import numpy as np
+from collections import namedtuple
+
+# ==========================================
+# FACE DETECTORS
+# ==========================================
+# Every backend returns a list of Detection(box, landmarks, score):
+#   box       — (x1, y1, x2, y2) ints in frame pixels
+#   landmarks — 5x2 float32 array in image-left to image-right order:
+#               eye, eye, nose tip, mouth corner, mouth corner
+#               (None when the backend has no landmarks, i.e. Haar)
+#   score     — detector confidence in [0, 1] (1.0 for Haar)
+#
+#   yolo  — YOLOv8-face (PyTorch via ultralytics), most accurate, heaviest
+#   yunet — OpenCV YuNet DNN (ONNX, ~300 KB), fast on CPU, no PyTorch needed
+#   haar  — OpenCV Haar cascade, cheapest, frontal faces only
+#
+# The detector is chosen with ATTENDANCE_DETECTOR; otherwise each
+# recognition engine uses its own default.
+
+DETECTORS = ("yolo", "yunet", "haar")
+YOLO_MODEL_FILE = "yolov8n-face.pt"
+# https://github.com/opencv/opencv_zoo/tree/main/models/face_detection_yunet
+YUNET_MODEL_FILE = "face_detection_yunet_2023mar.onnx"
+# Minimum detector confidence, per backend. YOLO keeps ultralytics' own
+# default (0.25) as the baseline did: small, distant faces at the back of a
+# classroom often score below 0.5. YuNet's scores run higher; 0.6 is the
+# opencv_zoo default.
+YOLO_SCORE_THRESHOLD = 0.25
+YUNET_SCORE_THRESHOLD = 0.6
+
+Detection = namedtuple("Detection", "box landmarks score")
+
+class YoloFaceDetector:
+    """YOLOv8-face boxes and 5-point keypoints"""
+    name = "yolo"
+
+    def __init__(self, model_path=YOLO_MODEL_FILE):
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+
+    def detect(self, frame):
+        detections = []
+        for result in self.model(frame, verbose=False):
+            keypoints = getattr(result, "keypoints", None)
+            kp_xy = keypoints.xy.cpu().numpy() if keypoints is not None and len(keypoints) else None
+            for i, box in enumerate(result.boxes):
+                score = float(box.conf[0]) if box.conf is not None else 1.0
+                if score < YOLO_SCORE_THRESHOLD:
+                    continue
+                landmarks = kp_xy[i].astype(np.float32) if kp_xy is not None and i < len(kp_xy) else None
+                detections.append(Detection(tuple(map(int, box.xyxy[0])), landmarks, score))
+        return detections
+
+class YuNetFaceDetector:
+    """OpenCV FaceDetectorYN (needs OpenCV >= 4.8 and the YuNet ONNX file)"""
+    name = "yunet"
+
+    def __init__(self, model_path=YUNET_MODEL_FILE):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"YuNet model not found: {model_path} (download it from opencv_zoo)")
+        self.model = cv2.FaceDetectorYN.create(model_path, "", (320, 320), YUNET_SCORE_THRESHOLD, 0.3, 5000)
+        self._size = None
+
+    def detect(self, frame):
+        h, w = frame.shape[:2]
+        if self._size != (w, h):
+            self.model.setInputSize((w, h))
+            self._size = (w, h)
+        _, faces = self.model.detect(frame)
+        detections = []
+        if faces is None:
+            return detections
+        for face in faces:
+            x, y, fw, fh = face[:4]
+            box = (int(x), int(y), int(x + fw), int(y + fh))
+            landmarks = face[4:14].reshape(5, 2).astype(np.float32)
+            detections.append(Detection(box, landmarks, float(face[14])))
+        return detections
+
+class HaarFaceDetector:
+    """OpenCV Haar cascade boxes, as used by the legacy LBPH scripts"""
+    name = "haar"
+
+    def __init__(self, cascade_path=None):
+        cascade_path = cascade_path or os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+
+    def detect(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = self.cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5, minSize=(50, 50))
+        return [Detection((int(x), int(y), int(x + w), int(y + h)), None, 1.0) for (x, y, w, h) in faces]
+
+def configured_detector(name=None, default="yolo"):
+    """Detector name to use: explicit name, else ATTENDANCE_DETECTOR, else the given default"""
+    return (name or os.environ.get("ATTENDANCE_DETECTOR") or default).strip().lower()
+
+def create_detector(name=None, default="yolo"):
+    """Build a detector by name, else ATTENDANCE_DETECTOR, else the given default"""
+    name = configured_detector(name, default)
+    if name == "yolo":
+        return YoloFaceDetector()
+    if name == "yunet":
+        return YuNetFaceDetector()
+    if name == "haar":
+        return HaarFaceDetector()
+    raise ValueError(f"Unknown face detector '{name}' (choose from {', '.join(DETECTORS)})")
@@ -0,0 +1,272 @@
+import os
+import numpy as np
+
+# ==========================================
+# ARCFACE EMBEDDING GALLERY
+# ==========================================
+# Stores one L2-normalised ArcFace embedding per saved face image so that
+# capture, enrollment and recognition can compare faces without asking
+# DeepFace to rebuild its representations_*.pkl cache every time.
+#
+# Several processes write the gallery (capture, the enrollment worker, bulk
+# enrollment, the reconciler, gallery syncs). save(labels=...) merges just
+# the labels a caller changed into the file on disk under an inter-process
+# lock, so concurrent writers do not drop each other's embeddings.
+
+DATASET_DIR = "TrainingImage"
+# DeepFace model used for every embedding. Other models (see model_benchmark.py)
+# can be selected with FACE_EMBEDDING_MODEL; each keeps its own gallery file,
+# and DISTANCE_THRESHOLD must be re-tuned with threshold_sweep.py after a switch.
+MODEL_NAME = os.environ.get("FACE_EMBEDDING_MODEL", "ArcFace")
+GALLERY_FILE = os.path.join(DATASET_DIR, f"gallery_{MODEL_NAME.lower()}.npz")
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Enrollment (capture, bulk, uploads) and recognition all crop faces with
+# crop_aligned_face() so gallery and query embeddings see the same framing:
+# eyes levelled when the detector gives landmarks, then the box padded by
+# FACE_PADDING on every side.
+FACE_PADDING = 0.15
+
+# A new face image is only worth keeping if it is at least this far (cosine
+# distance) from every image already kept for the student. Consecutive frames
+# of a still face sit around 0.02-0.05; a real pose change is 0.10+.
+DIVERSITY_MIN_DISTANCE = 0.08
+
+_deepface = None
+
+def _get_deepface():
+    """Import DeepFace on first use (pulls in TensorFlow, so keep it lazy)"""
+    global _deepface
+    if _deepface is None:
+        from deepface import DeepFace
+        _deepface = DeepFace
+    return _deepface
+
+def normalize(vectors):
+    """L2-normalise a single vector or each row of a matrix"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def embed_face(face_img, model_name=MODEL_NAME):
+    """Return the normalised embedding (ArcFace by default) of an already-cropped BGR face"""
+    DeepFace = _get_deepface()
+    reps = DeepFace.represent(
+        img_path=face_img,
+        model_name=model_name,
+        detector_backend="skip",
+        enforce_detection=False
+    )
+    return normalize(reps[0]["embedding"])
+
+def crop_aligned_face(frame, box, landmarks=None, padding=FACE_PADDING):
+    """Rotate the frame so the eyes are level (if landmarks are known), then take the padded face crop"""
+    import cv2
+
+    x1, y1, x2, y2 = box
+    if landmarks is not None and len(landmarks) >= 2:
+        (lx, ly), (rx, ry) = landmarks[0], landmarks[1]
+        angle = np.degrees(np.arctan2(ry - ly, rx - lx))
+        if abs(angle) > 2:
+            center = ((lx + rx) / 2.0, (ly + ry) / 2.0)
+            M = cv2.getRotationMatrix2D(center, angle, 1.0)
+            frame = cv2.warpAffine(frame, M, (frame.shape[1], frame.shape[0]), borderMode=cv2.BORDER_REPLICATE)
+    h, w = frame.shape[:2]
+    pad_x = int((x2 - x1) * padding)
+    pad_y = int((y2 - y1) * padding)
+    return frame[max(0, y1 - pad_y):min(h, y2 + pad_y), max(0, x1 - pad_x):min(w, x2 + pad_x)]
+
+def cosine_distances(query, matrix):
+    """Cosine distance from one normalised query to every row of a normalised matrix"""
+    if len(matrix) == 0:
+        return np.empty(0, dtype=np.float32)
+    return 1.0 - matrix @ query
+
+def select_diverse(embeddings, min_distance=DIVERSITY_MIN_DISTANCE, limit=None):
+    """Greedily pick row indices whose embeddings are mutually at least min_distance apart"""
+    embeddings = normalize(np.atleast_2d(embeddings))
+    chosen = []
+    for i in range(len(embeddings)):
+        if limit is not None and len(chosen) >= limit:
+            break
+        if not chosen or cosine_distances(embeddings[i], embeddings[chosen]).min() >= min_distance:
+            chosen.append(i)
+    return chosen
+
+class FaceGallery:
+    """In-memory embedding matrix with folder-name labels, persisted as .npz"""
+
+    def __init__(self, embeddings=None, labels=None, paths=None):
+        if embeddings is None or len(embeddings) == 0:
+            self.embeddings = np.empty((0, 0), dtype=np.float32)
+        else:
+            self.embeddings = normalize(embeddings)
+        self.labels = np.asarray(labels if labels is not None else [], dtype=object)
+        self.paths = np.asarray(paths if paths is not None else [], dtype=object)
+        self._index_cache = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _index(self):
+        """Label-sorted view of the matrix used for per-identity reductions (cached)"""
+        if getattr(self, "_index_cache", None) is None:
+            order = np.argsort(self.labels.astype(str), kind="stable")
+            sorted_labels = self.labels[order]
+            starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]]) if len(order) else np.empty(0, dtype=int)
+            # Galleries are usually built student by student; skip the copy when already in order
+            in_order = bool(np.all(order[1:] > order[:-1])) if len(order) > 1 else True
+            matrix = self.embeddings if in_order else self.embeddings[order]
+            self._index_cache = (matrix, starts, sorted_labels[starts])
+        return self._index_cache
+
+    def identity_similarities(self, queries):
+        """
+        Best cosine similarity of every query row to every identity.
+        Returns (names, sims) where sims has shape (len(queries), len(names)).
+        """
+        matrix, starts, names = self._index()
+        queries = normalize(np.atleast_2d(queries))
+        if len(names) == 0:
+            return names, np.empty((len(queries), 0), dtype=np.float32)
+        sims = queries @ matrix.T
+        return names, np.maximum.reduceat(sims, starts, axis=1)
+
+    def subset(self, labels):
+        """New gallery holding only the given folder names (rows are copied)"""
+        if len(self) == 0:
+            return FaceGallery()
+        keep = np.isin(self.labels.astype(str), [str(l) for l in labels])
+        return FaceGallery(self.embeddings[keep], self.labels[keep], self.paths[keep])
+
+    def search(self, query, k=5, exclude=None):
+        """Top-k identities for one query as [(label, distance), ...], nearest first"""
+        names, sims = self.identity_similarities(query)
+        if len(names) == 0:
+            return []
+        dists = 1.0 - sims[0]
+        if exclude is not None:
+            dists = np.where(names == exclude, np.inf, dists)
+        k = min(k, len(names))
+        top = np.argpartition(dists, k - 1)[:k]
+        top = top[np.argsort(dists[top])]
+        return [(names[i], float(dists[i])) for i in top if np.isfinite(dists[i])]
+
+    @classmethod
+    def load(cls, path=GALLERY_FILE):
+        """Load a gallery from disk, or return an empty one if none exists yet"""
+        if not os.path.exists(path):
+            return cls()
+        try:
+            with np.load(path, allow_pickle=True) as data:
+                return cls(data["embeddings"], data["labels"], data["paths"])
+        except Exception as e:
+            print(f"  ⚠️  Could not read gallery {path}: {e}")
+            return cls()
+
+    def _write(self, path):
+        """Write the gallery atomically so readers never see a half-written file"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, embeddings=self.embeddings, labels=self.labels, paths=self.paths)
+        os.replace(tmp_path, path)
+
+    def save(self, path=GALLERY_FILE, labels=None):
+        """
+        Save under the gallery file lock. With labels, only those folder names
+        are written: the file is re-read and their rows replaced by this
+        gallery's rows (or dropped if it has none), keeping other writers' changes.
+        """
+        from event_log import FileLock
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with FileLock(path):
+            if labels is None:
+                self._write(path)
+                return
+            current = FaceGallery.load(path)
+            for label in labels:
+                current.remove(label)
+                rows = self.labels == label
+                if len(self) and rows.any():
+                    current.add(label, self.embeddings[rows], self.paths[rows])
+            current._write(path)
+
+    def identities(self):
+        """Sorted list of distinct folder names in the gallery"""
+        return sorted(set(self.labels.tolist()))
+
+    def remove(self, label):
+        """Drop every embedding stored for a folder name"""
+        if len(self) == 0:
+            return
+        self._index_cache = None
+        keep = self.labels != label
+        self.embeddings = self.embeddings[keep] if keep.any() else np.empty((0, 0), dtype=np.float32)
+        self.labels = self.labels[keep]
+        self.paths = self.paths[keep]
+
+    def add(self, label, embeddings, paths):
+        """Append embeddings (one row per image path) for a folder name"""
+        embeddings = normalize(np.atleast_2d(embeddings))
+        if len(embeddings) == 0:
+            return
+        self._index_cache = None
+        if len(self) == 0:
+            self.embeddings = embeddings
+        else:
+            self.embeddings = np.vstack([self.embeddings, embeddings])
+        self.labels = np.concatenate([self.labels, np.asarray([label] * len(embeddings), dtype=object)])
+        self.paths = np.concatenate([self.paths, np.asarray(list(paths), dtype=object)])
+
+    def replace(self, label, embeddings, paths):
+        """Replace all embeddings of a folder name with a fresh set"""
+        self.remove(label)
+        self.add(label, embeddings, paths)
+
+    def sync(self, dataset_dir=DATASET_DIR):
+        """
+        Bring the gallery in line with the folders on disk: drop students whose
+        folder is gone and embed folders whose image set changed (e.g. images
+        saved before the gallery existed). Returns the number of folders changed;
+        their names are left in self.changed_labels for save(labels=...).
+        """
+        import cv2
+
+        folders = {}
+        if os.path.isdir(dataset_dir):
+            for folder in os.listdir(dataset_dir):
+                folder_path = os.path.join(dataset_dir, folder)
+                if os.path.isdir(folder_path):
+                    folders[folder] = sorted(
+                        os.path.join(folder_path, f) for f in os.listdir(folder_path)
+                        if f.lower().endswith(IMAGE_EXTENSIONS)
+                    )
+
+        changed = []
+        for label in self.identities():
+            if label not in folders or not folders[label]:
+                self.remove(label)
+                changed.append(label)
+        for folder, images in folders.items():
+            if not images or sorted(self.paths[self.labels == folder].tolist()) == images:
+                continue
+            embeddings, paths = [], []
+            for img_path in images:
+                img = cv2.imread(img_path)
+                if img is None:
+                    continue
+                try:
+                    embeddings.append(embed_face(img))
+                    paths.append(img_path)
+                except Exception:
+                    pass
+            if embeddings:
+                self.replace(folder, embeddings, paths)
+            else:
+                self.remove(folder)
+            changed.append(folder)
+        self.changed_labels = changed
+        return len(changed)
@@ -0,0 +1,177 @@
+import os
+import sys
+import json
+import heapq
+import argparse
+from datetime import datetime
+import numpy as np
+
+import face_gallery
+
+# ==========================================
+# GALLERY CONFUSABILITY ANALYSIS
+# ==========================================
+# Usage:
+#   python gallery_analysis.py [--out gallery_report.json] [--top 25] [--memory-mb 64]
+#
+# DISTANCE_THRESHOLD in recognize_attendance.py was tightened from 0.55 to
+# 0.40 after wrong-name matches, without measuring the gallery. This tool
+# computes genuine (same student) and impostor (different student) distance
+# distributions over every embedding pair, lists the most confusable
+# identity pairs and suggests a per-student threshold.
+#
+# The similarity matrix is never materialised: rows are processed in blocks
+# aligned to identity boundaries and sized so that one block x gallery
+# slice stays under --memory-mb. Distributions are accumulated as
+# fixed-bin histograms, so memory does not grow with the number of pairs.
+
+GLOBAL_THRESHOLD = 0.40        # Current DISTANCE_THRESHOLD in recognize_attendance.py
+THRESHOLD_MARGIN = 0.05        # Keep per-student thresholds this far below the nearest impostor
+MIN_THRESHOLD = 0.25
+MAX_THRESHOLD = 0.55
+HIST_BINS = 200                # Cosine distance 0..2 in 0.01 steps
+
+def _hist(dists):
+    idx = np.clip((dists * (HIST_BINS / 2.0)).astype(np.int64), 0, HIST_BINS - 1)
+    return np.bincount(idx.ravel(), minlength=HIST_BINS)
+
+def _hist_percentile(hist, q):
+    total = hist.sum()
+    if total == 0:
+        return None
+    pos = np.searchsorted(np.cumsum(hist), q / 100.0 * total)
+    return round(float((pos + 0.5) * 2.0 / HIST_BINS), 3)
+
+def analyse(gallery, memory_mb=64, top=25):
+    """Blocked all-pairs analysis of a FaceGallery; returns a report dict"""
+    matrix, starts, names = gallery._index()
+    n_rows, n_ids = len(matrix), len(names)
+    ends = np.r_[starts[1:], n_rows]
+    budget_rows = max(1, int(memory_mb * 1024 * 1024 / (4 * max(1, n_rows))))
+
+    genuine_hist = np.zeros(HIST_BINS, dtype=np.int64)
+    impostor_hist = np.zeros(HIST_BINS, dtype=np.int64)
+    students = []
+    pair_heap = []  # min-heap on -distance keeps the `top` closest pairs
+    pair_keys = set()
+
+    ident = 0
+    while ident < n_ids:
+        # Grow the block identity by identity until it hits the row budget
+        last = ident
+        while last + 1 < n_ids and ends[last + 1] - starts[ident] <= budget_rows:
+            last += 1
+        r0, r1 = starts[ident], ends[last]
+        sims = matrix[r0:r1] @ matrix.T
+
+        for k in range(ident, last + 1):
+            a, b = starts[k] - r0, ends[k] - r0
+            own = sims[a:b]
+            genuine = 1.0 - own[:, starts[k]:ends[k]][np.triu_indices(b - a, 1)]
+            genuine_hist += _hist(genuine)
+
+            # Each impostor pair is counted once, from the lower-sorted identity
+            impostor_hist += _hist(1.0 - own[:, ends[k]:])
+
+            # Blank the student's own columns, then best impostor similarity per identity
+            own = own.copy()
+            own[:, starts[k]:ends[k]] = -np.inf
+            per_identity = np.maximum.reduceat(own, starts, axis=1).max(axis=0)
+
+            nearest = int(np.argmax(per_identity))
+            nearest_dist = float(1.0 - per_identity[nearest]) if n_ids > 1 else None
+            genuine_p95 = float(np.percentile(genuine, 95)) if len(genuine) else None
+            # Midway between the student's own spread and the nearest impostor,
+            # never closer than THRESHOLD_MARGIN to that impostor
+            suggested = GLOBAL_THRESHOLD
+            if nearest_dist is not None:
+                suggested = nearest_dist - THRESHOLD_MARGIN
+                if genuine_p95 is not None:
+                    suggested = min(suggested, (genuine_p95 + nearest_dist) / 2.0)
+                suggested = float(np.clip(suggested, MIN_THRESHOLD, MAX_THRESHOLD))
+            students.append({
+                "student": names[k],
+                "images": int(b - a),
+                "genuine_p95": round(genuine_p95, 3) if genuine_p95 is not None else None,
+                "nearest_impostor": names[nearest] if nearest_dist is not None else None,
+                "nearest_impostor_distance": round(nearest_dist, 3) if nearest_dist is not None else None,
+                "overlaps": bool(genuine_p95 is not None and nearest_dist is not None and genuine_p95 >= nearest_dist),
+                "suggested_threshold": round(suggested, 3),
+            })
+            # Offered from both sides: A's nearest may be C while B's nearest is A
+            key = tuple(sorted((names[k], names[nearest]))) if nearest_dist is not None else None
+            if key is not None and key not in pair_keys:
+                item = (-nearest_dist,) + key
+                if len(pair_heap) < top:
+                    heapq.heappush(pair_heap, item)
+                    pair_keys.add(key)
+                elif item > pair_heap[0]:
+                    pair_keys.discard(heapq.heapreplace(pair_heap, item)[1:])
+                    pair_keys.add(key)
+        ident = last + 1
+
+    pairs = sorted(((a, b, -d) for d, a, b in pair_heap), key=lambda p: p[2])
+    impostor_below = impostor_hist[:int(GLOBAL_THRESHOLD * HIST_BINS / 2)].sum()
+    genuine_above = genuine_hist[int(GLOBAL_THRESHOLD * HIST_BINS / 2):].sum()
+    return {
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "identities": int(n_ids),
+        "embeddings": int(n_rows),
+        "global_threshold": GLOBAL_THRESHOLD,
+        "genuine": {
+            "pairs": int(genuine_hist.sum()),
+            "p50": _hist_percentile(genuine_hist, 50),
+            "p95": _hist_percentile(genuine_hist, 95),
+            "p99": _hist_percentile(genuine_hist, 99),
+            "rejected_at_global_threshold": int(genuine_above),
+        },
+        "impostor": {
+            "pairs": int(impostor_hist.sum()),
+            "p01": _hist_percentile(impostor_hist, 1),
+            "p05": _hist_percentile(impostor_hist, 5),
+            "p50": _hist_percentile(impostor_hist, 50),
+            "accepted_at_global_threshold": int(impostor_below),
+        },
+        "histogram_bin_width": 2.0 / HIST_BINS,
+        "genuine_histogram": genuine_hist.tolist(),
+        "impostor_histogram": impostor_hist.tolist(),
+        "most_confusable_pairs": [
+            {"a": a, "b": b, "distance": round(d, 3)} for a, b, d in pairs
+        ],
+        "students": sorted(students, key=lambda s: (s["nearest_impostor_distance"] is None, s["nearest_impostor_distance"])),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Gallery confusability analysis")
+    parser.add_argument("--out", default="gallery_report.json")
+    parser.add_argument("--top", type=int, default=25, help="Number of confusable pairs to list")
+    parser.add_argument("--memory-mb", type=int, default=64, help="Working memory per similarity block")
+    args = parser.parse_args()
+
+    gallery = face_gallery.FaceGallery.load()
+    if len(gallery.identities()) < 2:
+        print("[ERROR] Need at least two enrolled students in the gallery")
+        sys.exit(1)
+
+    print(f"[INFO] Analysing {len(gallery.identities())} identities ({len(gallery)} embeddings)...")
+    report = analyse(gallery, memory_mb=args.memory_mb, top=args.top)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    g, i = report["genuine"], report["impostor"]
+    print("=" * 60)
+    print(f"  Genuine  distance p50/p95/p99 : {g['p50']} / {g['p95']} / {g['p99']}")
+    print(f"  Impostor distance p01/p05/p50 : {i['p01']} / {i['p05']} / {i['p50']}")
+    print(f"  At threshold {GLOBAL_THRESHOLD}: {g['rejected_at_global_threshold']} genuine pair(s) rejected, "
+          f"{i['accepted_at_global_threshold']} impostor pair(s) accepted")
+    print("=" * 60)
+    print("  MOST CONFUSABLE PAIRS")
+    for p in report["most_confusable_pairs"][:10]:
+        print(f"  {p['distance']:.3f}  {p['a']}  <->  {p['b']}")
+    overlapping = [s["student"] for s in report["students"] if s["overlaps"]]
+    if overlapping:
+        print(f"[WARNING] {len(overlapping)} student(s) overlap an impostor: {', '.join(overlapping[:10])}")
+    print(f"[OK] Report written to {os.path.abspath(args.out)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+import numpy as np
+
+import face_gallery
+import duplicate_check
+
+# ==========================================
+# GALLERY-SCALE MATCHING BENCHMARK
+# ==========================================
+# Usage:
+#   python gallery_benchmark.py [--sizes 1000,10000,100000] [--quick]
+#                               [--json results.json] [--baseline previous.json]
+#
+# Runs fully offline on synthetic ArcFace-like embeddings (no camera, no
+# models, no dataset). For each gallery size it measures single-query
+# latency, index memory and rank-1 recall of:
+#   brute     — FaceGallery.identity_similarities, exactly what the recognizer runs
+#   prototype — mean embedding per student, exact re-rank of the top RERANK_TOP
+#   ivf       — k-means inverted lists over prototypes (NumPy), probe NPROBE lists,
+#               then the same re-rank
+#   hnsw      — hnswlib over prototypes, only if hnswlib is installed
+#
+# With --baseline, exits with status 1 when latency grows by more than
+# --tolerance or recall drops by more than 0.01, so it can gate changes to
+# the matcher.
+
+BENCHMARK_SCHEMA = 1
+DIM = 512
+IMAGES_PER_STUDENT = 4
+INTRA_NOISE = 0.029         # Per-dimension noise: same-student distance ~0.3 at 512 dims
+LOOKALIKE_FRACTION = 0.05   # Students generated near another student (siblings, twins)
+LOOKALIKE_NOISE = 0.045     # Look-alike centre distance ~0.5 from its parent
+QUERIES = 300
+IMPOSTOR_QUERIES = 100      # Probes of people who are not enrolled
+RERANK_TOP = 10
+NPROBE = 8
+ACCEPT_DISTANCE = 0.40      # DISTANCE_THRESHOLD in recognition_engine.py
+
+def _normalize(x):
+    return face_gallery.normalize(x)
+
+def make_gallery(n_students, rng, dim=DIM, per_student=IMAGES_PER_STUDENT, chunk=20000):
+    """Synthetic (centres, embeddings, labels) with intra-class spread and look-alike pairs"""
+    centres = _normalize(rng.standard_normal((n_students, dim), dtype=np.float32))
+    n_look = int(n_students * LOOKALIKE_FRACTION)
+    if n_look:
+        parents = rng.integers(0, n_students, n_look)
+        targets = rng.choice(n_students, n_look, replace=False)
+        centres[targets] = _normalize(centres[parents] + LOOKALIKE_NOISE * rng.standard_normal((n_look, dim), dtype=np.float32))
+    embeddings = np.empty((n_students * per_student, dim), dtype=np.float32)
+    for start in range(0, n_students, chunk):
+        block = centres[start:start + chunk]
+        rows = np.repeat(block, per_student, axis=0)
+        rows += INTRA_NOISE * rng.standard_normal(rows.shape, dtype=np.float32)
+        embeddings[start * per_student:(start + len(block)) * per_student] = _normalize(rows)
+    labels = np.repeat(np.array([f"S{i:06d}" for i in range(n_students)], dtype=object), per_student)
+    return centres, embeddings, labels
+
+def make_queries(centres, rng, n_genuine=QUERIES, n_impostor=IMPOSTOR_QUERIES):
+    dim = centres.shape[1]
+    idx = rng.integers(0, len(centres), n_genuine)
+    genuine = _normalize(centres[idx] + INTRA_NOISE * rng.standard_normal((n_genuine, dim), dtype=np.float32))
+    impostor = _normalize(rng.standard_normal((n_impostor, dim), dtype=np.float32))
+    return genuine, idx, impostor
+
+class BruteMatcher:
+    name = "brute"
+
+    def __init__(self, gallery):
+        self.gallery = gallery
+        gallery._index()
+
+    def match(self, query):
+        names, sims = self.gallery.identity_similarities(query)
+        best = int(np.argmax(sims[0]))
+        return names[best], float(1.0 - sims[0][best])
+
+    def nbytes(self):
+        matrix, starts, _ = self.gallery._index()
+        return matrix.nbytes + starts.nbytes
+
+class PrototypeMatcher:
+    """Coarse search over per-student mean embeddings, exact re-rank on their images"""
+    name = "prototype"
+
+    def __init__(self, gallery):
+        self.matrix, self.starts, self.names = gallery._index()
+        self.ends = np.r_[self.starts[1:], len(self.matrix)]
+        _, self.protos = duplicate_check.identity_prototypes(gallery)
+
+    def candidates(self, query):
+        sims = self.protos @ query
+        k = min(RERANK_TOP, len(sims))
+        return np.argpartition(-sims, k - 1)[:k]
+
+    def rerank(self, query, ids):
+        best_name, best_dist = None, 2.0
+        for i in ids:
+            dist = float(1.0 - (self.matrix[self.starts[i]:self.ends[i]] @ query).max())
+            if dist < best_dist:
+                best_name, best_dist = self.names[i], dist
+        return best_name, best_dist
+
+    def match(self, query):
+        return self.rerank(query, self.candidates(query))
+
+    def nbytes(self):
+        return self.matrix.nbytes + self.protos.nbytes + self.starts.nbytes
+
+class IVFMatcher(PrototypeMatcher):
+    """Inverted lists over prototypes; only NPROBE nearest lists are scanned"""
+    name = "ivf"
+
+    def __init__(self, gallery, rng, iterations=8):
+        super().__init__(gallery)
+        n = len(self.protos)
+        n_lists = max(1, int(4 * np.sqrt(n)))
+        sample = self.protos[rng.choice(n, min(n, n_lists * 40), replace=False)]
+        self.centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ self.centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[assign == c]
+                if len(members):
+                    self.centroids[c] = members.mean(axis=0)
+            self.centroids = _normalize(self.centroids)
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, 8192):
+            assign[start:start + 8192] = np.argmax(self.protos[start:start + 8192] @ self.centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        self.list_ids = order
+        self.list_starts = np.searchsorted(assign[order], np.arange(n_lists + 1))
+
+    def candidates(self, query):
+        probe = np.argpartition(-(self.centroids @ query), min(NPROBE, len(self.centroids)) - 1)[:NPROBE]
+        ids = np.concatenate([self.list_ids[self.list_starts[c]:self.list_starts[c + 1]] for c in probe])
+        if len(ids) == 0:
+            return ids
+        sims = self.protos[ids] @ query
+        k = min(RERANK_TOP, len(ids))
+        return ids[np.argpartition(-sims, k - 1)[:k]]
+
+    def nbytes(self):
+        return super().nbytes() + self.centroids.nbytes + self.list_ids.nbytes + self.list_starts.nbytes
+
+class HNSWMatcher(PrototypeMatcher):
+    """hnswlib graph over prototypes (optional dependency)"""
+    name = "hnsw"
+
+    def __init__(self, gallery):
+        import hnswlib
+        super().__init__(gallery)
+        self.index = hnswlib.Index(space="ip", dim=self.protos.shape[1])
+        self.index.init_index(max_elements=len(self.protos), ef_construction=200, M=16)
+        self.index.add_items(self.protos, np.arange(len(self.protos)))
+        self.index.set_ef(64)
+
+    def candidates(self, query):
+        ids, _ = self.index.knn_query(query, k=min(RERANK_TOP, len(self.protos)))
+        return ids[0]
+
+    def nbytes(self):
+        # hnswlib does not expose its size; M=16 links of 4 bytes per level-0 node
+        return super().nbytes() + len(self.protos) * (self.protos.shape[1] * 4 + 16 * 2 * 4)
+
+def evaluate(matcher, genuine, truth, impostor, names):
+    latencies, correct, false_accepts = [], 0, 0
+    for q, t in zip(genuine, truth):
+        t0 = time.perf_counter()
+        label, _ = matcher.match(q)
+        latencies.append(time.perf_counter() - t0)
+        correct += int(label == names[t])
+    for q in impostor:
+        t0 = time.perf_counter()
+        _, dist = matcher.match(q)
+        latencies.append(time.perf_counter() - t0)
+        false_accepts += int(dist < ACCEPT_DISTANCE)
+    arr = np.asarray(latencies) * 1000.0
+    return {
+        "matcher": matcher.name,
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "recall_at_1": round(correct / len(genuine), 4),
+        "impostor_accept_rate": round(false_accepts / len(impostor), 4) if len(impostor) else None,
+        "index_mb": round(matcher.nbytes() / (1024 * 1024), 1),
+    }
+
+def run_size(n_students, seed=0):
+    rng = np.random.default_rng(seed)
+    t0 = time.perf_counter()
+    centres, embeddings, labels = make_gallery(n_students, rng)
+    gallery = face_gallery.FaceGallery(embeddings, labels)
+    del embeddings
+    names = np.array([f"S{i:06d}" for i in range(n_students)], dtype=object)
+    genuine, truth, impostor = make_queries(centres, rng)
+    print(f"[INFO] {n_students} students / {len(gallery)} embeddings generated in {time.perf_counter() - t0:.1f}s")
+
+    builders = [("brute", lambda: BruteMatcher(gallery)),
+                ("prototype", lambda: PrototypeMatcher(gallery)),
+                ("ivf", lambda: IVFMatcher(gallery, rng))]
+    try:
+        import hnswlib  # noqa: F401
+        builders.append(("hnsw", lambda: HNSWMatcher(gallery)))
+    except ImportError:
+        pass
+
+    rows = []
+    for name, build in builders:
+        t0 = time.perf_counter()
+        matcher = build()
+        build_s = time.perf_counter() - t0
+        row = evaluate(matcher, genuine, truth, impostor, names)
+        row["build_s"] = round(build_s, 3)
+        row["students"] = n_students
+        rows.append(row)
+        print(f"  {name:<10} p50 {row['p50_ms']:>8.2f}ms  p95 {row['p95_ms']:>8.2f}ms  "
+              f"recall@1 {row['recall_at_1']:.4f}  FAR {row['impostor_accept_rate']}  "
+              f"index {row['index_mb']:.0f}MB  build {row['build_s']:.1f}s")
+    return rows
+
+def compare(results, baseline, tolerance):
+    """Regressions against a baseline report: [message, ...]"""
+    previous = {(r["students"], r["matcher"]): r for r in baseline.get("results", [])}
+    problems = []
+    for r in results:
+        old = previous.get((r["students"], r["matcher"]))
+        if not old:
+            continue
+        if r["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+            problems.append(f"{r['matcher']}@{r['students']}: p50 {old['p50_ms']}ms -> {r['p50_ms']}ms")
+        if r["recall_at_1"] < old["recall_at_1"] - 0.01:
+            problems.append(f"{r['matcher']}@{r['students']}: recall {old['recall_at_1']} -> {r['recall_at_1']}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic gallery-scale matcher benchmark")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--quick", action="store_true", help="Only 1k and 10k students (CI)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_out")
+    parser.add_argument("--baseline", help="Previous --json report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative p50 latency growth")
+    args = parser.parse_args()
+
+    sizes = [1000, 10000] if args.quick else [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = []
+    for n in sizes:
+        results.extend(run_size(n, seed=args.seed))
+
+    report = {
+        "schema": BENCHMARK_SCHEMA,
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "dim": DIM,
+        "images_per_student": IMAGES_PER_STUDENT,
+        "seed": args.seed,
+        "results": results,
+    }
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[OK] Results written to {args.json_out}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        if problems:
+            print("[FAIL] Matcher regressions:")
+            for p in problems:
+                print(f"  ❌ {p}")
+            sys.exit(1)
+        print("[OK] No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
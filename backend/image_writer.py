@@ -0,0 +1,155 @@
+import os
+import time
+import queue
+import threading
+import cv2
+import numpy as np
+
+# ==========================================
+# BACKGROUND FACE IMAGE WRITER
+# ==========================================
+# Resizing with LANCZOS4 and JPEG encoding cost several milliseconds per face,
+# and the write itself can stall on slow disks. Doing that inline in a camera
+# loop makes the preview stutter, so the work is handed to one worker thread
+# through a bounded queue.
+
+class AsyncImageWriter:
+    """Resize, encode and fsync face crops on a worker thread"""
+
+    def __init__(self, target_size=160, jpeg_quality=95, max_queue=32):
+        self.target_size = target_size
+        self.jpeg_quality = jpeg_quality
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._latencies = []
+        self._errors = []
+        self._dirs = set()
+        self._thread = threading.Thread(target=self._run, name="image-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, path, face_crop, captured_at=None):
+        """Queue a crop for writing; blocks only if the queue is full"""
+        captured_at = captured_at if captured_at is not None else time.time()
+        self._queue.put((path, face_crop, captured_at))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            path, face_crop, captured_at = item
+            try:
+                self._write(path, face_crop)
+                self._latencies.append(time.time() - captured_at)
+            except Exception as e:
+                self._errors.append(f"{os.path.basename(path)}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, path, face_crop):
+        face_resized = cv2.resize(face_crop, (self.target_size, self.target_size), interpolation=cv2.INTER_LANCZOS4)
+        ok, buf = cv2.imencode(".jpg", face_resized, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise IOError("JPEG encoding failed")
+        with open(path, "wb") as f:
+            f.write(buf.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self._dirs.add(os.path.dirname(os.path.abspath(path)))
+
+    def close(self):
+        """Drain the queue, stop the worker and fsync the touched directories"""
+        self._queue.put(None)
+        self._thread.join()
+        for d in self._dirs:
+            try:
+                fd = os.open(d, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except (OSError, AttributeError):
+                pass  # Directory fsync is not supported on Windows
+
+    @property
+    def errors(self):
+        return list(self._errors)
+
+    def latency_stats(self):
+        """Capture-to-disk latency summary in milliseconds"""
+        if not self._latencies:
+            return {"count": 0, "avg_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ms = np.asarray(self._latencies) * 1000.0
+        return {
+            "count": int(len(ms)),
+            "avg_ms": round(float(ms.mean()), 1),
+            "p95_ms": round(float(np.percentile(ms, 95)), 1),
+            "max_ms": round(float(ms.max()), 1),
+        }
+
+# ==========================================
+# BACKGROUND FACE EMBEDDER
+# ==========================================
+# An ArcFace forward pass takes ~100 ms on CPU, far longer than a preview
+# frame. The capture loop hands one crop at a time to a worker thread and
+# picks the embedding up on a later frame, so the preview keeps its frame
+# rate while the model runs.
+
+class AsyncEmbedder:
+    """Embed one face crop at a time on a worker thread"""
+
+    def __init__(self, embed_fn):
+        self.embed_fn = embed_fn
+        self._jobs = queue.Queue(maxsize=1)
+        self._results = queue.Queue()
+        self._busy = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="face-embedder", daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self):
+        """True while a crop is queued or being embedded"""
+        return self._busy.is_set()
+
+    def submit(self, face_crop, tag=None):
+        """Queue a crop unless one is already in flight; returns whether it was accepted"""
+        if self._busy.is_set():
+            return False
+        self._busy.set()
+        self._jobs.put((face_crop, tag))
+        return True
+
+    def _run(self):
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                break
+            face_crop, tag = item
+            try:
+                embedding = self.embed_fn(face_crop)
+            except Exception:
+                embedding = None
+            self._results.put((face_crop, embedding, tag))
+            self._busy.clear()
+
+    def results(self):
+        """Every (face_crop, embedding or None, tag) finished since the last call"""
+        done = []
+        while True:
+            try:
+                done.append(self._results.get_nowait())
+            except queue.Empty:
+                return done
+
+    def wait(self, timeout=None):
+        """Block until the crop in flight (if any) is embedded"""
+        deadline = None if timeout is None else time.time() + timeout
+        while self._busy.is_set():
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self):
+        self._jobs.put(None)
+        self._thread.join()
@@ -0,0 +1,161 @@
+import os
+import json
+import cv2
+import numpy as np
+
+import face_gallery
+
+# ==========================================
+# LBPH CANDIDATE SHORTLIST
+# ==========================================
+# Cheap first stage for the hybrid recognizer: ArcFace only has to confirm
+# the top few students an LBPH ranking proposes. Each student is one
+# prototype: the mean of the LBP spatial histograms of their TrainingImage
+# crops. A query costs one histogram of the crop plus one vectorised
+# chi-square against the students x HIST_DIM prototype matrix: HIST_DIM
+# (16384) values per student, independent of how many images each student
+# enrolled. predict_collect() of cv2's LBPHFaceRecognizer compared against
+# every training image instead. The prototypes are rebuilt automatically
+# whenever the face images change.
+
+DATASET_DIR = face_gallery.DATASET_DIR
+LBPH_MODEL_FILE = os.path.join(DATASET_DIR, "lbph_prototypes.npz")
+LBPH_META_FILE = os.path.join(DATASET_DIR, "lbph_shortlist.json")
+FACE_SIZE = 100                # Crops are already aligned faces; 100x100 is enough for texture
+SHORTLIST_SIZE = 5
+
+# radius 1 / 8 neighbours keeps each histogram at 256 bins per cell, on an
+# 8x8 grid like OpenCV's LBPH defaults. Chi-square distances are on the
+# same scale as LBPHFaceRecognizer's (0 to 4 per cell), which is what
+# recognition_engine.LBPH_DISTANCE_SCALE assumes.
+GRID = 8
+HIST_DIM = GRID * GRID * 256
+CHUNK_STUDENTS = 256           # Bounds the temporary matrix of one chi-square pass
+
+_NEIGHBOURS = ((-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1))
+
+def preprocess(face_img):
+    """Grayscale, resize and equalise a face crop for LBPH"""
+    if face_img.ndim == 3:
+        face_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
+    face_img = cv2.resize(face_img, (FACE_SIZE, FACE_SIZE), interpolation=cv2.INTER_AREA)
+    return cv2.equalizeHist(face_img)
+
+_cells = None
+
+def _cell_index(shape):
+    """Grid cell of every pixel of an LBP code image, and the pixel count per cell"""
+    global _cells
+    if _cells is None or _cells[0] != shape:
+        h, w = shape
+        rows = np.minimum(np.arange(h) * GRID // h, GRID - 1)
+        cols = np.minimum(np.arange(w) * GRID // w, GRID - 1)
+        index = (rows[:, None] * GRID + cols[None, :]).ravel()
+        _cells = (shape, index, np.bincount(index, minlength=GRID * GRID).astype(np.float32))
+    return _cells[1], _cells[2]
+
+def lbp_histogram(gray):
+    """Spatial LBP histogram (GRID x GRID cells of 256 bins, each cell normalised to sum 1)"""
+    g = gray.astype(np.int16)
+    center = g[1:-1, 1:-1]
+    h, w = center.shape
+    codes = np.zeros(center.shape, dtype=np.int32)
+    for bit, (dy, dx) in enumerate(_NEIGHBOURS):
+        codes |= (g[1 + dy:1 + dy + h, 1 + dx:1 + dx + w] >= center).astype(np.int32) << bit
+    index, counts = _cell_index(codes.shape)
+    hist = np.bincount(index * 256 + codes.ravel(), minlength=HIST_DIM).astype(np.float32)
+    hist = hist.reshape(GRID * GRID, 256) / counts[:, None]
+    return hist.ravel()
+
+def chi_square(prototypes, hist):
+    """Chi-square distance (OpenCV's CHISQR_ALT) of hist to every row of prototypes"""
+    out = np.empty(len(prototypes), dtype=np.float32)
+    for i in range(0, len(prototypes), CHUNK_STUDENTS):
+        block = prototypes[i:i + CHUNK_STUDENTS]
+        diff = block - hist
+        total = block + hist
+        np.divide(diff * diff, total, out=diff, where=total > 0)    # Both 0 where total is 0
+        out[i:i + CHUNK_STUDENTS] = 2.0 * diff.sum(axis=1)
+    return out
+
+def dataset_signature(dataset_dir=DATASET_DIR):
+    """[folder, image count, newest mtime] per student folder — changes when images do"""
+    signature = []
+    if not os.path.isdir(dataset_dir):
+        return signature
+    for folder in sorted(os.listdir(dataset_dir)):
+        folder_path = os.path.join(dataset_dir, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        images = [f for f in os.listdir(folder_path) if f.lower().endswith(face_gallery.IMAGE_EXTENSIONS)]
+        newest = max((os.path.getmtime(os.path.join(folder_path, f)) for f in images), default=0)
+        signature.append([folder, len(images), round(newest, 3)])
+    return signature
+
+class LBPHShortlist:
+    """One mean LBP histogram per TrainingImage folder"""
+
+    def __init__(self, prototypes=None, folders=None):
+        self.prototypes = prototypes if prototypes is not None else np.empty((0, HIST_DIM), dtype=np.float32)
+        self.folders = list(folders or [])
+
+    def __len__(self):
+        return len(self.folders)
+
+    @classmethod
+    def build(cls, dataset_dir=DATASET_DIR, exclude_paths=None):
+        """Average the histograms of every face image of each student (except exclude_paths)"""
+        exclude_paths = exclude_paths or set()
+        prototypes, folders = [], []
+        for folder, count, _ in dataset_signature(dataset_dir):
+            if count == 0:
+                continue
+            folder_path = os.path.join(dataset_dir, folder)
+            total, added = np.zeros(HIST_DIM, dtype=np.float64), 0
+            for img_name in sorted(os.listdir(folder_path)):
+                img_path = os.path.join(folder_path, img_name)
+                if not img_name.lower().endswith(face_gallery.IMAGE_EXTENSIONS) or os.path.normpath(img_path) in exclude_paths:
+                    continue
+                img = cv2.imread(img_path)
+                if img is None:
+                    continue
+                total += lbp_histogram(preprocess(img))
+                added += 1
+            if added:
+                prototypes.append((total / added).astype(np.float32))
+                folders.append(folder)
+        if not prototypes:
+            return cls()
+        return cls(np.vstack(prototypes), folders)
+
+    @classmethod
+    def load_or_build(cls, dataset_dir=DATASET_DIR, model_file=LBPH_MODEL_FILE, meta_file=LBPH_META_FILE):
+        """Reuse the saved prototypes if the dataset is unchanged, otherwise rebuild and save"""
+        signature = dataset_signature(dataset_dir)
+        if os.path.exists(model_file) and os.path.exists(meta_file):
+            try:
+                with open(meta_file, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                if meta.get("signature") == signature:
+                    with np.load(model_file) as data:
+                        return cls(data["prototypes"], meta["folders"])
+            except Exception as e:
+                print(f"  ⚠️  Could not reuse LBPH shortlist prototypes: {e}")
+
+        shortlist = cls.build(dataset_dir)
+        if len(shortlist):
+            with open(model_file, "wb") as f:
+                np.savez(f, prototypes=shortlist.prototypes)
+            with open(meta_file, "w", encoding="utf-8") as f:
+                json.dump({"signature": signature, "folders": shortlist.folders}, f)
+        return shortlist
+
+    def rank(self, face_img, k=SHORTLIST_SIZE):
+        """Top-k folders for a face crop as [(folder, lbph_distance), ...], nearest first"""
+        if not len(self):
+            return []
+        dists = chi_square(self.prototypes, lbp_histogram(preprocess(face_img)))
+        k = min(k, len(dists))
+        top = np.argpartition(dists, k - 1)[:k]
+        top = top[np.argsort(dists[top])]
+        return [(self.folders[i], float(dists[i])) for i in top]
@@ -0,0 +1,213 @@
+import os
+import json
+import threading
+
+import event_log
+
+# ==========================================
+# EVENT LOG READER & INDEX
+# ==========================================
+# tail(n)        — last n records, read backwards from the end of the file
+#                  in TAIL_BLOCK chunks (continues into rotated files)
+# query_logs()   — records in a timestamp range and/or of given types,
+#                  newest blocks first, stopping once `limit` records match
+#
+# The index is a sidecar <log>.idx (JSON) describing the file in blocks of
+# about INDEX_BLOCK_BYTES: byte range, first/last timestamp and a count per
+# type. It is extended incrementally from the last indexed byte whenever a
+# query runs, so writers never have to know about it, and is moved together
+# with the log on rotation. Timestamps are "YYYY-MM-DD HH:MM:SS" strings and
+# compare correctly as text.
+
+TAIL_BLOCK = 8192
+INDEX_BLOCK_BYTES = 64 * 1024
+
+def _parse(lines):
+    records = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return records
+
+def _tail_lines(path, n):
+    """Last n complete lines of a file without reading the whole file"""
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return []
+    with f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    if pos > 0:
+        lines = lines[1:]   # First line may be cut in half
+    return lines[-n:] if n else []
+
+def tail(n=100, path=event_log.LOG_FILE):
+    """Last n records in file order, reaching into rotated files if needed"""
+    lines = []
+    for file_path in event_log.log_files(path):
+        if len(lines) >= n:
+            break
+        lines = _tail_lines(file_path, n - len(lines)) + lines
+    return _parse(lines)
+
+class LogIndex:
+    """Block index of one log file, persisted next to it"""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + event_log.INDEX_SUFFIX
+        self.blocks = []
+        self.end = 0
+        self.ino = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.blocks, self.end, self.ino = data["blocks"], data["end"], data.get("ino")
+        except (OSError, ValueError, KeyError):
+            self.blocks, self.end, self.ino = [], 0, None
+
+    def _save(self):
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"end": self.end, "ino": self.ino, "blocks": self.blocks}, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass
+
+    def refresh(self):
+        """Index bytes appended since the last refresh (rebuild if the file was replaced)"""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                self.blocks, self.end, self.ino = [], 0, None
+                return
+            if st.st_ino != self.ino or st.st_size < self.end:
+                # Rotated or truncated underneath us (or the sidecar belongs to the old file)
+                self._load()
+                if st.st_ino != self.ino or st.st_size < self.end:
+                    self.blocks, self.end, self.ino = [], 0, st.st_ino
+            if st.st_size == self.end:
+                return
+            # Re-open a short trailing block so blocks stay near INDEX_BLOCK_BYTES
+            start = self.end
+            if self.blocks and self.blocks[-1]["end"] - self.blocks[-1]["offset"] < INDEX_BLOCK_BYTES:
+                start = self.blocks.pop()["offset"]
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                data = f.read(st.st_size - start)
+            usable = data.rfind(b"\n") + 1    # Leave a half-written last line for next time
+            if usable == 0:
+                return
+
+            block, offset = None, start
+            for raw in data[:usable].splitlines(keepends=True):
+                if block is None:
+                    block = {"offset": offset, "end": offset, "first": None, "last": None, "types": {}}
+                offset += len(raw)
+                block["end"] = offset
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    record = None
+                if isinstance(record, dict):
+                    ts = record.get("timestamp", "")
+                    if block["first"] is None or ts < block["first"]:
+                        block["first"] = ts
+                    if block["last"] is None or ts > block["last"]:
+                        block["last"] = ts
+                    log_type = record.get("type", "info")
+                    block["types"][log_type] = block["types"].get(log_type, 0) + 1
+                if block["end"] - block["offset"] >= INDEX_BLOCK_BYTES:
+                    self.blocks.append(block)
+                    block = None
+            if block is not None:
+                self.blocks.append(block)
+            self.end = start + usable
+            self.ino = st.st_ino
+            self._save()
+
+    def matching_blocks(self, since=None, until=None, types=None):
+        """Blocks that may hold matching records, newest first"""
+        for block in reversed(self.blocks):
+            if block["first"] is None:
+                continue
+            if since and block["last"] < since:
+                continue
+            if until and block["first"] > until:
+                continue
+            if types and not any(t in block["types"] for t in types):
+                continue
+            yield block
+
+    def read_block(self, block):
+        with open(self.path, "rb") as f:
+            f.seek(block["offset"])
+            data = f.read(block["end"] - block["offset"])
+        return _parse(data.decode("utf-8", errors="replace").splitlines())
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_index(path):
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = LogIndex(path)
+        return _indexes[path]
+
+def query_logs(since=None, until=None, types=None, limit=100, path=event_log.LOG_FILE):
+    """
+    Records with since <= timestamp <= until and type in types (None = any),
+    the newest `limit` of them, returned oldest first.
+    """
+    types = set(types) if types else None
+    found = []
+    for file_path in event_log.log_files(path):
+        if not os.path.exists(file_path):
+            continue
+        index = get_index(file_path)
+        index.refresh()
+        for block in index.matching_blocks(since, until, types):
+            for record in reversed(index.read_block(block)):
+                ts = record.get("timestamp", "")
+                if since and ts < since:
+                    continue
+                if until and ts > until:
+                    continue
+                if types and record.get("type", "info") not in types:
+                    continue
+                found.append(record)
+                if len(found) >= limit:
+                    return list(reversed(found))
+    return list(reversed(found))
+
+def type_counts(since=None, until=None, path=event_log.LOG_FILE):
+    """Records per type from the index alone (whole blocks that overlap the range)"""
+    counts = {}
+    for file_path in event_log.log_files(path):
+        if not os.path.exists(file_path):
+            continue
+        index = get_index(file_path)
+        index.refresh()
+        for block in index.matching_blocks(since, until):
+            for log_type, n in block["types"].items():
+                counts[log_type] = counts.get(log_type, 0) + n
+    return counts
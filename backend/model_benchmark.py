@@ -0,0 +1,356 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+import numpy as np
+
+import face_gallery
+
+# ==========================================
+# EMBEDDING MODEL MATRIX BENCHMARK
+# ==========================================
+# Usage:
+#   python model_benchmark.py [--models ArcFace,Facenet512,SFace,GhostFaceNet,opencv-sface]
+#                             [--onnx name=path.onnx ...] [--per-student 6] [--max-students 60]
+#                             [--batch 16] [--json model_report.json]
+#
+# Embeds the same sample of TrainingImage/<Name_Roll>/*.jpg crops with every
+# candidate model and reports, per model:
+#   - single-face CPU latency (p50 / p95, after warm-up) and model load time
+#   - batch throughput (faces/s); DeepFace has no batch API, so its models are
+#     fed one face at a time, ONNX models with a dynamic batch axis are batched
+#   - memory: RSS added by loading the model and peak RSS while embedding
+#   - verification accuracy on all same-student / different-student pairs:
+#     EER (and its threshold), TAR at FAR 1e-2 / 1e-3, leave-one-out rank-1
+#
+# Model specs:
+#   ArcFace, Facenet512, SFace, GhostFaceNet, ... — DeepFace models (detector "skip")
+#   opencv-sface      — OpenCV FaceRecognizerSF with face_recognition_sface_2021dec.onnx
+#   --onnx name=path  — any ArcFace-style ONNX export run with onnxruntime
+#                       (112x112 RGB, (x - 127.5) / 127.5, NCHW)
+#
+# Every model runs in its own subprocess so memory numbers are not polluted
+# by the models loaded before it. The ranked table marks the models on the
+# speed/accuracy Pareto front (no other model is both faster and more accurate).
+# To switch the recognizer, set FACE_EMBEDDING_MODEL and re-tune the
+# threshold with threshold_sweep.py.
+
+BENCHMARK_SCHEMA = 1
+DEFAULT_MODELS = ("ArcFace", "Facenet512", "SFace", "GhostFaceNet", "opencv-sface")
+# https://github.com/opencv/opencv_zoo/tree/main/models/face_recognition_sface
+SFACE_MODEL_FILE = "face_recognition_sface_2021dec.onnx"
+WARMUP = 3
+MAX_IMPOSTOR_PAIRS = 200000
+
+def _rss():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return 0
+
+# ==========================================
+# EMBEDDERS
+# ==========================================
+
+class DeepFaceEmbedder:
+    """A DeepFace recognition model on pre-cropped faces"""
+    batched = False
+
+    def __init__(self, model_name):
+        self.name = model_name
+        DeepFace = face_gallery._get_deepface()
+        try:
+            DeepFace.build_model(model_name=model_name, task="facial_recognition")
+        except TypeError:
+            # deepface < 0.0.90 has no task argument
+            DeepFace.build_model(model_name)
+
+    def embed(self, faces):
+        return np.vstack([face_gallery.embed_face(face, model_name=self.name) for face in faces])
+
+class OpenCVSFaceEmbedder:
+    """OpenCV's own SFace runtime (no TensorFlow)"""
+    batched = False
+
+    def __init__(self, model_path=SFACE_MODEL_FILE):
+        import cv2
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"SFace model not found: {model_path} (download it from opencv_zoo)")
+        self.name = "opencv-sface"
+        self._cv2 = cv2
+        self.model = cv2.FaceRecognizerSF.create(model_path, "")
+
+    def embed(self, faces):
+        rows = [self.model.feature(self._cv2.resize(face, (112, 112))).reshape(-1) for face in faces]
+        return face_gallery.normalize(np.vstack(rows))
+
+class OnnxEmbedder:
+    """ArcFace-style ONNX model through onnxruntime (CPU provider)"""
+
+    def __init__(self, name, model_path, size=112):
+        import cv2
+        import onnxruntime
+        self.name = name
+        self._cv2 = cv2
+        self.size = size
+        self.session = onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # A symbolic or missing first dimension means the export accepts any batch size
+        self.batched = not isinstance(model_input.shape[0], int)
+
+    def _blob(self, faces):
+        rgb = [self._cv2.cvtColor(self._cv2.resize(f, (self.size, self.size)), self._cv2.COLOR_BGR2RGB) for f in faces]
+        blob = (np.asarray(rgb, dtype=np.float32) - 127.5) / 127.5
+        return blob.transpose(0, 3, 1, 2)
+
+    def embed(self, faces):
+        if self.batched:
+            out = self.session.run(None, {self.input_name: self._blob(faces)})[0]
+        else:
+            out = np.vstack([self.session.run(None, {self.input_name: self._blob([f])})[0] for f in faces])
+        return face_gallery.normalize(out.reshape(len(faces), -1))
+
+def create_embedder(spec):
+    """'name=path.onnx' -> OnnxEmbedder, 'opencv-sface' -> OpenCVSFaceEmbedder, else DeepFace"""
+    if "=" in spec:
+        name, path = spec.split("=", 1)
+        return OnnxEmbedder(name, path)
+    if spec == "opencv-sface":
+        return OpenCVSFaceEmbedder()
+    return DeepFaceEmbedder(spec)
+
+# ==========================================
+# SAMPLING AND ACCURACY
+# ==========================================
+
+def sample_images(dataset_dir, per_student, max_students, seed):
+    """[(folder, path), ...] with up to per_student images from up to max_students folders"""
+    rng = np.random.default_rng(seed)
+    folders = sorted(f for f in os.listdir(dataset_dir) if os.path.isdir(os.path.join(dataset_dir, f)))
+    if max_students and len(folders) > max_students:
+        folders = sorted(rng.choice(folders, max_students, replace=False).tolist())
+    samples = []
+    for folder in folders:
+        images = sorted(f for f in os.listdir(os.path.join(dataset_dir, folder))
+                        if f.lower().endswith(face_gallery.IMAGE_EXTENSIONS))
+        if len(images) < 2:
+            continue
+        picked = sorted(rng.choice(images, min(per_student, len(images)), replace=False).tolist())
+        samples.extend((folder, os.path.join(dataset_dir, folder, f)) for f in picked)
+    return samples
+
+def verification_metrics(embeddings, labels, seed=0):
+    """EER, TAR@FAR and leave-one-out rank-1 from every genuine / (sampled) impostor pair"""
+    labels = np.asarray(labels, dtype=object)
+    dists = 1.0 - embeddings @ embeddings.T
+    same = labels[:, None] == labels[None, :]
+    upper = np.triu(np.ones_like(same, dtype=bool), k=1)
+    genuine = dists[same & upper]
+    impostor = dists[~same & upper]
+    if len(impostor) > MAX_IMPOSTOR_PAIRS:
+        impostor = np.random.default_rng(seed).choice(impostor, MAX_IMPOSTOR_PAIRS, replace=False)
+
+    thresholds = np.unique(np.concatenate([genuine, impostor]))
+    genuine, impostor = np.sort(genuine), np.sort(impostor)
+    tar = np.searchsorted(genuine, thresholds, side="right") / len(genuine)
+    far = np.searchsorted(impostor, thresholds, side="right") / len(impostor)
+    eer_idx = int(np.argmin(np.abs((1.0 - tar) - far)))
+
+    def tar_at(target):
+        ok = np.flatnonzero(far <= target)
+        return round(float(tar[ok[-1]]), 4) if len(ok) else 0.0
+
+    np.fill_diagonal(dists, np.inf)
+    nearest = labels[np.argmin(dists, axis=1)]
+    return {
+        "genuine_pairs": int(len(genuine)),
+        "impostor_pairs": int(len(impostor)),
+        "eer": round(float(((1.0 - tar[eer_idx]) + far[eer_idx]) / 2), 4),
+        "eer_threshold": round(float(thresholds[eer_idx]), 4),
+        "tar_at_far_1e-2": tar_at(1e-2),
+        "tar_at_far_1e-3": tar_at(1e-3),
+        "rank1": round(float(np.mean(nearest == labels)), 4),
+    }
+
+def _percentile_ms(values, q):
+    return round(float(np.percentile(np.asarray(values) * 1000.0, q)), 2)
+
+# ==========================================
+# WORKER (one model per process)
+# ==========================================
+
+def run_model(spec, samples, batch_size):
+    import cv2
+
+    faces, labels = [], []
+    for folder, path in samples:
+        img = cv2.imread(path)
+        if img is not None:
+            faces.append(img)
+            labels.append(folder)
+
+    rss_base = _rss()
+    t0 = time.perf_counter()
+    embedder = create_embedder(spec)
+    embedder.embed(faces[:WARMUP])
+    load_s = time.perf_counter() - t0
+    rss_loaded = _rss()
+    rss_peak = rss_loaded
+
+    latencies, rows = [], []
+    for face in faces:
+        t0 = time.perf_counter()
+        rows.append(embedder.embed([face])[0])
+        latencies.append(time.perf_counter() - t0)
+        rss_peak = max(rss_peak, _rss())
+    embeddings = face_gallery.normalize(np.vstack(rows))
+
+    t0 = time.perf_counter()
+    for start in range(0, len(faces), batch_size):
+        embedder.embed(faces[start:start + batch_size])
+    batch_s = time.perf_counter() - t0
+    rss_peak = max(rss_peak, _rss())
+
+    result = {
+        "model": embedder.name,
+        "spec": spec,
+        "dim": int(embeddings.shape[1]),
+        "faces": len(faces),
+        "load_s": round(load_s, 2),
+        "latency_p50_ms": _percentile_ms(latencies, 50),
+        "latency_p95_ms": _percentile_ms(latencies, 95),
+        "batched": bool(embedder.batched),
+        "batch_size": batch_size,
+        "throughput_fps": round(len(faces) / batch_s, 1) if batch_s > 0 else None,
+        "model_rss_mb": round((rss_loaded - rss_base) / (1024 * 1024), 1) if rss_base else None,
+        "peak_rss_mb": round(rss_peak / (1024 * 1024), 1) if rss_peak else None,
+    }
+    result.update(verification_metrics(embeddings, labels))
+    return result
+
+def _worker(args):
+    with open(args.samples, "r", encoding="utf-8") as f:
+        samples = json.load(f)
+    try:
+        result = run_model(args.worker, samples, args.batch)
+    except Exception as e:
+        result = {"model": args.worker, "spec": args.worker, "error": f"{type(e).__name__}: {e}"}
+    with open(args.result, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+def run_isolated(spec, samples_path, batch_size, timeout):
+    """Run one model in a fresh interpreter and return its result dict"""
+    fd, result_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", spec,
+               "--samples", samples_path, "--result", result_path, "--batch", str(batch_size)]
+        proc = subprocess.run(cmd, timeout=timeout)
+        if proc.returncode != 0 or os.path.getsize(result_path) == 0:
+            return {"model": spec, "spec": spec, "error": f"worker exited with status {proc.returncode}"}
+        with open(result_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except subprocess.TimeoutExpired:
+        return {"model": spec, "spec": spec, "error": f"timed out after {timeout}s"}
+    finally:
+        os.remove(result_path)
+
+def rank(results):
+    """Sort by EER then latency and flag the speed/accuracy Pareto front"""
+    ok = [r for r in results if "error" not in r]
+    for r in ok:
+        r["pareto"] = not any(
+            o is not r and o["eer"] <= r["eer"] and o["latency_p50_ms"] <= r["latency_p50_ms"]
+            and (o["eer"] < r["eer"] or o["latency_p50_ms"] < r["latency_p50_ms"])
+            for o in ok
+        )
+    ok.sort(key=lambda r: (r["eer"], r["latency_p50_ms"]))
+    return ok + [r for r in results if "error" in r]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare face embedding models on the local gallery")
+    parser.add_argument("--models", default=",".join(DEFAULT_MODELS))
+    parser.add_argument("--onnx", action="append", default=[], metavar="NAME=PATH",
+                        help="Extra ONNX embedding model (repeatable)")
+    parser.add_argument("--dataset", default=face_gallery.DATASET_DIR)
+    parser.add_argument("--per-student", type=int, default=6)
+    parser.add_argument("--max-students", type=int, default=60)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=int, default=1800, help="Seconds allowed per model")
+    parser.add_argument("--json", dest="json_out", default="model_report.json")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--samples", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(args)
+        return
+
+    if not os.path.isdir(args.dataset):
+        print(f"[ERROR] Dataset folder not found: {args.dataset}")
+        sys.exit(1)
+    samples = sample_images(args.dataset, args.per_student, args.max_students, args.seed)
+    students = len({folder for folder, _ in samples})
+    if students < 2:
+        print("[ERROR] Need at least two students with two or more images")
+        sys.exit(1)
+    print(f"[INFO] {len(samples)} images from {students} students")
+
+    fd, samples_path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(samples, f)
+
+    specs = [m.strip() for m in args.models.split(",") if m.strip()] + args.onnx
+    results = []
+    try:
+        for spec in specs:
+            print(f"[INFO] Benchmarking {spec}...")
+            result = run_isolated(spec, samples_path, args.batch, args.timeout)
+            if "error" in result:
+                print(f"  ⚠️  {spec} skipped: {result['error']}")
+            results.append(result)
+    finally:
+        os.remove(samples_path)
+
+    results = rank(results)
+    print("=" * 104)
+    print(f"  {'#':<3}{'MODEL':<16}{'DIM':>5}{'p50 ms':>8}{'p95 ms':>8}{'FACES/s':>9}{'LOAD s':>8}"
+          f"{'MODEL MB':>10}{'EER':>8}{'THR':>7}{'TAR@1e-3':>10}{'RANK-1':>8}")
+    for i, r in enumerate(results, 1):
+        if "error" in r:
+            print(f"  {'-':<3}{r['model']:<16}  {r['error']}")
+            continue
+        flag = "*" if r["pareto"] else " "
+        print(f"  {i:<3}{flag}{r['model']:<15}{r['dim']:>5}{r['latency_p50_ms']:>8.1f}{r['latency_p95_ms']:>8.1f}"
+              f"{r['throughput_fps'] or 0:>9.1f}{r['load_s']:>8.1f}"
+              f"{r['model_rss_mb'] if r['model_rss_mb'] is not None else '-':>10}"
+              f"{r['eer']:>8.3f}{r['eer_threshold']:>7.2f}{r['tar_at_far_1e-3']:>10.3f}{r['rank1']:>8.3f}")
+    print("=" * 104)
+    print("  * = on the speed/accuracy Pareto front; THR = cosine distance at the EER")
+
+    report = {
+        "schema": BENCHMARK_SCHEMA,
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "dataset": args.dataset,
+        "images": len(samples),
+        "students": students,
+        "current_model": face_gallery.MODEL_NAME,
+        "host": {"platform": platform.platform(), "python": platform.python_version(),
+                 "cpus": os.cpu_count()},
+        "results": results,
+    }
+    with open(args.json_out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[OK] Results written to {os.path.abspath(args.json_out)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+import os
+import re
+import time
+import numpy as np
+from collections import defaultdict, namedtuple
+
+import face_gallery
+import face_detectors
+
+# ==========================================
+# RECOGNITION ENGINES
+# ==========================================
+# One interface for every way this project recognises faces:
+#   detect(frame)            -> [face_detectors.Detection(box, landmarks, score), ...]
+#   identify(face_crop, box) -> Match(folder, distance, runner_up) or None
+#
+#   arcface — YOLOv8-face + ArcFace embedding gallery (recognize_attendance.py default)
+#   lbph    — Haar cascade + LBPH, the approach of the legacy root scripts
+#   hybrid  — YOLOv8-face + LBPH shortlist, ArcFace confirms the shortlist
+#
+# The detectors above are defaults; ATTENDANCE_DETECTOR (yolo / yunet / haar)
+# overrides them for any engine.
+#
+# Distances are on the ArcFace cosine scale for every engine (LBPH distances
+# are rescaled), so the same threshold and ConfirmationTracker apply to all.
+# The engine is chosen with ATTENDANCE_ENGINE (default: arcface).
+
+DATASET_DIR = face_gallery.DATASET_DIR
+ENGINES = ("arcface", "lbph", "hybrid")
+DEFAULT_ENGINE = "arcface"
+
+# ==========================================
+# RECOGNITION TUNING PARAMETERS
+# ==========================================
+DISTANCE_THRESHOLD = 0.40       # ArcFace cosine distance (STRICT: 0.40 prevents false matches)
+                                 # Lower = stricter. 0.55 was too loose (wrong names given)
+                                 # 0.40 = face must be 60% similar to stored image
+MIN_FACE_SIZE = 80              # Minimum face width/height in pixels (larger = clearer face needed)
+MIN_CONFIRMATIONS = 5           # Frames needed to confirm a borderline match — prevents single-frame false match
+RECOGNITION_BUFFER_SIZE = 10    # Max buffer entries per student
+EVIDENCE_WINDOW = 3.0           # Seconds of evidence kept per student
+
+# Adaptive confirmation: every frame adds evidence in [0, 1+] and a student is
+# confirmed once the evidence in the window reaches 1.0. A borderline match
+# adds 1/MIN_CONFIRMATIONS (the old fixed 5 frames); a close match with a
+# clear runner-up adds more, so e.g. distance 0.15 vs runner-up 0.60 needs
+# 2 frames. A match whose runner-up is within MIN_MARGIN adds nothing.
+MIN_MARGIN = 0.05               # Best-vs-second identity distance gap below which a frame is ambiguous
+FULL_MARGIN = 0.25              # Gap at which the margin no longer limits the evidence
+EVIDENCE_GAIN = 1.25            # Evidence of a perfect (distance 0, full margin) frame
+
+# Attendance prior: a prior match closer than this is accepted once no
+# student outside the prior comes closer; the rest of the gallery is still
+# searched, so the runner-up (and the margin check) stays real
+PRIOR_ACCEPT_DISTANCE = 0.30
+
+# Hybrid engine
+SHORTLIST_SIZE = 5
+ARCFACE_RECHECK_INTERVAL = 1.0  # Seconds a verified face track reuses its ArcFace verdict
+TRACK_IOU = 0.5
+
+# LBPH engine: the legacy scripts accept LBPH confidence < 60, which maps onto
+# DISTANCE_THRESHOLD (60 / 150 = 0.40)
+LBPH_DISTANCE_SCALE = 150.0
+
+Match = namedtuple("Match", "folder distance runner_up")
+
+def folder_name_to_display_name(folder_name):
+    """Convert folder name like 'Sagar Kumar_21104131014' to display name 'Sagar Kumar'"""
+    display = re.sub(r'_\d+$', '', folder_name).strip()
+    return display if display else folder_name
+
+def box_iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def crop_face(frame, box, landmarks=None):
+    """Aligned, padded crop of a detection — the same framing the gallery was enrolled with"""
+    return face_gallery.crop_aligned_face(frame, box, landmarks)
+
+# ==========================================
+# ENGINES
+# ==========================================
+class RecognitionEngine:
+    """Base class: a detector plus an identify() step returning a Match"""
+    name = "base"
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.stats = defaultdict(int)
+        self.timers = None      # Optional stage_timer.StageTimers for embed/match/lbph sub-stages
+
+    def _lap(self, stage, start):
+        if self.timers is None:
+            return time.perf_counter()
+        return self.timers.lap(stage, start)
+
+    def detect(self, frame):
+        return self.detector.detect(frame)
+
+    def identify(self, face_crop, box):
+        raise NotImplementedError
+
+    def describe(self):
+        return f"{self.name}+{getattr(self.detector, 'name', 'custom')}"
+
+def best_two(target, embedding):
+    """Best and runner-up identity within one gallery as a Match (None if empty)"""
+    names, sims = target.identity_similarities(embedding)
+    if len(names) == 0:
+        return None
+    dists = 1.0 - sims[0]
+    if len(names) == 1:
+        return Match(names[0], float(dists[0]), 2.0)
+    top2 = np.argpartition(dists, 1)[:2]
+    best, second = sorted(top2, key=lambda i: dists[i])
+    return Match(names[best], float(dists[best]), float(dists[second]))
+
+class ArcFaceEngine(RecognitionEngine):
+    """ArcFace embedding of every face, matched against the gallery"""
+    name = "arcface"
+
+    def __init__(self, detector, gallery, prior_gallery=None):
+        super().__init__(detector)
+        self.gallery = gallery
+        self.prior_gallery = prior_gallery if prior_gallery is not None else face_gallery.FaceGallery()
+        # Students not in the prior, searched for the runner-up of a prior hit
+        prior_labels = set(self.prior_gallery.identities())
+        self.rest_gallery = gallery.subset([l for l in gallery.identities() if l not in prior_labels]) \
+            if prior_labels else gallery
+
+    def identify(self, face_crop, box):
+        """Checks the attendance prior first, then the students outside it for the runner-up"""
+        t = time.perf_counter()
+        embedding = face_gallery.embed_face(face_crop)
+        self.stats["arcface_runs"] += 1
+        t = self._lap("embed", t)
+        match = self._search(embedding)
+        self._lap("match", t)
+        return match
+
+    def _search(self, embedding):
+        if len(self.prior_gallery):
+            match = best_two(self.prior_gallery, embedding)
+            if match is not None and match.distance < PRIOR_ACCEPT_DISTANCE:
+                # A look-alike outside the prior must still be able to veto the match
+                rest = best_two(self.rest_gallery, embedding)
+                if rest is None or rest.distance >= match.distance:
+                    self.stats["prior_hits"] += 1
+                    runner_up = match.runner_up if rest is None else min(match.runner_up, rest.distance)
+                    return match._replace(runner_up=runner_up)
+        self.stats["full_searches"] += 1
+        return best_two(self.gallery, embedding)
+
+class LBPHEngine(RecognitionEngine):
+    """LBPH nearest student; distances rescaled onto the ArcFace scale"""
+    name = "lbph"
+
+    def __init__(self, detector, shortlist):
+        super().__init__(detector)
+        self.shortlist = shortlist
+
+    def identify(self, face_crop, box):
+        t = time.perf_counter()
+        ranked = self.shortlist.rank(face_crop, 2)
+        self.stats["lbph_runs"] += 1
+        self._lap("lbph", t)
+        if not ranked:
+            return None
+        runner_up = ranked[1][1] if len(ranked) > 1 else 2.0 * LBPH_DISTANCE_SCALE
+        return Match(ranked[0][0], ranked[0][1] / LBPH_DISTANCE_SCALE, runner_up / LBPH_DISTANCE_SCALE)
+
+class HybridEngine(RecognitionEngine):
+    """
+    LBPH ranks students on every frame; ArcFace confirms within the shortlist.
+    A face whose LBPH top-1 still matches its ArcFace-verified track reuses
+    that verdict for ARCFACE_RECHECK_INTERVAL seconds. Runner-up distance is
+    capped at DISTANCE_THRESHOLD: students outside the shortlist are not
+    searched, and anything closer would have ranked into it.
+    """
+    name = "hybrid"
+
+    def __init__(self, detector, gallery, shortlist):
+        super().__init__(detector)
+        self.gallery = gallery
+        self.shortlist = shortlist
+        self.tracks = []   # [{"box", "match", "verified_at"}, ...]
+
+    def identify(self, face_crop, box):
+        now = time.time()
+        self.tracks = [t for t in self.tracks if now - t["verified_at"] < 2 * ARCFACE_RECHECK_INTERVAL]
+        t = time.perf_counter()
+        ranked = self.shortlist.rank(face_crop, SHORTLIST_SIZE)
+        t = self._lap("lbph", t)
+        if not ranked:
+            return None
+
+        for track in self.tracks:
+            if (track["match"].folder == ranked[0][0] and now - track["verified_at"] < ARCFACE_RECHECK_INTERVAL
+                    and box_iou(track["box"], box) >= TRACK_IOU):
+                track["box"] = box
+                self.stats["lbph_only"] += 1
+                return track["match"]
+
+        self.stats["arcface_runs"] += 1
+        embedding = face_gallery.embed_face(face_crop)
+        t = self._lap("embed", t)
+        candidates = self.gallery.subset([folder for folder, _ in ranked])
+        match = best_two(candidates, embedding)
+        self._lap("match", t)
+        if match is None:
+            return None
+        match = match._replace(runner_up=min(match.runner_up, DISTANCE_THRESHOLD))
+        if match.distance < DISTANCE_THRESHOLD:
+            self.tracks.append({"box": box, "match": match, "verified_at": now})
+        return match
+
+def configured_engine(name=None):
+    """Engine name to use: explicit name, else ATTENDANCE_ENGINE, else arcface"""
+    name = (name or os.environ.get("ATTENDANCE_ENGINE") or DEFAULT_ENGINE).strip().lower()
+    if name not in ENGINES:
+        raise ValueError(f"Unknown recognition engine '{name}' (choose from {', '.join(ENGINES)})")
+    return name
+
+def heavy_modules(name=None, detector=None):
+    """Slow third-party packages the engine will import, for startup prefetching"""
+    name = configured_engine(name)
+    modules = []
+    if face_detectors.configured_detector(detector, default="haar" if name == "lbph" else "yolo") == "yolo":
+        modules.append("ultralytics")
+    if name != "lbph":
+        modules.append("deepface.DeepFace")
+    return modules
+
+def create_engine(name=None, gallery=None, prior_gallery=None, dataset_dir=DATASET_DIR, detector=None,
+                  exclude_paths=None):
+    """
+    Build the configured engine. Falls back to arcface when the LBPH model
+    cannot be built. `detector` is a face_detectors name or instance.
+    exclude_paths (normalised image paths) are left out of the gallery and
+    the LBPH model, for benchmarks that replay held-out images.
+    """
+    name = configured_engine(name)
+
+    shortlist = None
+    if name in ("lbph", "hybrid"):
+        from lbph_shortlist import LBPHShortlist
+        try:
+            if exclude_paths:
+                shortlist = LBPHShortlist.build(dataset_dir, exclude_paths)     # Not cached: differs from the dataset
+            else:
+                shortlist = LBPHShortlist.load_or_build(dataset_dir)
+        except Exception as e:
+            print(f"  ⚠️  LBPH model unavailable ({e}) — using ArcFace only")
+        if shortlist is None or len(shortlist) == 0:
+            name, shortlist = "arcface", None
+
+    if detector is None or isinstance(detector, str):
+        detector = face_detectors.create_detector(detector, default="haar" if name == "lbph" else "yolo")
+
+    if name == "lbph":
+        return LBPHEngine(detector, shortlist)
+
+    if gallery is None:
+        gallery = face_gallery.FaceGallery.load()
+        if gallery.sync(dataset_dir):
+            gallery.save(labels=gallery.changed_labels)
+    if exclude_paths and len(gallery):
+        keep = np.array([os.path.normpath(str(p)) not in exclude_paths for p in gallery.paths], dtype=bool)
+        gallery = face_gallery.FaceGallery(gallery.embeddings[keep], gallery.labels[keep], gallery.paths[keep])
+    face_gallery.embed_face(np.zeros((160, 160, 3), dtype=np.uint8))  # Load ArcFace weights now
+    if name == "hybrid":
+        return HybridEngine(detector, gallery, shortlist)
+    return ArcFaceEngine(detector, gallery, prior_gallery)
+
+# ==========================================
+# MULTI-FRAME CONFIRMATION
+# ==========================================
+class ConfirmationTracker:
+    """Accumulates per-student evidence across frames and records time-to-mark"""
+
+    def __init__(self, threshold=DISTANCE_THRESHOLD):
+        self.threshold = threshold
+        self.buffer = defaultdict(list)   # name -> [(timestamp, evidence), ...]
+        self.first_seen = {}              # name -> time of first below-threshold match
+        self.time_to_mark = {}            # name -> seconds from first match to marked
+
+    def frame_evidence(self, distance, runner_up_distance):
+        """Evidence one frame contributes, from match distance and best-vs-second margin"""
+        margin = runner_up_distance - distance
+        if margin < MIN_MARGIN:
+            return 0.0
+        closeness = (self.threshold - distance) / self.threshold
+        strength = EVIDENCE_GAIN * closeness * min(1.0, margin / FULL_MARGIN)
+        return max(1.0 / MIN_CONFIRMATIONS, strength)
+
+    def observe(self, match, now=None):
+        """
+        Add one frame's match. Returns the student's confirmation score
+        (>= 1.0 means confirmed), or 0.0 when the match is above threshold.
+        """
+        if match is None or match.distance >= self.threshold:
+            return 0.0
+        now = time.time() if now is None else now
+        name = match.folder
+        self.first_seen.setdefault(name, now)
+        entries = self.buffer[name]
+        entries.append((now, self.frame_evidence(match.distance, match.runner_up)))
+        # Only keep entries from the evidence window
+        entries = [e for e in entries if now - e[0] <= EVIDENCE_WINDOW][-RECOGNITION_BUFFER_SIZE:]
+        self.buffer[name] = entries
+        return sum(e for _, e in entries)
+
+    def record_mark(self, name, now=None):
+        now = time.time() if now is None else now
+        self.time_to_mark[name] = now - self.first_seen.get(name, now)
@@ -1,14 +1,16 @@
-import cv2
-import numpy as np
-from datetime import datetime
 import os
-import re
 import time
 import sys
 import glob
-from collections import defaultdict
-from ultralytics import YOLO
-from deepface import DeepFace
+import atexit
+import signal
+from startup_profiler import StartupProfiler
+
+# Startup is profiled stage by stage and checked against a budget (see startup_profiler.py)
+profiler = StartupProfiler("recognize_attendance")
+with profiler.stage("import cv2/numpy", "imports"):
+    import cv2
+    import numpy as np
 
 # ==========================================
 # PARSE COMMAND-LINE ARGUMENTS
@@ -19,7 +21,7 @@ SUBJECT_NAME = sys.argv[2] if len(sys.argv) > 2 else ""
 PERIOD = sys.argv[3] if len(sys.argv) > 3 else ""
 FACULTY_NAME = sys.argv[4] if len(sys.argv) > 4 else ""
 SESSION_ID = int(sys.argv[5]) if len(sys.argv) > 5 and sys.argv[5].isdigit() else None
-RTSP_URL = sys.argv[6] if len(sys.argv) > 6 else None  # Optional IP camera stream
+RTSP_URL = sys.argv[6] if len(sys.argv) > 6 else None  # Optional IP camera stream (or recorded clip)
 
 print(f"\n{'='*60}")
 print(f"  LECTURE DETAILS")
@@ -30,22 +32,29 @@ print(f"  Faculty : {FACULTY_NAME}")
 print(f"  Session : #{SESSION_ID}")
 print(f"{'='*60}\n")
 
-import database
-import json
+with profiler.stage("import app modules", "imports"):
+    import database
+    import face_gallery
+    from event_log import write_log
+    import recognition_engine
+    import video_sources
+    from attendance_writer import AttendanceWriter
+    from stage_timer import StageTimers
+    from recognition_engine import (
+        DISTANCE_THRESHOLD, MIN_FACE_SIZE, MIN_CONFIRMATIONS, MIN_MARGIN,
+        ConfirmationTracker, crop_face, folder_name_to_display_name,
+    )
 
-LOG_FILE = "system_logs.jsonl"
 DATASET_DIR = "TrainingImage"
 
 # ==========================================
-# RECOGNITION TUNING PARAMETERS
+# RECOGNITION SETTINGS
 # ==========================================
-DISTANCE_THRESHOLD = 0.40       # ArcFace cosine distance (STRICT: 0.40 prevents false matches)
-                                 # Lower = stricter. 0.55 was too loose (wrong names given)
-                                 # 0.40 = face must be 60% similar to stored image
-MIN_FACE_SIZE = 80              # Minimum face width/height in pixels (larger = clearer face needed)
-MIN_CONFIRMATIONS = 5           # Frames needed to confirm — prevents single-frame false match
-RECOGNITION_BUFFER_SIZE = 10    # Max buffer entries per student
+# Thresholds and the confirmation policy live in recognition_engine.py.
+# The engine (arcface / lbph / hybrid) is chosen with ATTENDANCE_ENGINE.
+USE_ATTENDANCE_PRIOR = True     # Search students seen in earlier periods today first
 ATTENDANCE_DURATION = 30        # Seconds for attendance session
+SHOW_DEBUG_HUD = os.environ.get("ATTENDANCE_DEBUG_HUD", "") == "1"   # Stage timings on screen ('D' toggles)
 
 # ==========================================
 # CLEAN STALE DEEPFACE CACHE
@@ -70,58 +79,49 @@ def clean_deepface_cache():
     else:
         print(f"  ℹ️  No stale cache found")
 
+try:
+    ENGINE_NAME = recognition_engine.configured_engine()
+except ValueError as e:
+    print(f"  ❌ {e}")
+    sys.exit(1)
+
+# TensorFlow / PyTorch import on background threads while the cache is
+# cleaned, the gallery loaded and the camera negotiated
+profiler.prefetch(*recognition_engine.heavy_modules(ENGINE_NAME))
+
 print("[STEP 1/4] Cleaning stale DeepFace cache...")
-clean_deepface_cache()
+with profiler.stage("clean DeepFace cache", "cache"):
+    clean_deepface_cache()
 
 # ==========================================
-# LOAD YOLO MODEL
+# LOAD EMBEDDING GALLERY
 # ==========================================
-print("[STEP 2/4] Loading YOLOv8 Face Model...")
-try:
-    model = YOLO('yolov8n-face.pt')
-    print("  ✅ YOLOv8 Face Model loaded")
-except Exception as e:
-    print(f"  ❌ Failed to load YOLO model: {e}")
-    sys.exit(1)
+print("[STEP 2/4] Loading ArcFace gallery (new students are embedded now, may be slow)...")
+with profiler.stage("load gallery", "gallery"):
+    gallery = face_gallery.FaceGallery.load()
+if ENGINE_NAME != "lbph":
+    try:
+        with profiler.stage("sync gallery", "gallery"):
+            if gallery.sync(DATASET_DIR):
+                gallery.save(labels=gallery.changed_labels)
+        print(f"  ✅ Gallery ready: {len(gallery.identities())} students, {len(gallery)} embeddings")
+    except Exception as e:
+        print(f"  ⚠️  Gallery sync note: {e}")
+else:
+    print("  ℹ️  LBPH engine selected — gallery not needed")
 
 # ==========================================
 # OPEN CAMERA EARLY (warms up while models load)
 # ==========================================
 print("[STEP 3/4] Opening camera...")
-# Use RTSP stream if provided, otherwise use local webcam
-if RTSP_URL:
-    print(f"  🎥 Connecting to IP camera: {RTSP_URL}")
-    cap = cv2.VideoCapture(RTSP_URL)
-    if not cap.isOpened():
-        print(f"  ⚠️  RTSP stream unreachable: {RTSP_URL}")
-        print("  🔄 Falling back to local webcam (index 0)...")
-        if sys.platform == 'win32':
-            cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-        else:
-            cap = cv2.VideoCapture(0)
-else:
-    if sys.platform == 'win32':
-        cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-    else:
-        cap = cv2.VideoCapture(0)
+# RTSP stream if provided, otherwise the local webcam. A video file, image
+# folder or "synthetic" spec replays recorded footage instead (see video_sources.py)
+with profiler.stage("open camera", "camera"):
+    cap = video_sources.open_source(RTSP_URL, realtime=True)
 
 if not cap.isOpened():
     print("[ERROR] Camera not accessible!")
     sys.exit(1)
-
-# Set camera properties for faster capture
-if RTSP_URL:
-    # IP Camera (WiFi) — reduce lag with minimal buffer
-    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)       # Only keep 1 frame in buffer (latest frame)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    cap.set(cv2.CAP_PROP_FPS, 15)             # Lower FPS = less WiFi bandwidth = less lag
-    print("  📡 IP Camera mode: Anti-lag settings applied")
-else:
-    # Laptop webcam — normal settings
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    cap.set(cv2.CAP_PROP_FPS, 30)
 print("  ✅ Camera ready")
 
 # ==========================================
@@ -132,12 +132,13 @@ if SUBJECT_NAME:
 else:
     WINDOW_NAME = "Smart Attendance System (DeepFace + YOLOv8)"
 
-cv2.destroyAllWindows()
-time.sleep(0.1)
+with profiler.stage("create window", "ui"):
+    cv2.destroyAllWindows()
+    time.sleep(0.1)
 
-cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
-cv2.resizeWindow(WINDOW_NAME, 900, 700)
-cv2.setWindowProperty(WINDOW_NAME, cv2.WND_PROP_TOPMOST, 1)
+    cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
+    cv2.resizeWindow(WINDOW_NAME, 900, 700)
+    cv2.setWindowProperty(WINDOW_NAME, cv2.WND_PROP_TOPMOST, 1)
 
 # Professional UI Colors
 COL_BG         = (20, 20, 25)
@@ -168,6 +169,23 @@ def draw_footer(frame, text):
     cv2.line(frame, (0, h - 35), (w, h - 35), COL_GRAY, 1)
     cv2.putText(frame, text, (15, h - 12), cv2.FONT_HERSHEY_SIMPLEX, 0.4, COL_GRAY, 1, cv2.LINE_AA)
 
+def draw_debug_hud(frame, timers):
+    """Rolling p50/p95 per stage in a panel under the header"""
+    lines = timers.hud_lines()
+    frame_p50 = timers.percentile_ms("frame", 50)
+    if frame_p50:
+        lines.append(f"fps      {1000.0 / frame_p50:6.1f}")
+    if not lines:
+        return
+    x, y = 15, 80
+    panel_h = 22 + 16 * len(lines)
+    overlay = frame.copy()
+    cv2.rectangle(overlay, (x, y), (x + 215, y + panel_h), COL_PANEL, -1)
+    cv2.addWeighted(overlay, 0.8, frame, 0.2, 0, frame)
+    cv2.putText(frame, "STAGE      p50    p95", (x + 8, y + 16), cv2.FONT_HERSHEY_SIMPLEX, 0.4, COL_PRIMARY, 1, cv2.LINE_AA)
+    for i, line in enumerate(lines):
+        cv2.putText(frame, line, (x + 8, y + 34 + 16 * i), cv2.FONT_HERSHEY_PLAIN, 0.9, COL_WHITE, 1, cv2.LINE_AA)
+
 # Show Professional Loading Screen
 loading_img = np.zeros((700, 900, 3), dtype=np.uint8)
 loading_img[:] = COL_BG
@@ -180,104 +198,145 @@ draw_footer(loading_img, "Initializing AI Models...")
 cv2.imshow(WINDOW_NAME, loading_img)
 cv2.waitKey(100)
 
+def load_attendance_prior():
+    """Sub-gallery of students from this cohort already present in earlier periods today"""
+    if not USE_ATTENDANCE_PRIOR or not SUBJECT_CODE or len(gallery) == 0:
+        return face_gallery.FaceGallery()
+    try:
+        attendees = database.get_cohort_attendees_today(SUBJECT_CODE, PERIOD)
+    except Exception as e:
+        print(f"  ⚠️  Attendance prior unavailable: {e}")
+        return face_gallery.FaceGallery()
+    known = set(gallery.identities())
+    folders = []
+    for row in attendees:
+        folder = f"{row['name']}_{row['roll_number']}" if row.get('roll_number') else row['name']
+        if folder in known:
+            folders.append(folder)
+        elif row['name'] in known:
+            folders.append(row['name'])
+    return gallery.subset(folders)
+
 # ==========================================
-# DEEPFACE WARMUP — Build fresh embeddings
+# RECOGNITION ENGINE — detector + ArcFace/LBPH models
 # ==========================================
-print("[STEP 4/4] Building DeepFace embeddings (first run may be slow)...")
+print("[STEP 4/4] Loading recognition engine...")
+with profiler.stage("attendance prior", "gallery"):
+    prior_gallery = load_attendance_prior()
+if len(prior_gallery):
+    print(f"  ✅ Attendance prior: {len(prior_gallery.identities())} student(s) from earlier periods searched first")
 try:
-    dummy_img = np.zeros((160, 160, 3), dtype=np.uint8)
-    DeepFace.find(
-        img_path=dummy_img, 
-        db_path=DATASET_DIR, 
-        model_name="ArcFace",
-        enforce_detection=False, 
-        silent=True
-    )
-    print("  ✅ DeepFace embeddings ready")
+    with profiler.stage("load engine models", "models"):
+        engine = recognition_engine.create_engine(ENGINE_NAME, gallery=gallery, prior_gallery=prior_gallery, dataset_dir=DATASET_DIR)
+    print(f"  ✅ Engine ready: {engine.describe()}")
 except Exception as e:
-    print(f"  ⚠️  DeepFace warmup note: {e}")
+    print(f"  ❌ Failed to load recognition engine: {e}")
+    sys.exit(1)
 
 cv2.setWindowProperty(WINDOW_NAME, cv2.WND_PROP_TOPMOST, 0)
 
-def write_log(message, log_type="info"):
-    """Write log entry to file to be picked up by the UI toast system"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = {
-        "timestamp": timestamp,
-        "type": log_type,
-        "message": message
-    }
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry) + "\n")
-    except Exception:
-        pass
-
-def folder_name_to_display_name(folder_name):
-    """Convert folder name like 'Sagar Kumar_21104131014' to display name 'Sagar Kumar'"""
-    # Strip trailing _<digits> (roll number)
-    display = re.sub(r'_\d+$', '', folder_name).strip()
-    return display if display else folder_name
-
-def mark_attendance(name):
-    """Mark attendance with duplicate prevention via SQLite"""
-    result = database.mark_attendance(
-        name,
-        subject_code=SUBJECT_CODE,
-        subject_name=SUBJECT_NAME,
-        period=PERIOD,
-        faculty_name=FACULTY_NAME,
-        session_id=SESSION_ID
-    )
-    
+def on_attendance_written(name, result, committed_at):
+    """Called from the writer thread once a mark is committed"""
     display_name = folder_name_to_display_name(name)
-    
+    if name in captured_at_by_student:
+        glass_to_mark[name] = committed_at - captured_at_by_student[name]
     if result == 'success':
         print(f"✅ Attendance marked for {display_name} | {SUBJECT_NAME} | {PERIOD}")
         write_log(f"Attendance recorded for {display_name} in {SUBJECT_NAME} ({PERIOD})", "success")
-        return True
-    elif result == 'duplicate':
-        print(f"ℹ️  {display_name} already marked for {SUBJECT_NAME} ({PERIOD}) today")
-        write_log(f"Attendance already recorded for {display_name} in {SUBJECT_NAME}", "warning")
-        return False
     else:
-        print(f"⚠️  Failed to find {name} (display: {display_name}) in Student Registry")
-        write_log(f"Student not found in registry: {name}", "error")
-        return False
+        print(f"ℹ️  {display_name} already marked for {SUBJECT_NAME} ({PERIOD}) today")
+        write_log(f"Attendance already recorded for {display_name} in {SUBJECT_NAME}", "warning", sample="already-recorded")
+
+def mark_attendance(name):
+    """Queue a mark on the write-behind writer (duplicates are resolved by SQLite on commit)"""
+    if writer.submit(name) == 'queued':
+        return True
+    display_name = folder_name_to_display_name(name)
+    print(f"⚠️  Failed to find {name} (display: {display_name}) in Student Registry")
+    write_log(f"Student not found in registry: {name}", "error", sample="not-in-registry")
+    return False
+
+# ==========================================
+# WRITE-BEHIND ATTENDANCE QUEUE
+# ==========================================
+# Folder names are resolved to student ids once here; marks are committed in
+# batches by a background thread (see attendance_writer.py)
+captured_at_by_student = {}
+glass_to_mark = {}
+dataset_folders = [f for f in os.listdir(DATASET_DIR) if os.path.isdir(os.path.join(DATASET_DIR, f))] \
+    if os.path.isdir(DATASET_DIR) else []
+writer = AttendanceWriter(
+    dataset_folders,
+    subject_code=SUBJECT_CODE,
+    subject_name=SUBJECT_NAME,
+    period=PERIOD,
+    faculty_name=FACULTY_NAME,
+    session_id=SESSION_ID,
+    on_result=on_attendance_written,
+)
+atexit.register(writer.close)   # Safety net if the loop dies; the normal path closes it explicitly
+
+# The app sends SIGTERM (CTRL_BREAK on Windows) when a scan overruns its
+# timeout. The loop then ends like a normal session, so queued marks are
+# committed or spooled and the session summary is still written.
+stop_requested = False
+
+def request_stop(signum, frame):
+    global stop_requested
+    stop_requested = True
+
+for _sig in ("SIGTERM", "SIGBREAK"):
+    if hasattr(signal, _sig):
+        signal.signal(getattr(signal, _sig), request_stop)
+unresolved = [f for f, sid in writer.student_ids.items() if sid is None]
+if unresolved:
+    print(f"  ⚠️  {len(unresolved)} dataset folder(s) have no student record: {', '.join(sorted(unresolved)[:5])}")
 
 # ==========================================
 # MULTI-FRAME RECOGNITION BUFFER
 # ==========================================
-recognition_buffer = defaultdict(list)
+tracker = ConfirmationTracker()
 confirmed_students = set()
 marked_students = set()
+not_found_students = set()
 
-def update_recognition_buffer(name):
-    current_time = time.time()
-    recognition_buffer[name].append(current_time)
-    # Only keep entries from last 3 seconds
-    recognition_buffer[name] = [ts for ts in recognition_buffer[name] if current_time - ts <= 3.0]
-    if len(recognition_buffer[name]) > RECOGNITION_BUFFER_SIZE:
-        recognition_buffer[name] = recognition_buffer[name][-RECOGNITION_BUFFER_SIZE:]
+# ==========================================
+# STAGE TIMERS
+# ==========================================
+# capture / detect / identify (engine adds embed, match, lbph) / mark /
+# overlay / imshow / frame. Glass-to-mark is measured from the moment the
+# confirming frame came out of cap.read() to the attendance row being
+# committed by the writer, so it excludes camera and network buffering.
+timers = StageTimers()
+engine.timers = timers
+show_hud = SHOW_DEBUG_HUD
 
-def get_confirmation_count(name):
-    return len(recognition_buffer.get(name, []))
+# ==========================================
+# STARTUP BUDGET CHECK
+# ==========================================
+startup = profiler.finish()
+if startup["over_budget"]:
+    slow = ", ".join(f"{k} {v}s" for k, v in startup["over_budget"].items())
+    write_log(f"Attendance scanner startup over budget: {slow}", "warning")
 
 # ==========================================
 # MAIN ATTENDANCE LOOP
 # ==========================================
 print("=" * 60)
 print("[INFO] DEEPFACE + YOLOV8 ATTENDANCE SYSTEM STARTED")
+print(f"[INFO] Recognizer: {engine.describe()}")
 print(f"[INFO] Distance threshold: {DISTANCE_THRESHOLD}")
 print(f"[INFO] Min face size: {MIN_FACE_SIZE}px")
-print(f"[INFO] Min confirmations: {MIN_CONFIRMATIONS} frames")
+print(f"[INFO] Confirmation: adaptive, 1-{MIN_CONFIRMATIONS} frames (min margin {MIN_MARGIN})")
 print(f"[INFO] Session duration: {ATTENDANCE_DURATION}s")
 print("=" * 60)
 
 start_time = time.time()
 
 while True:
+    frame_start = time.perf_counter()
     ret, frame = cap.read()
+    captured_at = timers.lap("capture", frame_start)
     if not ret:
         break
 
@@ -286,99 +345,94 @@ while True:
     
     if elapsed_time >= ATTENDANCE_DURATION:
         break
+    if stop_requested:
+        print("\n[WARNING] Attendance session stopped by the server")
+        break
 
-    # Run YOLOv8 Face Detection
-    results = model(frame, verbose=False)
+    # Run face detection (YOLOv8-face, YuNet or Haar, depending on configuration)
+    detections = engine.detect(frame)
+    timers.lap("detect", captured_at)
+    draw_seconds = 0.0
     
-    for result in results:
-        boxes = result.boxes
-        for box in boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            
-            # Calculate face dimensions
-            face_w = x2 - x1
-            face_h = y2 - y1
-            
-            # Skip faces that are too small for reliable recognition
-            if face_w < MIN_FACE_SIZE or face_h < MIN_FACE_SIZE:
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (128, 128, 128), 2)
-                cv2.putText(frame, "Too far", (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (128, 128, 128), 1)
-                continue
-            
-            # Extract face crop with bounds checking
-            h, w = frame.shape[:2]
-            cx1, cy1 = max(0, x1), max(0, y1)
-            cx2, cy2 = min(w, x2), min(h, y2)
-            
-            face_crop = frame[cy1:cy2, cx1:cx2]
-            name = "Unknown"
-            display_name = "Unknown"
-            color = (0, 0, 255)
-            confirmation_count = 0
-            is_recognized = False
-
-            if face_crop.size > 0:
-                try:
-                    # Recognize face using DeepFace
-                    dfs = DeepFace.find(
-                        img_path=face_crop, 
-                        db_path=DATASET_DIR, 
-                        model_name="ArcFace", 
-                        enforce_detection=False,
-                        silent=True
-                    )
-                    
-                    if len(dfs) > 0 and len(dfs[0]) > 0:
-                        df = dfs[0]
-                        # Sort by distance (smaller is better match)
-                        df = df.sort_values(by="distance")
-                        best_distance = df.iloc[0]['distance']
-                        best_match_path = df.iloc[0]['identity']
+    for detection in detections:
+        box = detection.box
+        x1, y1, x2, y2 = box
+        
+        # Calculate face dimensions
+        face_w = x2 - x1
+        face_h = y2 - y1
+        
+        # Skip faces that are too small for reliable recognition
+        if face_w < MIN_FACE_SIZE or face_h < MIN_FACE_SIZE:
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (128, 128, 128), 2)
+            cv2.putText(frame, "Too far", (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (128, 128, 128), 1)
+            continue
+        
+        # Extract face crop with bounds checking
+        face_crop = crop_face(frame, box, detection.landmarks)
+        name = "Unknown"
+        display_name = "Unknown"
+        color = (0, 0, 255)
+        confirmation_score = 0.0
+        is_recognized = False
+
+        if face_crop.size > 0:
+            try:
+                # Recognize face with the configured engine
+                t = time.perf_counter()
+                match = engine.identify(face_crop, box)
+                timers.lap("identify", t)
+                
+                if match is not None:
+                    # CRITICAL: Only accept match if distance is below threshold
+                    if match.distance < DISTANCE_THRESHOLD:
+                        matched_display = folder_name_to_display_name(match.folder)
+                        confirmation_score = tracker.observe(match)
                         
-                        # CRITICAL: Only accept match if distance is below threshold
-                        if best_distance < DISTANCE_THRESHOLD:
-                            # Extract folder name (student name) from path
-                            matched_folder = os.path.basename(os.path.dirname(best_match_path))
-                            matched_display = folder_name_to_display_name(matched_folder)
-                            
-                            update_recognition_buffer(matched_folder)
-                            confirmation_count = get_confirmation_count(matched_folder)
+                        if confirmation_score >= 1.0:
+                            name = match.folder
+                            display_name = matched_display
+                            is_recognized = True
                             
-                            if confirmation_count >= MIN_CONFIRMATIONS:
-                                name = matched_folder
-                                display_name = matched_display
-                                is_recognized = True
-                                
-                                if name not in marked_students:
-                                    if mark_attendance(name):
-                                        marked_students.add(name)
-                                        confirmed_students.add(name)
-                                color = (0, 255, 0)
-                            else:
-                                display_name = f"{matched_display}?"
-                                color = (0, 165, 255)
+                            if name not in marked_students and name not in not_found_students:
+                                t = time.perf_counter()
+                                captured_at_by_student[name] = captured_at
+                                if mark_attendance(name):
+                                    marked_students.add(name)
+                                    confirmed_students.add(name)
+                                    tracker.record_mark(name)
+                                else:
+                                    not_found_students.add(name)
+                                timers.lap("mark", t)
+                            color = (0, 255, 0)
                         else:
-                            # Distance too high — not a reliable match
-                            display_name = "Unknown"
-                            color = (0, 0, 255)
-                except Exception as e:
-                    pass
-
-            # Build display text
-            text = display_name
-            if is_recognized and name in marked_students:
-                text += " (OK)"
-            elif confirmation_count > 0:
-                text += f" ({confirmation_count}/{MIN_CONFIRMATIONS})"
-            
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 3)
-            (text_width, text_height), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
-            cv2.rectangle(frame, (x1, y1-text_height-10), (x1+text_width, y1), color, -1)
-            cv2.putText(frame, text, (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+                            display_name = f"{matched_display}?"
+                            color = (0, 165, 255)
+                    else:
+                        # Distance too high — not a reliable match
+                        display_name = "Unknown"
+                        color = (0, 0, 255)
+            except Exception as e:
+                pass
+
+        # Build display text
+        t = time.perf_counter()
+        text = display_name
+        if is_recognized and name in marked_students:
+            text += " (OK)"
+        elif confirmation_score > 0:
+            text += f" ({min(99, int(confirmation_score * 100))}%)"
+        
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 3)
+        (text_width, text_height), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
+        cv2.rectangle(frame, (x1, y1-text_height-10), (x1+text_width, y1), color, -1)
+        cv2.putText(frame, text, (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        draw_seconds += time.perf_counter() - t
     
     # ==========================================
     # PROFESSIONAL UI OVERLAY
     # ==========================================
+    overlay_start = time.perf_counter()
     fh, fw = frame.shape[:2]
     
     # 1. Header
@@ -428,25 +482,83 @@ while True:
             tag_x += tw + 30
 
     # 4. Footer
-    draw_footer(frame, "GREEN=Confirmed  |  ORANGE=Pending  |  RED=Unknown  |  GRAY=Too Far  |  Press ESC to exit")
+    draw_footer(frame, "GREEN=Confirmed  |  ORANGE=Pending  |  RED=Unknown  |  GRAY=Too Far  |  D=Timings  |  ESC=Exit")
+    if show_hud:
+        draw_debug_hud(frame, timers)
+    t = time.perf_counter()
+    timers.add("overlay", t - overlay_start + draw_seconds)
 
     cv2.imshow(WINDOW_NAME, frame)
+    key = cv2.waitKey(1) & 0xFF
+    timers.lap("imshow", t)
+    timers.lap("frame", frame_start)
 
-    if cv2.waitKey(1) & 0xFF == 27:
+    if key == 27:
         print("\n[WARNING] Attendance session ended early by user")
         break
+    if key in (ord('d'), ord('D')):
+        show_hud = not show_hud
+
+# Commit every queued mark before reporting (rows the DB refuses are spooled)
+spooled = writer.close()
+duplicates = {s for s, r in writer.results.items() if r == 'duplicate'}
+present_count = len(marked_students - duplicates)
 
 print("=" * 60)
 print(f"[OK] ATTENDANCE SESSION COMPLETE!")
-print(f"[STATS] Total students marked: {len(marked_students)}")
-if marked_students:
-    for s in sorted(marked_students):
-        print(f"  ✅ {folder_name_to_display_name(s)}")
+print(f"[STATS] Total students marked: {present_count}")
+if duplicates:
+    print(f"[STATS] Already marked earlier for this period: {len(duplicates)}")
+if spooled:
+    print(f"[WARNING] {spooled} mark(s) could not be written yet and will be retried next session")
+if present_count:
+    for s in sorted(marked_students - duplicates):
+        ttm = tracker.time_to_mark.get(s)
+        g2m = glass_to_mark.get(s)
+        print(f"  ✅ {folder_name_to_display_name(s)}"
+              + (f"  ({ttm:.2f}s to mark" if ttm is not None else "  (")
+              + (f", glass-to-mark {g2m * 1000:.0f}ms)" if g2m is not None else ")"))
+if tracker.first_seen:
+    first_match = min(tracker.first_seen.values()) - start_time
+    print(f"[STATS] Time to first match: {first_match:.2f}s")
+if engine.stats:
+    print("[STATS] Engine: " + ", ".join(f"{k}={v}" for k, v in sorted(engine.stats.items())))
+if tracker.time_to_mark:
+    ttm_values = np.array(list(tracker.time_to_mark.values()))
+    ttm_summary = (f"Time-to-mark: median {np.median(ttm_values):.2f}s, "
+                   f"p90 {np.percentile(ttm_values, 90):.2f}s, max {ttm_values.max():.2f}s "
+                   f"over {len(ttm_values)} student(s)")
+    print(f"[STATS] {ttm_summary}")
+    write_log(f"{SUBJECT_NAME or 'Session'} {PERIOD}: {ttm_summary}".strip(), "info")
+
+stage_summary = timers.summary()
+session_seconds = time.time() - start_time
+frames_processed = timers.count["frame"]
+if stage_summary:
+    print("[STATS] Stage latency (p50 / p95 / max ms):")
+    for stage, st in stage_summary.items():
+        print(f"  {stage:<9} {st['p50_ms']:>8} {st['p95_ms']:>8} {st['max_ms']:>8}   total {st['total_s']}s")
+    bottleneck = timers.bottleneck()
+    fps = frames_processed / session_seconds if session_seconds > 0 else 0.0
+    print(f"[STATS] {frames_processed} frames at {fps:.1f} FPS, bottleneck: {bottleneck}")
+    write_log(f"{SUBJECT_NAME or 'Session'} {PERIOD}: {fps:.1f} FPS, bottleneck {bottleneck} "
+              f"(p95 {stage_summary[bottleneck]['p95_ms']}ms)".strip(), "info")
+perf_stats = {
+    "engine": engine.describe(),
+    "startup_s": startup["categories"]["total"],
+    "frames": frames_processed,
+    "seconds": round(session_seconds, 2),
+    "stages": stage_summary,
+    "glass_to_mark_ms": {s: round(v * 1000.0, 1) for s, v in sorted(glass_to_mark.items())},
+    "time_to_mark_s": {s: round(v, 3) for s, v in sorted(tracker.time_to_mark.items())},
+    "engine_stats": dict(engine.stats),
+    "attendance_writer": writer.stats(),
+}
 print("=" * 60)
 
 if SESSION_ID:
     try:
-        database.end_lecture_session(SESSION_ID, total_present=len(marked_students))
+        database.end_lecture_session(SESSION_ID, total_present=present_count, perf_stats=perf_stats)
         print(f"[INFO] Lecture session #{SESSION_ID} marked as completed.")
     except Exception as e:
         print(f"[WARNING] Failed to update lecture session: {e}")
@@ -0,0 +1,102 @@
+import math
+import time
+from collections import defaultdict, deque
+import numpy as np
+
+# ==========================================
+# PER-STAGE LATENCY TIMERS
+# ==========================================
+# Cheap wall-clock timers for the recognition loop. Each stage keeps its
+# last ROLLING_WINDOW samples for percentiles on the HUD, plus running
+# totals and a log-scale histogram (bins HIST_GROWTH apart, so percentiles
+# are within ~2.5%) covering the whole session for summary(). Recording a
+# sample is one perf_counter() call, a deque append and a histogram bump, so
+# the timers can stay on in production.
+#
+#   timers = StageTimers()
+#   t = time.perf_counter()
+#   ret, frame = cap.read()
+#   t = timers.lap("capture", t)      # records and returns the new start time
+
+ROLLING_WINDOW = 300        # ~10-20 s of frames at typical scanner FPS
+HIST_MIN_MS = 0.01          # Lower edge of the first histogram bin
+HIST_GROWTH = 1.05          # Each bin is 5% wider than the previous one
+HIST_BINS = 340             # Up to ~160 s per sample
+
+class StageTimers:
+    """Rolling and whole-session latency statistics per named stage"""
+
+    def __init__(self, window=ROLLING_WINDOW):
+        self.window = window
+        self.recent = defaultdict(lambda: deque(maxlen=window))
+        self.total = defaultdict(float)
+        self.count = defaultdict(int)
+        self.worst = defaultdict(float)
+        self.hist = defaultdict(lambda: [0] * HIST_BINS)
+        self.order = []
+
+    def add(self, stage, seconds):
+        if stage not in self.total:
+            self.order.append(stage)
+        self.recent[stage].append(seconds)
+        self.total[stage] += seconds
+        self.count[stage] += 1
+        if seconds > self.worst[stage]:
+            self.worst[stage] = seconds
+        ms = seconds * 1000.0
+        b = int(math.log(ms / HIST_MIN_MS) / math.log(HIST_GROWTH)) if ms > HIST_MIN_MS else 0
+        self.hist[stage][min(b, HIST_BINS - 1)] += 1
+
+    def lap(self, stage, start):
+        """Record now - start for a stage and return now (the next stage's start)"""
+        now = time.perf_counter()
+        self.add(stage, now - start)
+        return now
+
+    def percentile_ms(self, stage, q):
+        samples = self.recent.get(stage)
+        if not samples:
+            return None
+        return float(np.percentile(np.fromiter(samples, dtype=np.float64), q)) * 1000.0
+
+    def session_percentile_ms(self, stage, q):
+        """Percentile over every sample of the session, from the histogram (bin midpoint)"""
+        n = self.count.get(stage, 0)
+        if not n:
+            return None
+        rank, seen = q / 100.0 * n, 0
+        for b, c in enumerate(self.hist[stage]):
+            seen += c
+            if c and seen >= rank:
+                return min(HIST_MIN_MS * HIST_GROWTH ** (b + 0.5), self.worst[stage] * 1000.0)
+        return self.worst[stage] * 1000.0
+
+    def hud_lines(self):
+        """Short 'stage  p50  p95' lines for an on-screen overlay"""
+        lines = []
+        for stage in self.order:
+            p50, p95 = self.percentile_ms(stage, 50), self.percentile_ms(stage, 95)
+            if p50 is not None:
+                lines.append(f"{stage:<9}{p50:6.1f} {p95:6.1f} ms")
+        return lines
+
+    def summary(self):
+        """{stage: {count, mean_ms, p50_ms, p95_ms, max_ms, total_s}} over the whole session"""
+        out = {}
+        for stage in self.order:
+            n = self.count[stage]
+            p50, p95 = self.session_percentile_ms(stage, 50), self.session_percentile_ms(stage, 95)
+            out[stage] = {
+                "count": n,
+                "mean_ms": round(self.total[stage] / n * 1000.0, 2) if n else None,
+                "p50_ms": round(p50, 2) if p50 is not None else None,
+                "p95_ms": round(p95, 2) if p95 is not None else None,
+                "max_ms": round(self.worst[stage] * 1000.0, 2),
+                "total_s": round(self.total[stage], 3),
+            }
+        return out
+
+    def bottleneck(self):
+        """Stage with the largest total time (excluding the whole-frame stage)"""
+        stages = [s for s in self.order if s != "frame"]
+        return max(stages, key=lambda s: self.total[s]) if stages else None
@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import time
+import threading
+import importlib
+from contextlib import contextmanager
+from datetime import datetime
+
+# ==========================================
+# STARTUP PROFILER
+# ==========================================
+# Usage in a camera script (import this before anything heavy):
+#
+#   profiler = StartupProfiler("recognize_attendance")
+#   profiler.prefetch("deepface")              # import TensorFlow in the background
+#   with profiler.stage("open camera", "camera"):
+#       cap = ...
+#   profiler.finish()                          # table + budget check + history line
+#
+# Stages belong to a category (imports / models / camera / gallery / cache /
+# ui); each category and the total startup time are compared against
+# STARTUP_BUDGET. Override with ATTENDANCE_STARTUP_BUDGET, e.g.
+# "total=20,models=8". Every run appends one JSON line to PROFILE_FILE;
+# `python startup_profiler.py` summarises that history per stage.
+#
+# prefetch() imports modules on a daemon thread so TensorFlow / PyTorch load
+# while the main thread cleans caches, syncs the gallery and negotiates the
+# camera. A later `import` of the same module simply waits for the thread.
+# The modules of one prefetch() call are imported one after another, not on
+# a thread each: TensorFlow and PyTorch importing side by side fight over
+# the GIL and the import lock, which skews both timings. finish() waits up
+# to PREFETCH_JOIN_TIMEOUT for the prefetch and reports whatever is still
+# importing as pending instead of dropping it.
+
+PROFILE_FILE = "startup_profile.jsonl"
+PREFETCH_JOIN_TIMEOUT = 30.0    # Seconds finish() waits for background imports
+STARTUP_BUDGET = {          # Seconds
+    "imports": 12.0,
+    "models": 10.0,
+    "camera": 5.0,
+    "gallery": 10.0,
+    "total": 30.0,
+}
+
+def load_budget(spec=None):
+    """STARTUP_BUDGET with overrides from 'category=seconds,...' (default: ATTENDANCE_STARTUP_BUDGET)"""
+    budget = dict(STARTUP_BUDGET)
+    spec = spec if spec is not None else os.environ.get("ATTENDANCE_STARTUP_BUDGET", "")
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        key, value = item.split("=", 1)
+        try:
+            budget[key.strip()] = float(value)
+        except ValueError:
+            print(f"  ⚠️  Ignoring startup budget entry '{item}'")
+    return budget
+
+def _process_age():
+    """Seconds since the interpreter process started (None without psutil)"""
+    try:
+        import psutil
+        return max(0.0, time.time() - psutil.Process().create_time())
+    except Exception:
+        return None
+
+class StartupProfiler:
+    """Records (stage, category, start, duration) from script start until finish()"""
+
+    def __init__(self, script, budget=None):
+        self.script = script
+        self.budget = budget if budget is not None else load_budget()
+        self.t0 = time.perf_counter()
+        self.interpreter_s = _process_age()
+        self.stages = []
+        self._threads = []
+        self._pending = {}          # module -> perf_counter start (None while queued)
+        self._lock = threading.Lock()
+
+    def _record(self, name, category, start, seconds, background=False, error=None):
+        entry = {"stage": name, "category": category, "start_s": round(start - self.t0, 3),
+                 "seconds": round(seconds, 3), "background": background}
+        if error:
+            entry["error"] = error
+        with self._lock:
+            self.stages.append(entry)
+
+    @contextmanager
+    def stage(self, name, category):
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._record(name, category, start, time.perf_counter() - start, error=error)
+
+    def prefetch(self, *modules):
+        """Import modules one by one on a background thread (skipping ones already imported)"""
+        modules = [m for m in modules if m not in sys.modules]
+        if not modules:
+            return
+
+        def worker():
+            for module in modules:
+                start = time.perf_counter()
+                with self._lock:
+                    self._pending[module] = start
+                error = None
+                try:
+                    importlib.import_module(module)
+                except Exception as e:
+                    # The foreground import reports the real failure
+                    error = f"{type(e).__name__}: {e}"
+                with self._lock:
+                    self._pending.pop(module, None)
+                self._record(f"import {module}", "imports", start, time.perf_counter() - start,
+                             background=True, error=error)
+
+        with self._lock:
+            for module in modules:
+                self._pending.setdefault(module, None)
+        thread = threading.Thread(target=worker, daemon=True, name=f"prefetch-{'+'.join(modules)}")
+        thread.start()
+        self._threads.append(thread)
+
+    def join_prefetch(self, timeout=PREFETCH_JOIN_TIMEOUT):
+        """Wait for background imports; returns [(module, seconds so far or None), ...] still pending"""
+        deadline = time.perf_counter() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.perf_counter()))
+        now = time.perf_counter()
+        with self._lock:
+            return [(m, None if start is None else now - start) for m, start in self._pending.items()]
+
+    def totals(self):
+        """Seconds per category; background stages count toward their category too"""
+        totals = {}
+        for s in self.stages:
+            totals[s["category"]] = totals.get(s["category"], 0.0) + s["seconds"]
+        return totals
+
+    def finish(self, quiet=False):
+        """Print the stage table, check the budget and append to PROFILE_FILE. Returns the report."""
+        pending = self.join_prefetch()
+        total = time.perf_counter() - self.t0
+        totals = self.totals()
+        totals["total"] = total + (self.interpreter_s or 0.0)
+        over = {k: round(v, 2) for k, v in totals.items() if k in self.budget and v > self.budget[k]}
+        report = {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "script": self.script,
+            "interpreter_s": round(self.interpreter_s, 3) if self.interpreter_s is not None else None,
+            "startup_s": round(total, 3),
+            "categories": {k: round(v, 3) for k, v in totals.items()},
+            "budget": self.budget,
+            "over_budget": over,
+            "stages": sorted(self.stages, key=lambda s: s["start_s"]),
+            "pending_prefetch": [{"module": m, "seconds": round(t, 3) if t is not None else None}
+                                 for m, t in pending],
+        }
+        if not quiet:
+            print(f"[STARTUP] {self.script}: {totals['total']:.1f}s (budget {self.budget.get('total', '-')}s)")
+            if self.interpreter_s is not None:
+                print(f"  {'python interpreter':<28}{'':>9}{self.interpreter_s:>8.2f}s")
+            for s in report["stages"]:
+                flag = " (bg)" if s["background"] else ""
+                print(f"  {s['stage'] + flag:<28}{s['category']:>9}{s['seconds']:>8.2f}s  @{s['start_s']:.2f}s")
+            for module, seconds in pending:
+                state = f"still importing after {seconds:.1f}s" if seconds is not None else "not started"
+                print(f"  ⚠️  prefetch of {module} {state}")
+            for key, value in over.items():
+                print(f"  ⚠️  {key} took {value:.1f}s, budget is {self.budget[key]:.1f}s")
+        try:
+            with open(PROFILE_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(report) + "\n")
+        except Exception:
+            pass
+        return report
+
+def summarize(path=PROFILE_FILE, script=None, last=50):
+    """Median / max seconds per stage over the last `last` runs"""
+    if not os.path.exists(path):
+        print(f"[INFO] No startup history yet ({path})")
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        runs = [json.loads(line) for line in f if line.strip()]
+    if script:
+        runs = [r for r in runs if r.get("script") == script]
+    runs = runs[-last:]
+    if not runs:
+        print("[INFO] No matching runs")
+        return
+
+    per_stage = {}
+    for run in runs:
+        for s in run["stages"]:
+            per_stage.setdefault((run["script"], s["stage"], s["category"]), []).append(s["seconds"])
+        per_stage.setdefault((run["script"], "TOTAL", "total"), []).append(run["categories"]["total"])
+    over = sum(1 for r in runs if r.get("over_budget"))
+
+    print(f"[INFO] {len(runs)} run(s), {over} over budget")
+    print(f"  {'SCRIPT':<22}{'STAGE':<28}{'CATEGORY':>9}{'MEDIAN':>9}{'MAX':>9}")
+    for (name, stage, category), values in sorted(per_stage.items()):
+        values = sorted(values)
+        median = values[len(values) // 2]
+        print(f"  {name:<22}{stage:<28}{category:>9}{median:>8.2f}s{values[-1]:>8.2f}s")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarise startup profiles of the camera scripts")
+    parser.add_argument("--script", help="Only runs of this script (recognize_attendance / capture_faces)")
+    parser.add_argument("--last", type=int, default=50)
+    args = parser.parse_args()
+    summarize(script=args.script, last=args.last)
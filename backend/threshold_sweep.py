@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+import numpy as np
+
+import face_gallery
+from recognition_engine import DISTANCE_THRESHOLD, MIN_CONFIRMATIONS, ConfirmationTracker, Match
+
+# ==========================================
+# THRESHOLD & CONFIRMATION-POLICY SWEEP
+# ==========================================
+# Usage:
+#   python threshold_sweep.py [--holdout 0.3] [--unenrolled 0.2] [--variants full,prototype,int8]
+#                             [--out sweep_report.json] [--plot sweep.png]
+#
+# Leave-some-images-out evaluation on TrainingImage/<Name_Roll>/*.jpg:
+#   - a fraction of each student's images are held out as probes, the rest are enrolled
+#   - a fraction of students are not enrolled at all, so their probes are impostors
+# Embeddings come from the gallery file (FaceGallery.sync only embeds folders
+# that changed), so repeated sweeps only pay for matching.
+#
+# The report contains, per gallery variant:
+#   - ROC / DET points (verification TAR and FAR per threshold)
+#   - TAR at FAR 1e-1 .. 1e-4
+#   - open-set identification at each threshold (correct, wrong-person, impostor accepts)
+#   - simulated sessions for fixed-N and adaptive confirmation policies
+#   - matching throughput (probes per second)
+# Variants measure the accuracy cost of speed knobs: `prototype` enrolls one
+# mean embedding per student, `int8` quantizes the enrolled matrix.
+
+THRESHOLDS = np.round(np.arange(0.10, 0.80, 0.01), 2)
+FAR_TARGETS = (1e-1, 1e-2, 1e-3, 1e-4)
+POLICIES = ("fixed-1", "fixed-3", "fixed-5", "adaptive")
+POLICY_THRESHOLDS = (0.30, 0.35, 0.40, 0.45, 0.50)
+SESSION_FRAMES = 15             # Frames a student is visible in a simulated session
+SESSIONS_PER_STUDENT = 5
+
+class FixedConfirmation(ConfirmationTracker):
+    """Every below-threshold frame counts the same: confirmed after n frames"""
+
+    def __init__(self, n, threshold=DISTANCE_THRESHOLD):
+        super().__init__(threshold)
+        self.n = n
+
+    def frame_evidence(self, distance, runner_up_distance):
+        return 1.0 / self.n
+
+def split(gallery, holdout, unenrolled, rng):
+    """Return (enrolled FaceGallery, probe embeddings, probe labels, enrolled name set)"""
+    labels = gallery.labels.astype(str)
+    students = sorted(set(labels.tolist()))
+    rng.shuffle(students)
+    n_out = int(round(len(students) * unenrolled))
+    impostor_students = set(students[:n_out])
+
+    enroll_rows, probe_rows = [], []
+    for student in students:
+        rows = np.flatnonzero(labels == student)
+        if student in impostor_students:
+            probe_rows.extend(rows.tolist())
+            continue
+        if len(rows) < 2:
+            enroll_rows.extend(rows.tolist())
+            continue
+        rows = rng.permutation(rows)
+        n_probe = max(1, int(round(len(rows) * holdout)))
+        probe_rows.extend(rows[:n_probe].tolist())
+        enroll_rows.extend(rows[n_probe:].tolist())
+
+    enroll_rows = np.array(sorted(enroll_rows))
+    probe_rows = np.array(probe_rows)
+    enrolled = face_gallery.FaceGallery(gallery.embeddings[enroll_rows], gallery.labels[enroll_rows], gallery.paths[enroll_rows])
+    enrolled_names = set(students) - impostor_students
+    return enrolled, gallery.embeddings[probe_rows], labels[probe_rows], enrolled_names
+
+def make_variant(enrolled, variant):
+    """Gallery for a speed-knob variant of the enrolled set"""
+    if variant == "full":
+        return enrolled
+    if variant == "prototype":
+        import duplicate_check
+        names, protos = duplicate_check.identity_prototypes(enrolled)
+        return face_gallery.FaceGallery(protos, names, names)
+    if variant == "int8":
+        scale = np.abs(enrolled.embeddings).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0
+        quantized = np.round(enrolled.embeddings / scale).astype(np.int8)
+        return face_gallery.FaceGallery(quantized.astype(np.float32) * scale, enrolled.labels, enrolled.paths)
+    raise ValueError(f"Unknown variant '{variant}'")
+
+def tar_at_far(far, tar, target):
+    """TAR at the largest threshold whose FAR does not exceed the target"""
+    ok = np.flatnonzero(far <= target)
+    return round(float(tar[ok[-1]]), 4) if len(ok) else 0.0
+
+def simulate_sessions(dists, names, probe_labels, enrolled_names, rng):
+    """
+    Replays each probe student as a session of SESSION_FRAMES frames drawn from
+    their probe images, under each policy and threshold.
+    """
+    by_student = {}
+    for i, label in enumerate(probe_labels):
+        by_student.setdefault(label, []).append(i)
+
+    order = np.argsort(dists, axis=1)
+    rows = []
+    for threshold in POLICY_THRESHOLDS:
+        for policy in POLICIES:
+            correct = wrong = impostor_marks = 0
+            frames_to_mark = []
+            genuine_sessions = impostor_sessions = 0
+            for student, probe_ids in by_student.items():
+                for _ in range(SESSIONS_PER_STUDENT):
+                    tracker = (ConfirmationTracker(threshold) if policy == "adaptive"
+                               else FixedConfirmation(int(policy.split("-")[1]), threshold))
+                    marked = None
+                    for frame in range(SESSION_FRAMES):
+                        p = probe_ids[rng.integers(len(probe_ids))]
+                        best = order[p, 0]
+                        runner_up = dists[p, order[p, 1]] if dists.shape[1] > 1 else 2.0
+                        match = Match(names[best], float(dists[p, best]), float(runner_up))
+                        if tracker.observe(match, now=frame / 10.0) >= 1.0:
+                            marked = match.folder
+                            frames_to_mark.append(frame + 1)
+                            break
+                    if student in enrolled_names:
+                        genuine_sessions += 1
+                        if marked == student:
+                            correct += 1
+                        elif marked is not None:
+                            wrong += 1
+                    else:
+                        impostor_sessions += 1
+                        if marked is not None:
+                            impostor_marks += 1
+            rows.append({
+                "policy": policy,
+                "threshold": threshold,
+                "marked_correctly": round(correct / genuine_sessions, 4) if genuine_sessions else None,
+                "marked_wrong_student": round(wrong / genuine_sessions, 4) if genuine_sessions else None,
+                "impostor_marked": round(impostor_marks / impostor_sessions, 4) if impostor_sessions else None,
+                "mean_frames_to_mark": round(float(np.mean(frames_to_mark)), 2) if frames_to_mark else None,
+            })
+    return rows
+
+def evaluate_variant(variant, gallery, probes, probe_labels, enrolled_names, rng):
+    t0 = time.perf_counter()
+    names, sims = gallery.identity_similarities(probes)
+    match_seconds = time.perf_counter() - t0
+    dists = 1.0 - sims
+    names = np.asarray(names).astype(str)
+
+    # Verification: every (probe, enrolled student) pair
+    genuine_mask = probe_labels[:, None] == names[None, :]
+    genuine = dists[genuine_mask]
+    impostor = dists[~genuine_mask]
+    tar = np.array([(genuine < t).mean() if len(genuine) else 0.0 for t in THRESHOLDS])
+    far = np.array([(impostor < t).mean() if len(impostor) else 0.0 for t in THRESHOLDS])
+
+    # Open-set identification: nearest student, accepted below threshold
+    best = np.argmin(dists, axis=1)
+    best_dist = dists[np.arange(len(dists)), best]
+    is_enrolled = np.array([label in enrolled_names for label in probe_labels])
+    right = names[best] == probe_labels
+    identification = []
+    for t in THRESHOLDS:
+        accepted = best_dist < t
+        identification.append({
+            "threshold": float(t),
+            "correct": round(float((accepted & right & is_enrolled).sum() / max(1, is_enrolled.sum())), 4),
+            "wrong_student": round(float((accepted & ~right & is_enrolled).sum() / max(1, is_enrolled.sum())), 4),
+            "impostor_accepted": round(float((accepted & ~is_enrolled).sum() / max(1, (~is_enrolled).sum())), 4),
+        })
+
+    return {
+        "variant": variant,
+        "enrolled_rows": len(gallery),
+        "probes": int(len(probes)),
+        "probes_per_second": round(len(probes) / match_seconds, 1) if match_seconds > 0 else None,
+        "roc": [{"threshold": float(t), "tar": round(float(a), 4), "far": round(float(f), 6)}
+                for t, a, f in zip(THRESHOLDS, tar, far)],
+        "tar_at_far": {f"{target:g}": tar_at_far(far, tar, target) for target in FAR_TARGETS},
+        "identification": identification,
+        "policies": simulate_sessions(dists, names, probe_labels, enrolled_names, rng),
+    }
+
+def plot(report, path):
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        from scipy.stats import norm
+    except ImportError:
+        print("  ⚠️  matplotlib/scipy not installed — skipping plot")
+        return
+    fig, (roc_ax, det_ax) = plt.subplots(1, 2, figsize=(12, 5))
+    for v in report["variants"]:
+        far = np.array([p["far"] for p in v["roc"]])
+        tar = np.array([p["tar"] for p in v["roc"]])
+        roc_ax.semilogx(np.clip(far, 1e-6, 1), tar, label=v["variant"])
+        clip = lambda x: np.clip(x, 1e-4, 1 - 1e-4)
+        det_ax.plot(norm.ppf(clip(far)), norm.ppf(clip(1 - tar)), label=v["variant"])
+    roc_ax.set(xlabel="FAR", ylabel="TAR", title="ROC")
+    det_ax.set(xlabel="FAR (probit)", ylabel="FRR (probit)", title="DET")
+    for ax in (roc_ax, det_ax):
+        ax.grid(True, alpha=0.3)
+        ax.legend()
+    fig.tight_layout()
+    fig.savefig(path, dpi=120)
+    print(f"[OK] Curves written to {os.path.abspath(path)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Threshold and confirmation-policy sweep")
+    parser.add_argument("--holdout", type=float, default=0.3, help="Fraction of each student's images used as probes")
+    parser.add_argument("--unenrolled", type=float, default=0.2, help="Fraction of students left out as impostors")
+    parser.add_argument("--variants", default="full,prototype,int8")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="sweep_report.json")
+    parser.add_argument("--plot", help="Write ROC/DET curves to this PNG (needs matplotlib)")
+    args = parser.parse_args()
+
+    gallery = face_gallery.FaceGallery.load()
+    t0 = time.perf_counter()
+    before = len(gallery)
+    if gallery.sync(face_gallery.DATASET_DIR):
+        gallery.save(labels=gallery.changed_labels)
+    embed_seconds = time.perf_counter() - t0
+    print(f"[INFO] Embedding cache: {len(gallery)} images ({max(0, len(gallery) - before)} new, {embed_seconds:.1f}s)")
+    if len(gallery.identities()) < 3:
+        print("[ERROR] Need at least three enrolled students")
+        sys.exit(1)
+
+    rng = np.random.default_rng(args.seed)
+    enrolled, probes, probe_labels, enrolled_names = split(gallery, args.holdout, args.unenrolled, rng)
+    print(f"[INFO] {len(enrolled_names)} enrolled students, {len(probes)} probe images "
+          f"({len(gallery.identities()) - len(enrolled_names)} unenrolled students)")
+
+    report = {
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "model": face_gallery.MODEL_NAME,
+        "holdout": args.holdout,
+        "unenrolled": args.unenrolled,
+        "seed": args.seed,
+        "current_threshold": DISTANCE_THRESHOLD,
+        "current_min_confirmations": MIN_CONFIRMATIONS,
+        "variants": [],
+    }
+    for variant in [v.strip() for v in args.variants.split(",") if v.strip()]:
+        result = evaluate_variant(variant, make_variant(enrolled, variant), probes, probe_labels, enrolled_names, rng)
+        report["variants"].append(result)
+        current = min(result["identification"], key=lambda r: abs(r["threshold"] - DISTANCE_THRESHOLD))
+        print(f"  {variant:<10} TAR@FAR1e-3 {result['tar_at_far']['0.001']:.3f}  "
+              f"@{current['threshold']}: correct {current['correct']:.3f}, wrong {current['wrong_student']:.3f}, "
+              f"impostor {current['impostor_accepted']:.3f}  ({result['probes_per_second']} probes/s)")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[OK] Report written to {os.path.abspath(args.out)}")
+    if args.plot:
+        plot(report, args.plot)
+
+if __name__ == "__main__":
+    main()
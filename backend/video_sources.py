@@ -0,0 +1,246 @@
+import os
+import sys
+import glob
+import time
+import cv2
+import numpy as np
+
+# ==========================================
+# VIDEO SOURCES
+# ==========================================
+# Frame sources with the subset of the cv2.VideoCapture API the recognizer
+# uses (isOpened / read / release / set), so recorded footage can be replayed
+# through the same loop as a live camera:
+#
+#   0, 1, ...            local webcam index
+#   rtsp://... http://   IP camera stream (falls back to the local webcam)
+#   clip.mp4             recorded video file
+#   frames/  or  *.jpg   image sequence (sorted by file name)
+#   synthetic[:N]        generated classroom with N enrolled students' held-out faces
+#
+# Every source also exposes `fps` and `position` (seconds of source time of
+# the last frame read), so benchmarks can measure time-to-mark in clip time.
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def _local_camera(index=0):
+    if sys.platform == 'win32':
+        return cv2.VideoCapture(index, cv2.CAP_DSHOW)
+    return cv2.VideoCapture(index)
+
+class CameraSource:
+    """Live webcam or RTSP stream (anti-lag settings for IP cameras)"""
+    live = True
+
+    def __init__(self, rtsp_url=None, index=0):
+        self.rtsp_url = rtsp_url
+        if rtsp_url:
+            print(f"  🎥 Connecting to IP camera: {rtsp_url}")
+            self.cap = cv2.VideoCapture(rtsp_url)
+            if not self.cap.isOpened():
+                print(f"  ⚠️  RTSP stream unreachable: {rtsp_url}")
+                print(f"  🔄 Falling back to local webcam (index {index})...")
+                self.rtsp_url = None
+                self.cap = _local_camera(index)
+        else:
+            self.cap = _local_camera(index)
+
+        if self.rtsp_url:
+            # IP Camera (WiFi) — reduce lag with minimal buffer
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)       # Only keep 1 frame in buffer (latest frame)
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            self.cap.set(cv2.CAP_PROP_FPS, 15)             # Lower FPS = less WiFi bandwidth = less lag
+            print("  📡 IP Camera mode: Anti-lag settings applied")
+        else:
+            # Laptop webcam — normal settings
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            self.cap.set(cv2.CAP_PROP_FPS, 30)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._start = time.time()
+        self.position = 0.0
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        ret, frame = self.cap.read()
+        self.position = time.time() - self._start
+        return ret, frame
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+
+class FileSource:
+    """Recorded clip; with realtime=True frames are paced at the clip's FPS"""
+    live = False
+
+    def __init__(self, path, realtime=False):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.realtime = realtime
+        self.frames_read = 0
+        self.position = 0.0
+        self._start = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        if self.realtime:
+            if self._start is None:
+                self._start = time.time()
+            delay = self._start + self.frames_read / self.fps - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        ret, frame = self.cap.read()
+        if ret:
+            self.position = self.frames_read / self.fps
+            self.frames_read += 1
+        return ret, frame
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.cap.release()
+
+class ImageSequenceSource:
+    """Directory or glob of still frames, replayed in file-name order"""
+    live = False
+
+    def __init__(self, pattern, fps=10.0):
+        if os.path.isdir(pattern):
+            paths = [os.path.join(pattern, f) for f in os.listdir(pattern)]
+        else:
+            paths = glob.glob(pattern)
+        self.paths = sorted(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS))
+        self.fps = fps
+        self.frames_read = 0
+        self.position = 0.0
+
+    def isOpened(self):
+        return len(self.paths) > 0
+
+    def read(self):
+        while self.frames_read < len(self.paths):
+            frame = cv2.imread(self.paths[self.frames_read])
+            self.position = self.frames_read / self.fps
+            self.frames_read += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        pass
+
+class SyntheticSource:
+    """
+    Generated classroom: face crops of `students` enrolled students from
+    TrainingImage drift slowly over a noisy background, with staggered
+    arrival times. Deterministic for a given seed; `expected` lists the
+    folder names shown, so recall can be computed without annotations.
+
+    Only held-out images are shown: a `holdout` fraction of each student's
+    images (at least one; students with fewer than two images are not
+    used), the same rule as threshold_sweep.split(). `heldout_paths` lists
+    them so the engines can be built without them; otherwise the faces
+    would be matched against themselves and the accuracy would mean nothing.
+    """
+    live = False
+
+    def __init__(self, students=4, seconds=20.0, fps=15.0, size=(640, 480),
+                 dataset_dir="TrainingImage", face_size=120, seed=0, holdout=0.3):
+        self.fps = fps
+        self.width, self.height = size
+        self.total_frames = int(seconds * fps)
+        self.frames_read = 0
+        self.position = 0.0
+        self.rng = np.random.default_rng(seed)
+        self.background = self.rng.integers(40, 90, size=(self.height, self.width, 3), dtype=np.uint8)
+        self.actors = []
+        self.heldout_paths = set()
+
+        folders = []
+        if os.path.isdir(dataset_dir):
+            folders = sorted(f for f in os.listdir(dataset_dir) if os.path.isdir(os.path.join(dataset_dir, f))
+                             and sum(1 for i in os.listdir(os.path.join(dataset_dir, f)) if i.lower().endswith(IMAGE_EXTENSIONS)) >= 2)
+        picked = self.rng.permutation(len(folders))[:students] if folders else []
+        cols = max(1, int(np.ceil(np.sqrt(max(1, len(picked))))))
+        for slot, idx in enumerate(picked):
+            folder = folders[idx]
+            images = sorted(f for f in os.listdir(os.path.join(dataset_dir, folder)) if f.lower().endswith(IMAGE_EXTENSIONS))
+            n_probe = max(1, int(round(len(images) * holdout)))
+            probes = [os.path.join(dataset_dir, folder, images[i]) for i in self.rng.permutation(len(images))[:n_probe]]
+            self.heldout_paths.update(os.path.normpath(p) for p in probes)
+            faces = [cv2.imread(p) for p in probes[:10]]
+            faces = [cv2.resize(f, (face_size, face_size)) for f in faces if f is not None]
+            if not faces:
+                continue
+            row, col = divmod(slot, cols)
+            base_x = int((col + 0.5) * self.width / cols - face_size / 2)
+            base_y = int((row + 0.5) * self.height / cols - face_size / 2)
+            self.actors.append({
+                "folder": folder,
+                "faces": faces,
+                "base": (base_x, base_y),
+                "phase": float(self.rng.uniform(0, 2 * np.pi)),
+                "arrives": float(self.rng.uniform(0, seconds / 3)),
+            })
+        self.expected = [a["folder"] for a in self.actors]
+        self.face_size = face_size
+
+    def isOpened(self):
+        return bool(self.actors)
+
+    def read(self):
+        if self.frames_read >= self.total_frames:
+            return False, None
+        t = self.frames_read / self.fps
+        frame = self.background.copy()
+        for actor in self.actors:
+            if t < actor["arrives"]:
+                continue
+            dx = int(12 * np.sin(t * 0.8 + actor["phase"]))
+            dy = int(6 * np.cos(t * 0.6 + actor["phase"]))
+            x = int(np.clip(actor["base"][0] + dx, 0, self.width - self.face_size))
+            y = int(np.clip(actor["base"][1] + dy, 0, self.height - self.face_size))
+            face = actor["faces"][int(t * 2) % len(actor["faces"])]
+            frame[y:y + self.face_size, x:x + self.face_size] = face
+        noise = self.rng.integers(-6, 7, size=frame.shape, dtype=np.int16)
+        frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        self.position = t
+        self.frames_read += 1
+        return True, frame
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        pass
+
+def open_source(spec=None, realtime=False):
+    """Open a source from a spec string (see module header); None = local webcam"""
+    if spec is None or spec == "":
+        return CameraSource()
+    spec = str(spec)
+    if spec.isdigit():
+        return CameraSource(index=int(spec))
+    if spec.startswith("synthetic"):
+        students = int(spec.split(":", 1)[1]) if ":" in spec else 4
+        return SyntheticSource(students=students)
+    if "://" in spec:
+        return CameraSource(rtsp_url=spec)
+    if os.path.isdir(spec) or any(ch in spec for ch in "*?"):
+        return ImageSequenceSource(spec)
+    if spec.lower().endswith(IMAGE_EXTENSIONS):
+        return ImageSequenceSource(spec)
+    return FileSource(spec, realtime=realtime)